@@ -14,12 +14,14 @@ from typing import Any
 
 from PIL import Image
 
-from src.ai_assistant import AIAssistant
+from src.ai_assistant import AIAssistant, RequestCancelled
 from src.app_detector import AppInfo, detect_app
 from src.clipboard_utils import get_clipboard_text
 from src.config import load_config, save_user_config
 from src.content_filter import build_context_prompt, filter_content
+from src.context_packing import pack_blocks
 from src.hotkey import HotkeyManager, parse_hotkey
+from src.image_codec import EncodedImage, as_pil, image_fingerprint
 from src.intent_router import classify_response_mode
 from src.interaction_mode import AssistantTurnResult, ResponseMode
 from src.monitor import MonitorConfig, ScreenMonitor
@@ -30,6 +32,9 @@ from src.pet import PetState
 from src.proactive import ProactiveHintController
 from src.prompts import PERSONALITIES
 from src.screenshot import capture_window, get_active_hwnd
+from src.tokens import estimate_tokens, set_token_encoding
+from src.turn_budget import DEFAULT_TURN_DEADLINE_SEC, TurnBudget
+from src import web_search
 from src.url_browse import (
     DEFAULT_GLOBAL_TIMEOUT,
     DEFAULT_MAX_BYTES,
@@ -49,6 +54,12 @@ URL_GLOBAL_TIMEOUT = DEFAULT_GLOBAL_TIMEOUT
 URL_MAX_BYTES = DEFAULT_MAX_BYTES
 URL_MAX_CHARS_PER_URL = DEFAULT_MAX_CHARS_PER_URL
 URL_MAX_TOTAL_CHARS = DEFAULT_MAX_TOTAL_CHARS
+# Packed blocks that describe the session rather than the turn; sent once as a cached prefix.
+# OCR follows the current capture and notes are per-turn, so both ride with the question.
+STATIC_CONTEXT_BLOCKS = frozenset({"app", "clipboard", "browse_context"})
+# Share of context_max_tokens held back for per-turn blocks (OCR, notes, mode hint), so the
+# static budget, and therefore the pinned prefix, never depends on the question.
+TURN_CONTEXT_RESERVE_TOKENS = 750
 
 
 def _safe_set_utf8(stream):
@@ -142,14 +153,19 @@ def _build_ai_instance(
     if personality != "buddy" and max_tokens == buddy_default:
         max_tokens_override = None
 
+    # Context packing and history trimming share one process-wide estimator.
+    set_token_encoding(str(config.get("token_encoding", "") or ""))
     return AIAssistant(
         api_key=api_key if api_key is not None else config["api_key"],
         model=config["model"],
         personality=personality,
         max_tokens=max_tokens_override,
-        history_window_turns=int(config.get("history_window_turns", 6)),
+        history_window_turns=int(config.get("history_window_turns", 20)),
+        history_token_budget=int(config.get("history_token_budget", 6000)),
         history_summary_every_turns=int(config.get("history_summary_every_turns", 6)),
         history_summary_max_chars=int(config.get("history_summary_max_chars", 1800)),
+        history_summarizer_enabled=bool(config.get("history_summarizer", True)),
+        history_summary_model=str(config.get("history_summary_model", "") or ""),
         backend=backend_name,
         openai_api_key=(
             openai_api_key_override
@@ -159,6 +175,26 @@ def _build_ai_instance(
         ollama_base_url=config.get("ollama_base_url", "http://127.0.0.1:11434"),
         openai_base_url=config.get("openai_base_url", "https://api.openai.com/v1"),
         backend_timeout_sec=int(config.get("backend_timeout_sec", 45)),
+        tool_call_timeout_sec=float(config.get("tool_call_timeout_sec", 15)),
+        fallback_backend=str(config.get("fallback_backend", "") or ""),
+        fallback_model=str(config.get("fallback_model", "") or ""),
+        hedge_requests=bool(config.get("hedge_requests", True)),
+        ollama_keep_alive=config.get("ollama_keep_alive", "30m"),
+        model_routing_enabled=bool(config.get("model_routing", False)),
+        model_routes=config.get("model_routes"),
+        model_routing_short_chars=int(config.get("model_routing_short_chars", 160)),
+        model_routing_long_context_tokens=int(config.get("model_routing_long_context_tokens", 8000)),
+        backend_max_retries=int(config.get("backend_max_retries", 2)),
+        circuit_breaker_failures=int(config.get("circuit_breaker_failures", 3)),
+        circuit_breaker_cooldown_sec=float(config.get("circuit_breaker_cooldown_sec", 30)),
+        search_prefetch_enabled=bool(config.get("search_prefetch", True)),
+        response_cache_enabled=bool(config.get("response_cache", False)),
+        response_cache_ttl_sec=float(config.get("response_cache_ttl_sec", 120)),
+        deep_search_enabled=bool(config.get("deep_search", False)),
+        deep_search_top_k=int(config.get("deep_search_top_k", 3)),
+        deep_search_timeout_sec=float(config.get("deep_search_timeout_sec", 8)),
+        image_diff_enabled=bool(config.get("followup_image_diff", True)),
+        image_diff_max_area_ratio=float(config.get("image_diff_max_area_ratio", 0.35)),
     )
 
 
@@ -180,11 +216,12 @@ class AppRuntime:
     state_lock: threading.Lock = field(default_factory=threading.Lock)
     activation_in_progress: bool = False
     turn_counter: int = 0
-    static_context_hash: str = ""
-    static_context_id: str = ""
-    static_context_last_full_turn: int = 0
+    # Context blocks that outlive the turn that produced them (clipboard, fetched pages).
+    session_context: dict[str, str] = field(default_factory=dict)
     url_cache: dict[str, tuple[float, FetchedPage]] = field(default_factory=dict)
     ocr_cache: dict[str, tuple[float, str]] = field(default_factory=dict)
+    # Full-resolution capture (keyed by fingerprint) held until OCR has read it.
+    ocr_source_frame: tuple[str, Image.Image] | None = None
 
 
 def _build_notification_manager(rt: AppRuntime) -> NotificationManager:
@@ -196,6 +233,10 @@ def _build_notification_manager(rt: AppRuntime) -> NotificationManager:
 
 def _create_runtime(config: dict | None = None) -> AppRuntime:
     config = config or load_config()
+    web_search.configure(
+        backends=list(config.get("search_backends") or ["duckduckgo", "brave"]),
+        deadline_sec=float(config.get("search_deadline_sec", 4)),
+    )
     rt = AppRuntime(
         cfg=config,
         ai=_build_ai_instance(cfg_override=config),
@@ -212,6 +253,11 @@ def _refresh_runtime_after_ai_change(rt: AppRuntime) -> None:
     rt.notification_manager = _build_notification_manager(rt)
 
 
+def _warm_up_backend(rt: AppRuntime, reason: str) -> None:
+    if bool(rt.cfg.get("ollama_warm_up", True)):
+        rt.ai.warm_up(reason)
+
+
 def _looks_like_api_key(text: str) -> bool:
     value = text.strip()
     return len(value) > 20 and value.startswith("sk-")
@@ -227,11 +273,6 @@ def _is_cancelled(cancel_token: Any) -> bool:
     return bool(cancel_token is not None and hasattr(cancel_token, "is_set") and cancel_token.is_set())
 
 
-def _estimate_tokens(text: str) -> int:
-    # Fast approximation suitable for relative telemetry.
-    return max(1, len(text) // 4) if text else 0
-
-
 def _evict_stale_cache_entries(rt: AppRuntime, *, now_mono: float) -> None:
     url_ttl = max(1, int(rt.cfg.get("url_cache_ttl_sec", 300)))
     ocr_ttl = max(1, int(rt.cfg.get("ocr_cache_ttl_sec", 300)))
@@ -259,11 +300,11 @@ def _set_cached_url_page(rt: AppRuntime, url: str, page: FetchedPage, *, now_mon
 
 
 def _image_cache_key(image) -> str:
+    if isinstance(image, EncodedImage):
+        return image.fingerprint
     if image is None or not hasattr(image, "convert"):
         return ""
-    gray = image.convert("L")
-    small = gray.resize((128, 128))
-    return hashlib.blake2b(small.tobytes(), digest_size=16).hexdigest()
+    return image_fingerprint(image)
 
 
 def _get_cached_ocr_text(rt: AppRuntime, key: str, *, now_mono: float) -> str:
@@ -279,6 +320,34 @@ def _get_cached_ocr_text(rt: AppRuntime, key: str, *, now_mono: float) -> str:
     return text
 
 
+def _ocr_wanted(rt: AppRuntime, app_type: str) -> bool:
+    return should_use_ocr(
+        app_type=app_type,
+        enabled=bool(rt.cfg.get("enable_ocr_fallback", False)),
+        preferred_apps=rt.cfg.get("ocr_preferred_apps", list(DEFAULT_PREFERRED_APPS)),
+    )
+
+
+def _keep_ocr_source(
+    rt: AppRuntime,
+    img: Image.Image | None,
+    encoded: EncodedImage | None,
+    app_type: str,
+) -> None:
+    """Hold the raw capture for OCR; the overlay and history only keep the compressed copy."""
+    rt.ocr_source_frame = None
+    if img is not None and encoded is not None and _ocr_wanted(rt, app_type):
+        rt.ocr_source_frame = (encoded.fingerprint, img)
+
+
+def _ocr_source(rt: AppRuntime, image) -> Image.Image:
+    """Full-resolution pixels for OCR when still held, else the decoded image."""
+    source = rt.ocr_source_frame
+    if isinstance(image, EncodedImage) and source is not None and source[0] == image.fingerprint:
+        return source[1]
+    return as_pil(image)
+
+
 def _set_cached_ocr_text(rt: AppRuntime, key: str, text: str, *, now_mono: float) -> None:
     if key and text:
         rt.ocr_cache[key] = (now_mono, text)
@@ -288,69 +357,36 @@ def _pack_context_blocks(
     *,
     blocks: list[dict[str, Any]],
     question: str,
-    max_chars: int,
+    max_tokens: int,
 ) -> tuple[list[tuple[str, str]], list[dict[str, Any]], bool]:
     """Token-budgeted context packing with priority and trimming."""
-    max_chars = max(1000, int(max_chars))
-    question_len = len(question)
-    remaining = max(max_chars - question_len, 0)
-    selected: list[tuple[int, int, str, str]] = []
-    dropped: list[dict[str, Any]] = []
-    used = 0
-
-    for idx, block in enumerate(blocks):
-        name = str(block.get("name", f"block_{idx}"))
-        text = str(block.get("text", ""))
-        if not text:
-            continue
-        priority = int(block.get("priority", 50))
-        required = bool(block.get("required", False))
-        allow_trim = bool(block.get("allow_trim", False))
-        length = len(text)
-
-        if required and (used + length) > remaining:
-            if remaining <= used:
-                dropped.append({"name": name, "reason": "no_budget"})
-                continue
-            if allow_trim:
-                trim_to = max(0, remaining - used)
-                if trim_to > 0:
-                    trimmed = text[:trim_to]
-                    selected.append((priority, idx, name, trimmed))
-                    used += len(trimmed)
-                else:
-                    dropped.append({"name": name, "reason": "no_budget"})
-            else:
-                dropped.append({"name": name, "reason": "no_budget"})
-            continue
+    max_tokens = max(250, int(max_tokens))
+    remaining = max(max_tokens - estimate_tokens(question), 0)
+    return pack_blocks(blocks, remaining)
 
-        selected.append((priority, idx, name, text))
-        used += length
-
-    # Keep higher-priority blocks first, then stable order.
-    selected.sort(key=lambda item: (-item[0], item[1]))
-    packed: list[tuple[str, str]] = []
-    final_used = 0
-    trimmed = False
-    for priority, idx, name, text in selected:
-        text_len = len(text)
-        if (final_used + text_len) <= remaining:
-            packed.append((name, text))
-            final_used += text_len
-            continue
-        # Attempt tail-trim only for lower-priority long blocks.
-        if text_len > 0 and priority < 60:
-            remain = remaining - final_used
-            if remain > 0:
-                packed.append((name, text[:remain]))
-                final_used += remain
-                trimmed = True
-            else:
-                dropped.append({"name": name, "reason": "budget_pruned"})
-            continue
-        dropped.append({"name": name, "reason": "budget_pruned"})
 
-    return packed, dropped, trimmed
+def _pack_turn_context(
+    *,
+    blocks: list[dict[str, Any]],
+    question: str,
+    max_tokens: int,
+) -> tuple[list[tuple[str, str]], list[tuple[str, str]], list[dict[str, Any]]]:
+    """Pack static blocks against a fixed budget, then per-turn blocks into what is left.
+
+    Returns ``(static_blocks, turn_blocks, dropped)``.
+    """
+    max_tokens = int(max_tokens)
+    static_packed, static_dropped, _trimmed = pack_blocks(
+        [block for block in blocks if block["name"] in STATIC_CONTEXT_BLOCKS],
+        max(0, max_tokens - TURN_CONTEXT_RESERVE_TOKENS),
+    )
+    static_used = sum(estimate_tokens(text) for _name, text in static_packed)
+    turn_packed, turn_dropped, _trimmed = _pack_context_blocks(
+        blocks=[block for block in blocks if block["name"] not in STATIC_CONTEXT_BLOCKS],
+        question=question,
+        max_tokens=max_tokens - static_used,
+    )
+    return static_packed, turn_packed, static_dropped + turn_dropped
 
 
 def _log_context_telemetry(
@@ -359,19 +395,21 @@ def _log_context_telemetry(
     included_blocks: list[tuple[str, str]],
     dropped: list[dict[str, Any]],
     question: str,
+    degraded: list[str] | None = None,
 ) -> None:
     if not enabled:
         return
-    token_by_block = {name: _estimate_tokens(text) for name, text in included_blocks}
-    token_by_block["question"] = _estimate_tokens(question)
+    token_by_block = {name: estimate_tokens(text) for name, text in included_blocks}
+    token_by_block["question"] = estimate_tokens(question)
     total = sum(token_by_block.values())
     dropped_desc = ",".join(f"{d['name']}:{d['reason']}" for d in dropped) if dropped else "none"
     block_desc = ",".join(f"{k}:{v}" for k, v in token_by_block.items())
     logger.info(
-        "event=CONTEXT_PACK flow=submit result=packed est_tokens_total=%d blocks=%s dropped=%s",
+        "event=CONTEXT_PACK flow=submit result=packed est_tokens_total=%d blocks=%s dropped=%s degraded=%s",
         total,
         block_desc,
         dropped_desc,
+        ",".join(degraded) if degraded else "none",
     )
 
 
@@ -523,6 +561,7 @@ def on_submit(question, image, *, cancel_token=None):
     if rt.onboarding_needed:
         return _handle_onboarding_submit(rt, question)
 
+    budget = TurnBudget(float(rt.cfg.get("turn_deadline_sec", DEFAULT_TURN_DEADLINE_SEC)))
     now_mono = time.monotonic()
     _evict_stale_cache_entries(rt, now_mono=now_mono)
     rt.turn_counter += 1
@@ -551,12 +590,17 @@ def on_submit(question, image, *, cancel_token=None):
     urls = extract_urls(question)
     browse_context = ""
     browse_warning = ""
-    if urls:
+    if urls and not budget.allows("browse"):
+        browse_warning = (
+            "[Direct URL browse note]\n"
+            "Links were not fetched to keep this reply fast; answer from the question alone."
+        )
+    elif urls:
         _overlay_status_update("Fetching links...")
         pages = []
         failures: list[str] = []
         allow_private_urls = bool(rt.cfg.get("allow_private_url_browse", True))
-        deadline = time.monotonic() + URL_GLOBAL_TIMEOUT
+        deadline = time.monotonic() + budget.stage_timeout(URL_GLOBAL_TIMEOUT)
         for url in urls:
             if _is_cancelled(cancel_token):
                 return AssistantTurnResult(text="Request cancelled.", response_mode=response_mode)
@@ -621,25 +665,24 @@ def on_submit(question, image, *, cancel_token=None):
 
     ocr_text = ""
     ocr_block = ""
-    if image is not None and should_use_ocr(
-        app_type=app_type,
-        enabled=bool(rt.cfg.get("enable_ocr_fallback", False)),
-        preferred_apps=rt.cfg.get("ocr_preferred_apps", list(DEFAULT_PREFERRED_APPS)),
-    ):
+    if image is not None and _ocr_wanted(rt, app_type):
         if _is_cancelled(cancel_token):
             return AssistantTurnResult(text="Request cancelled.", response_mode=response_mode)
         _overlay_status_update("Running OCR...")
         ocr_key = _image_cache_key(image)
         ocr_text = _get_cached_ocr_text(rt, ocr_key, now_mono=time.monotonic())
-        if not ocr_text:
+        if not ocr_text and budget.allows("ocr"):
+            ocr_timeout = budget.stage_timeout(float(rt.cfg.get("ocr_timeout_sec", 5)))
             ocr_text = extract_ocr_text(
-                image,
+                _ocr_source(rt, image),
                 max_chars=int(rt.cfg.get("ocr_max_chars", 3000)),
-                timeout_sec=int(rt.cfg.get("ocr_timeout_sec", 5)),
+                timeout_sec=max(1, int(ocr_timeout)),
                 tesseract_cmd=str(rt.cfg.get("tesseract_cmd", "")),
             )
             _set_cached_ocr_text(rt, ocr_key, ocr_text, now_mono=time.monotonic())
-        else:
+            if ocr_text:
+                rt.ocr_source_frame = None
+        elif ocr_text:
             logger.info("OCR cache hit: key=%s chars=%d", ocr_key[:8], len(ocr_text))
         if _is_cancelled(cancel_token):
             return AssistantTurnResult(text="Request cancelled.", response_mode=response_mode)
@@ -648,103 +691,54 @@ def on_submit(question, image, *, cancel_token=None):
 
     browse_context_block = f"[Direct URL browse context]\n{browse_context}" if browse_context else ""
     browse_warning_block = browse_warning or ""
-
-    static_payload = "\n\n".join(
-        [
-            part
-            for part in [
-                app_context_block,
-                clipboard_block,
-                ocr_block,
-                browse_context_block,
-                browse_warning_block,
-            ]
-            if part
-        ]
-    )
-    static_hash = hashlib.sha1(static_payload.encode("utf-8")).hexdigest() if static_payload else ""
-    refresh_turns = max(1, int(rt.cfg.get("context_reference_refresh_turns", 3)))
-    use_context_reference = (
-        bool(static_hash)
-        and static_hash == rt.static_context_hash
-        and bool(rt.static_context_id)
-        and (rt.turn_counter - rt.static_context_last_full_turn) < refresh_turns
-    )
-    if static_hash and not use_context_reference:
-        rt.static_context_hash = static_hash
-        rt.static_context_id = static_hash[:8]
-        rt.static_context_last_full_turn = rt.turn_counter
-    if not static_hash:
-        rt.static_context_hash = ""
-        rt.static_context_id = ""
-        rt.static_context_last_full_turn = 0
+    for name, text in (("clipboard", clipboard_block), ("browse_context", browse_context_block)):
+        if text:
+            rt.session_context[name] = text
+    clipboard_block = rt.session_context.get("clipboard", "")
+    browse_context_block = rt.session_context.get("browse_context", "")
 
     context_blocks: list[dict[str, Any]] = []
-    if use_context_reference:
+    if app_context_block:
+        context_blocks.append({"name": "app", "text": app_context_block, "priority": 90, "required": False})
+    if clipboard_block:
         context_blocks.append(
             {
-                "name": "context_ref",
-                "text": (
-                    f"[Context reference id: {rt.static_context_id}]\n"
-                    "Reuse static context from previous turn in this session."
-                ),
-                "priority": 95,
-                "required": True,
+                "name": "clipboard",
+                "text": clipboard_block,
+                "priority": 85,
+                "required": False,
+                "allow_trim": True,
+            }
+        )
+    if ocr_block:
+        context_blocks.append(
+            {
+                "name": "ocr",
+                "text": ocr_block,
+                "priority": 82,
+                "required": False,
+                "allow_trim": True,
+            }
+        )
+    if browse_warning_block:
+        context_blocks.append(
+            {
+                "name": "browse_warning",
+                "text": browse_warning_block,
+                "priority": 65,
+                "required": False,
+            }
+        )
+    if browse_context_block:
+        context_blocks.append(
+            {
+                "name": "browse_context",
+                "text": browse_context_block,
+                "priority": 20,
+                "required": False,
+                "allow_trim": True,
             }
         )
-    else:
-        if rt.static_context_id:
-            context_blocks.append(
-                {
-                    "name": "context_id",
-                    "text": f"[Context id: {rt.static_context_id}]",
-                    "priority": 95,
-                    "required": False,
-                }
-            )
-        if app_context_block:
-            context_blocks.append(
-                {"name": "app", "text": app_context_block, "priority": 90, "required": False}
-            )
-        if clipboard_block:
-            context_blocks.append(
-                {
-                    "name": "clipboard",
-                    "text": clipboard_block,
-                    "priority": 85,
-                    "required": False,
-                    "allow_trim": True,
-                }
-            )
-        if ocr_block:
-            context_blocks.append(
-                {
-                    "name": "ocr",
-                    "text": ocr_block,
-                    "priority": 82,
-                    "required": False,
-                    "allow_trim": True,
-                }
-            )
-        if browse_warning_block:
-            context_blocks.append(
-                {
-                    "name": "browse_warning",
-                    "text": browse_warning_block,
-                    "priority": 65,
-                    "required": False,
-                }
-            )
-        if browse_context_block:
-            context_blocks.append(
-                {
-                    "name": "browse_context",
-                    "text": browse_context_block,
-                    "priority": 20,
-                    "required": False,
-                    "allow_trim": True,
-                }
-            )
 
     context_blocks.append(
         {
@@ -755,29 +749,49 @@ def on_submit(question, image, *, cancel_token=None):
         }
     )
 
-    packed_blocks, dropped, _trimmed = _pack_context_blocks(
+    static_blocks, turn_blocks, dropped = _pack_turn_context(
         blocks=context_blocks,
         question=question,
-        max_chars=int(rt.cfg.get("context_max_chars", 9000)),
+        max_tokens=int(rt.cfg.get("context_max_tokens", 2250)),
     )
-    full_question = "\n\n".join([text for _name, text in packed_blocks] + [question])
+    # Static blocks become the pinned session context; per-turn blocks ride with the question.
+    static_context = "\n\n".join(text for _name, text in static_blocks)
+    static_hash = hashlib.sha1(static_context.encode("utf-8")).hexdigest() if static_context else ""
+    full_question = "\n\n".join([text for _name, text in turn_blocks] + [question])
+    packed_blocks = static_blocks + turn_blocks
 
     _log_context_telemetry(
         enabled=bool(rt.cfg.get("context_telemetry", True)),
         included_blocks=packed_blocks,
         dropped=dropped,
         question=question,
+        degraded=budget.degraded,
     )
 
     if _is_cancelled(cancel_token):
         return AssistantTurnResult(text="Request cancelled.", response_mode=response_mode)
     _overlay_status_update("Thinking...")
-    answer = rt.ai.ask(
-        full_question,
-        image=image,
-        search_hint_question=question,
-        ocr_text=ocr_text,
-    )
+    try:
+        answer = rt.ai.ask(
+            full_question,
+            image=image,
+            search_hint_question=question,
+            ocr_text=ocr_text,
+            context_digest=static_hash,
+            static_context=static_context,
+            cancel_token=cancel_token,
+            budget=budget,
+            response_mode=response_mode,
+        )
+    except RequestCancelled:
+        return AssistantTurnResult(text="Request cancelled.", response_mode=response_mode)
+    if budget.enabled:
+        logger.info(
+            "event=TURN_BUDGET flow=submit elapsed_ms=%d deadline_ms=%d degraded=%s",
+            int(budget.elapsed() * 1000),
+            int(budget.deadline_sec * 1000),
+            ",".join(budget.degraded) or "none",
+        )
     return AssistantTurnResult(text=answer, response_mode=response_mode)
 
 
@@ -796,9 +810,7 @@ def _deliver_daily_news_slot(slot_id: str, overlay: OverlayWindow, now_local: da
     with rt.state_lock:
         rt.target_hwnd = 0
         rt.current_app = None
-    rt.static_context_hash = ""
-    rt.static_context_id = ""
-    rt.static_context_last_full_turn = 0
+    rt.session_context.clear()
     rt.turn_counter = 0
     overlay.show_notice(
         notification.text,
@@ -878,9 +890,7 @@ def on_activate(overlay):
             with rt.state_lock:
                 rt.clipboard_context_text = ""
                 rt.clipboard_context_pending = False
-            rt.static_context_hash = ""
-            rt.static_context_id = ""
-            rt.static_context_last_full_turn = 0
+            rt.session_context.clear()
             rt.turn_counter = 0
             overlay.show(image=None, window_title="BuddyGPT Onboarding")
             overlay.show_notice(
@@ -891,6 +901,8 @@ def on_activate(overlay):
             )
             return
 
+        # The user is about to ask something; start loading a local model now.
+        _warm_up_backend(rt, "activate")
         with rt.news_lock:
             try:
                 if (
@@ -906,9 +918,7 @@ def on_activate(overlay):
                         with rt.state_lock:
                             rt.clipboard_context_text = ""
                             rt.clipboard_context_pending = False
-                        rt.static_context_hash = ""
-                        rt.static_context_id = ""
-                        rt.static_context_last_full_turn = 0
+                        rt.session_context.clear()
                         rt.turn_counter = 0
                         logger.info(
                             "event=SLOT_DELIVERED flow=wake_activation slot_id=%s result=delivered",
@@ -929,9 +939,7 @@ def on_activate(overlay):
                 rt.current_app = app
                 rt.clipboard_context_text = ""
                 rt.clipboard_context_pending = False
-            rt.static_context_hash = ""
-            rt.static_context_id = ""
-            rt.static_context_last_full_turn = 0
+            rt.session_context.clear()
             rt.turn_counter = 0
             img = capture_window(hwnd)
             if img and app:
@@ -946,7 +954,10 @@ def on_activate(overlay):
                 rt.ai.set_app_context("")
                 logger.info("Activated: unknown app hwnd=%d", hwnd)
                 window_title = "BuddyGPT"
-            overlay.show(image=img, window_title=window_title)
+            # Compress once at capture; the overlay and history keep only the encoded bytes.
+            encoded = rt.ai.encode_image(img) if img is not None else None
+            _keep_ocr_source(rt, img, encoded, app.app_type.value if app else "")
+            overlay.show(image=encoded, window_title=window_title)
     finally:
         _end_activation(rt)
 
@@ -969,9 +980,7 @@ def on_activate_clipboard(overlay):
             return
 
         if rt.onboarding_needed:
-            rt.static_context_hash = ""
-            rt.static_context_id = ""
-            rt.static_context_last_full_turn = 0
+            rt.session_context.clear()
             rt.turn_counter = 0
             overlay.show(image=None, window_title="BuddyGPT Onboarding")
             overlay.show_notice(
@@ -1003,9 +1012,7 @@ def on_activate_clipboard(overlay):
             rt.current_app = app
             rt.clipboard_context_text = clip_text
             rt.clipboard_context_pending = True
-        rt.static_context_hash = ""
-        rt.static_context_id = ""
-        rt.static_context_last_full_turn = 0
+        rt.session_context.clear()
         rt.turn_counter = 0
 
         rt.ai.clear_history()
@@ -1139,6 +1146,8 @@ def main():
         usage_provider=lambda: rt.ai.get_last_usage(),
     )
     rt.active_overlay = overlay
+    if not rt.onboarding_needed:
+        _warm_up_backend(rt, "startup")
     print("UI ready.")
     tray_icon = None
 
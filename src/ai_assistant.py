@@ -2,15 +2,20 @@
 
 from __future__ import annotations
 
-import base64
-import io
+import asyncio
+import hashlib
 import logging
 import os
 import re
-from dataclasses import dataclass
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import dataclass, field
 from datetime import datetime
+from functools import partial
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable
 
 from dotenv import load_dotenv
 from PIL import Image
@@ -19,20 +24,62 @@ from .backends import (
     DEFAULT_BACKEND,
     OLLAMA_BASE_URL,
     OPENAI_BASE_URL,
+    SUMMARY_MODELS,
     BackendResponse,
-    build_backend,
+    HedgedBackend,
+    ModelBackend,
+    ToolCall,
+    WireMessage,
+    shared_backend,
+)
+from .image_codec import (
+    DEFAULT_DIFF_MAX_AREA_RATIO,
+    CodecSelector,
+    EncodedImage,
+    as_pil,
+    diff_frames,
+    diff_thumbnail,
+    image_fingerprint,
+)
+from .interaction_mode import ResponseMode
+from .model_routing import (
+    DEFAULT_LONG_CONTEXT_TOKENS,
+    DEFAULT_SHORT_QUESTION_CHARS,
+    ModelRouter,
+    RouteChoice,
+    routes_for_backend,
 )
 from .prompts import APP_PROMPTS, PERSONALITIES
-from .web_search import format_results, search
+from .transport import TransportPolicy
+from .tokens import estimate_tokens
+from .turn_budget import TurnBudget
+from .ttl_cache import TTLCache
+from .web_search import (
+    DEEP_SEARCH_TIMEOUT_SEC,
+    DEEP_SEARCH_TOP_K,
+    deep_search,
+    format_results,
+    query_similarity,
+    search,
+)
 
 load_dotenv(Path(__file__).resolve().parent.parent / ".env")
 
 logger = logging.getLogger(__name__)
 
 DEFAULT_MODEL = "claude-sonnet-4-20250514"
-DEFAULT_HISTORY_WINDOW_TURNS = 6
+DEFAULT_HISTORY_WINDOW_TURNS = 20
+DEFAULT_HISTORY_TOKEN_BUDGET = 6000
 DEFAULT_HISTORY_SUMMARY_EVERY_TURNS = 6
 DEFAULT_HISTORY_SUMMARY_MAX_CHARS = 1800
+DEFAULT_RESPONSE_CACHE_TTL_SEC = 120
+DEFAULT_RESPONSE_CACHE_MAX_ENTRIES = 64
+
+_SUMMARY_SYSTEM_PROMPT = (
+    "You compress chat transcripts into dense running summaries. Keep facts, "
+    "decisions, names, numbers, file paths, errors, and open questions. Drop "
+    "greetings and filler. Write terse plain-text notes, no preamble."
+)
 
 _IMAGE_PRESETS = {
     "terminal": {"max_size": 800, "quality": 60},
@@ -41,6 +88,8 @@ _IMAGE_PRESETS = {
 }
 _DEFAULT_PRESET = {"max_size": 1024, "quality": 70}
 _OCR_PRESET = {"max_size": 512, "quality": 40}
+# Used when the turn budget is running out and upload time matters more than detail.
+_LOW_DETAIL_PRESET = {"max_size": 640, "quality": 50}
 
 _SEARCH_KEYWORDS = {
     "latest",
@@ -109,12 +158,113 @@ SEARCH_TOOL = {
     },
 }
 
+DEFAULT_TOOL_CALL_TIMEOUT_SEC = 15.0
+_MAX_TOOL_ROUNDS = 3
+# Minimum query similarity for a tool call to reuse the speculative prefetch.
+PREFETCH_SIMILARITY = 0.5
+_TOOL_WORKERS = 4
+_tool_executor = ThreadPoolExecutor(max_workers=_TOOL_WORKERS, thread_name_prefix="tool-call")
+
+
+def _run_web_search(tool_input: dict[str, Any]) -> str:
+    query = str(tool_input.get("query", "")).strip()
+    return format_results(search(query))
+
+
+def _run_deep_search(
+    tool_input: dict[str, Any],
+    *,
+    top_k: int,
+    timeout_sec: float,
+    results: list[dict] | None = None,
+) -> str:
+    query = str(tool_input.get("query", "")).strip()
+    return format_results(deep_search(query, top_k=top_k, timeout_sec=timeout_sec, results=results))
+
+
+# Tool name -> handler returning the tool_result text. Calls within one model
+# round run concurrently on the bounded tool executor.
+TOOL_HANDLERS: dict[str, Callable[[dict[str, Any]], str]] = {
+    SEARCH_TOOL["name"]: _run_web_search,
+}
+
 
 @dataclass
 class ChatMessage:
     role: str
     text: str
-    image: Image.Image | None = None
+    image: EncodedImage | None = None
+    # Crop box (left, top, right, bottom) when `image` is only the changed region.
+    image_region: tuple[int, int, int, int] | None = None
+    # True when this turn's capture was diffed against the previous full image.
+    diff_turn: bool = False
+    # Set once the message has been folded into the session summary.
+    summarized: bool = field(default=False, repr=False, compare=False)
+    # Cached text token estimate (0 = not computed yet).
+    token_estimate: int = field(default=0, repr=False, compare=False)
+    # Pre-converted wire messages keyed by (backend, image attached). Messages are
+    # treated as immutable once appended to history, so entries never go stale.
+    wire_cache: dict[tuple[str, bool], list[WireMessage]] = field(
+        default_factory=dict, repr=False, compare=False
+    )
+
+
+class RequestCancelled(Exception):
+    """The caller cancelled an in-flight :meth:`AIAssistant.ask`."""
+
+
+class _AsyncLoopThread:
+    """One long-lived event loop for cancellable requests.
+
+    Async HTTP clients keep connection pools bound to the loop they first ran
+    on, so every request shares this loop instead of calling ``asyncio.run``.
+    """
+
+    def __init__(self) -> None:
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._lock = threading.Lock()
+
+    def submit(self, coro) -> Future:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=self._loop.run_forever,
+                    daemon=True,
+                    name="assistant-async",
+                ).start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+
+_async_loop = _AsyncLoopThread()
+_CANCEL_POLL_SEC = 0.05
+
+
+@dataclass(slots=True)
+class _SearchPrefetch:
+    """Search started speculatively alongside the first model call of a turn."""
+
+    query: str
+    future: Future
+    used: bool = False
+
+
+@dataclass(slots=True)
+class _Turn:
+    """Per-request state shared by the sync and async ask paths."""
+
+    user_message: ChatMessage
+    anchor: tuple[Image.Image, tuple[int, int]] | None
+    include_search_tool: bool
+    prefetch: _SearchPrefetch | None
+    cache_key: tuple[str, ...] | None
+    has_image: bool
+    backend: ModelBackend
+    model: str
+    budget: TurnBudget | None = None
+    usage: dict[str, int] = field(
+        default_factory=lambda: {"input": 0, "output": 0, "cached": 0, "cache_write": 0}
+    )
 
 
 @dataclass
@@ -122,8 +272,10 @@ class UsageStats:
     input_tokens: int = 0
     output_tokens: int = 0
     cached_tokens: int = 0
+    cache_write_tokens: int = 0
     estimated_cost_usd: float = 0.0
     session_total_usd: float = 0.0
+    cache_hit: bool = False
 
 
 class AIAssistant:
@@ -137,11 +289,36 @@ class AIAssistant:
         history_window_turns: int = DEFAULT_HISTORY_WINDOW_TURNS,
         history_summary_every_turns: int = DEFAULT_HISTORY_SUMMARY_EVERY_TURNS,
         history_summary_max_chars: int = DEFAULT_HISTORY_SUMMARY_MAX_CHARS,
+        history_token_budget: int = DEFAULT_HISTORY_TOKEN_BUDGET,
         backend: str = DEFAULT_BACKEND,
         openai_api_key: str | None = None,
         ollama_base_url: str = OLLAMA_BASE_URL,
         openai_base_url: str = OPENAI_BASE_URL,
         backend_timeout_sec: int = 45,
+        image_diff_enabled: bool = True,
+        image_diff_max_area_ratio: float = DEFAULT_DIFF_MAX_AREA_RATIO,
+        history_summarizer_enabled: bool = False,
+        history_summary_model: str = "",
+        tool_call_timeout_sec: float = DEFAULT_TOOL_CALL_TIMEOUT_SEC,
+        deep_search_enabled: bool = False,
+        deep_search_top_k: int = DEEP_SEARCH_TOP_K,
+        deep_search_timeout_sec: float = DEEP_SEARCH_TIMEOUT_SEC,
+        search_prefetch_enabled: bool = False,
+        response_cache_enabled: bool = False,
+        response_cache_ttl_sec: float = DEFAULT_RESPONSE_CACHE_TTL_SEC,
+        response_cache_max_entries: int = DEFAULT_RESPONSE_CACHE_MAX_ENTRIES,
+        backend_max_retries: int = 2,
+        circuit_breaker_failures: int = 3,
+        circuit_breaker_cooldown_sec: float = 30.0,
+        fallback_backend: str = "",
+        fallback_model: str = "",
+        hedge_requests: bool = True,
+        ollama_keep_alive: str | int = "",
+        model_routing_enabled: bool = False,
+        model_routes: dict[str, Any] | None = None,
+        model_routing_short_chars: int = DEFAULT_SHORT_QUESTION_CHARS,
+        model_routing_long_context_tokens: int = DEFAULT_LONG_CONTEXT_TOKENS,
+        backend_instance: ModelBackend | None = None,
     ):
         self.backend_name = str(backend or DEFAULT_BACKEND).lower()
         self._configured_model = model
@@ -159,6 +336,21 @@ class AIAssistant:
         self.history_summary_max_chars = max(
             256, int(history_summary_max_chars or DEFAULT_HISTORY_SUMMARY_MAX_CHARS)
         )
+        self.history_token_budget = max(256, int(history_token_budget or DEFAULT_HISTORY_TOKEN_BUDGET))
+        self.history_summarizer_enabled = bool(history_summarizer_enabled)
+        self.history_summary_model = str(history_summary_model or "").strip()
+        self.tool_call_timeout_sec = max(1.0, float(tool_call_timeout_sec))
+        self.deep_search_enabled = bool(deep_search_enabled)
+        self.deep_search_top_k = max(1, int(deep_search_top_k))
+        self.deep_search_timeout_sec = max(1.0, float(deep_search_timeout_sec))
+        self.search_prefetch_enabled = bool(search_prefetch_enabled)
+        self.response_cache_enabled = bool(response_cache_enabled)
+        self._response_cache: TTLCache[str] = TTLCache(
+            ttl_sec=max(1.0, float(response_cache_ttl_sec)),
+            max_entries=max(1, int(response_cache_max_entries)),
+        )
+        self.image_diff_enabled = bool(image_diff_enabled)
+        self.image_diff_max_area_ratio = min(1.0, max(0.0, float(image_diff_max_area_ratio)))
 
         anthro_key = api_key or os.environ.get("ANTHROPIC_API_KEY", "")
         openai_key = openai_api_key or os.environ.get("OPENAI_API_KEY", "")
@@ -167,28 +359,103 @@ class AIAssistant:
         self._openai_api_key = openai_key
         self._ollama_base_url = ollama_base_url
         self._openai_base_url = openai_base_url
+        self._ollama_keep_alive = ollama_keep_alive
         self._backend_timeout_sec = timeout_sec
-
-        self.backend = build_backend(
-            backend_name=self.backend_name,
-            model=model,
-            anthropic_api_key=anthro_key,
-            openai_api_key=openai_key,
-            ollama_base_url=ollama_base_url,
-            openai_base_url=openai_base_url,
-            timeout_sec=timeout_sec,
+        self._transport_policy = TransportPolicy(
+            max_retries=max(0, int(backend_max_retries)),
+            breaker_failures=max(1, int(circuit_breaker_failures)),
+            breaker_cooldown_sec=max(0.0, float(circuit_breaker_cooldown_sec)),
         )
+
+        self.fallback_backend = str(fallback_backend or "").strip().lower()
+        self.fallback_model = str(fallback_model or "").strip()
+        self.hedge_requests = bool(hedge_requests)
+        if backend_instance is not None:
+            self.backend = backend_instance
+        else:
+            self.backend = self._build_backend(model, anthro_key, openai_key)
         self.backend_name = self.backend.backend_name
         self.model = getattr(self.backend, "model", model)
+        self.model_routing_enabled = bool(model_routing_enabled)
+        self._model_routes = model_routes
+        self._router = ModelRouter(
+            self.model,
+            routes_for_backend(self.backend_name, model_routes),
+            short_question_chars=model_routing_short_chars,
+            long_context_tokens=model_routing_long_context_tokens,
+        )
+        self._routed_backends: dict[str, ModelBackend] = {self.model: self.backend}
 
         self.history: list[ChatMessage] = []
         self._app_type: str = ""
         self._ocr_active_for_turn = False
+        self._low_detail_for_turn = False
         self._history_summary: str = ""
+        self._static_context: ChatMessage | None = None
+        # Background summarizer state: dropped turns not yet covered by a model summary.
+        self._summary_lock = threading.Lock()
+        self._summary_pending: list[ChatMessage] = []
+        self._summary_future: Future | None = None
+        self._summary_covers = 0
+        self._summary_generation = 0
+        self._summary_backend = None
+        self._summary_executor: ThreadPoolExecutor | None = None
+        self._codec_selector = CodecSelector(media_types=self.backend.image_media_types)
+        # Last full screenshot the model has seen, plus its diff thumbnail.
+        self._image_anchor: ChatMessage | None = None
+        self._image_anchor_thumb: Image.Image | None = None
+        self._image_anchor_size: tuple[int, int] = (0, 0)
 
         self._session_cost: float = 0.0
         self._last_usage: UsageStats | None = None
 
+    def _build_backend(self, model: str, anthro_key: str, openai_key: str) -> ModelBackend:
+        """Look up shared backends for this configuration, wrapping a fallback if one is set."""
+        settings = {
+            "anthropic_api_key": anthro_key,
+            "openai_api_key": openai_key,
+            "ollama_base_url": self._ollama_base_url,
+            "openai_base_url": self._openai_base_url,
+            "timeout_sec": self._backend_timeout_sec,
+            "transport_policy": self._transport_policy,
+            "ollama_keep_alive": self._ollama_keep_alive,
+        }
+        backend = shared_backend(backend_name=self.backend_name, model=model, **settings)
+        if not self.fallback_backend:
+            return backend
+        secondary = shared_backend(backend_name=self.fallback_backend, model=self.fallback_model, **settings)
+        return HedgedBackend(backend, secondary, hedge=self.hedge_requests)
+
+    def _backend_for_model(self, model: str) -> ModelBackend:
+        backend = self._routed_backends.get(model)
+        if backend is None:
+            backend = self._build_backend(model, self._anthropic_api_key, self._openai_api_key)
+            self._routed_backends[model] = backend
+        return backend
+
+    def _route_turn(self, question: str, has_image: bool, response_mode: ResponseMode | None) -> RouteChoice:
+        """Choose the model for this turn; routing off always means the configured model."""
+        if not self.model_routing_enabled:
+            return RouteChoice(tier="default", model=self.model, reason="disabled")
+        context_tokens = sum(self._message_tokens(m) for m in self.history)
+        if self._static_context is not None:
+            context_tokens += self._message_tokens(self._static_context)
+        choice = self._router.route(
+            response_mode=response_mode,
+            has_image=has_image,
+            question_chars=len(question),
+            context_tokens=context_tokens,
+        )
+        logger.info(
+            "event=MODEL_ROUTE flow=ask backend=%s tier=%s model=%s reason=%s context_tokens=%d",
+            self.backend_name,
+            choice.tier,
+            choice.model,
+            choice.reason,
+            context_tokens,
+        )
+        return choice
+
     @property
     def client(self):
         # Backward compatibility for tests/legacy modules.
@@ -208,6 +475,10 @@ class AIAssistant:
     def validate_key(self) -> tuple[bool, str]:
         return self.backend.validate()
 
+    def warm_up(self, reason: str = "startup") -> Future | None:
+        """Preload a local model in the background so the first question skips the load."""
+        return self.backend.schedule_warm_up(reason)
+
     def _get_full_system_prompt(self) -> str:
         prompt = self.system_prompt
 
@@ -234,63 +505,152 @@ class AIAssistant:
             ]
         return prompt
 
-    def _image_to_base64(self, img: Image.Image) -> str:
-        preset = _OCR_PRESET if self._ocr_active_for_turn else _IMAGE_PRESETS.get(
-            self._app_type, _DEFAULT_PRESET
-        )
+    def _image_preset(self) -> dict[str, int]:
+        if self._ocr_active_for_turn:
+            return _OCR_PRESET
+        if self._low_detail_for_turn:
+            return _LOW_DETAIL_PRESET
+        return _IMAGE_PRESETS.get(self._app_type, _DEFAULT_PRESET)
+
+    def _codec_app_type(self) -> str:
+        if self._ocr_active_for_turn:
+            return "ocr"
+        if self._low_detail_for_turn:
+            return "low_detail"
+        return self._app_type or "default"
+
+    def encode_image(self, img: Image.Image) -> EncodedImage:
+        """Compress a capture once with the current app preset.
+
+        History and the overlay keep the returned record, so requests reuse
+        its bytes instead of re-encoding pixels every turn.
+        """
+        preset = self._image_preset()
         max_size = preset["max_size"]
         quality = preset["quality"]
 
         w, h = img.size
+        fingerprint = image_fingerprint(img)
         if max(w, h) > max_size:
             scale = max_size / max(w, h)
             img = img.resize((int(w * scale), int(h * scale)), Image.LANCZOS)
 
-        buf = io.BytesIO()
-        img.save(buf, format="JPEG", quality=quality)
-        size_kb = buf.tell() / 1024
+        encoded = self._codec_selector.encode(
+            img,
+            app_type=self._codec_app_type(),
+            quality=quality,
+        )
+        size_kb = len(encoded.data) / 1024
         logger.info(
-            "Image: %dx%d -> %dx%d, %.0fKB (quality=%d, ocr_mode=%s)",
+            "Image: %dx%d -> %dx%d, %.0fKB (codec=%s, quality=%d, ocr_mode=%s)",
             w,
             h,
             img.size[0],
             img.size[1],
             size_kb,
+            encoded.codec,
             quality,
             self._ocr_active_for_turn,
         )
-        return base64.standard_b64encode(buf.getvalue()).decode("utf-8")
+        return EncodedImage(
+            data=encoded.data,
+            width=img.size[0],
+            height=img.size[1],
+            media_type=encoded.media_type,
+            fingerprint=fingerprint,
+            source_size=(w, h),
+            codec=encoded.codec,
+        )
+
+    def _encode_for_turn(self, image: Image.Image | EncodedImage) -> EncodedImage:
+        if not isinstance(image, EncodedImage):
+            return self.encode_image(image)
+        max_size = self._image_preset()["max_size"]
+        if max(image.size) <= max_size:
+            return image
+        # Captured before OCR was known to be active; shrink once to the OCR preset.
+        reencoded = self.encode_image(image.to_pil())
+        return EncodedImage(
+            data=reencoded.data,
+            width=reencoded.width,
+            height=reencoded.height,
+            media_type=reencoded.media_type,
+            fingerprint=image.fingerprint,
+            source_size=image.source_size or image.size,
+            codec=reencoded.codec,
+        )
 
-    def _build_user_content(self, question: str, image: Image.Image | None = None) -> list[dict[str, Any]]:
+    def _build_user_content(
+        self,
+        question: str,
+        image: EncodedImage | Image.Image | None = None,
+    ) -> list[dict[str, Any]]:
         content: list[dict[str, Any]] = []
         if image is not None:
-            b64 = self._image_to_base64(image)
+            if not isinstance(image, EncodedImage):
+                image = self.encode_image(image)
             content.append(
                 {
                     "type": "image",
                     "source": {
                         "type": "base64",
-                        "media_type": "image/jpeg",
-                        "data": b64,
+                        "media_type": image.media_type,
+                        "data": image.b64,
                     },
                 }
             )
         content.append({"type": "text", "text": question})
         return content
 
+    def _message_tokens(self, msg: ChatMessage) -> int:
+        if msg.token_estimate <= 0:
+            # Text only: just the latest turn sends its image (see _build_messages).
+            msg.token_estimate = max(1, estimate_tokens(msg.text))
+        return msg.token_estimate
+
     def _trim_history(self) -> None:
+        """Keep as many recent turns as fit the token budget (and turn ceiling)."""
         user_indices = [i for i, msg in enumerate(self.history) if msg.role == "user"]
-        if len(user_indices) <= self.history_window_turns:
+        if not user_indices:
+            return
+
+        keep_start = user_indices[-1]
+        used = sum(self._message_tokens(m) for m in self.history[keep_start:])
+        retained = 1
+        for pos in range(len(user_indices) - 2, -1, -1):
+            if retained >= self.history_window_turns:
+                break
+            start = user_indices[pos]
+            turn_tokens = sum(self._message_tokens(m) for m in self.history[start:keep_start])
+            if used + turn_tokens > self.history_token_budget:
+                break
+            used += turn_tokens
+            keep_start = start
+            retained += 1
+
+        dropped_turns = len(user_indices) - retained
+        logger.info(
+            "event=HISTORY_WINDOW flow=ask retained_turns=%d dropped_turns=%d est_tokens=%d budget=%d",
+            retained,
+            dropped_turns,
+            used,
+            self.history_token_budget,
+        )
+        if dropped_turns <= 0:
             return
 
-        keep_start = user_indices[-self.history_window_turns]
         dropped = self.history[:keep_start]
         self._update_history_summary(dropped)
         trimmed = self.history[keep_start:]
 
         image_user_indices = [
-            i for i, msg in enumerate(self.history) if msg.role == "user" and msg.image is not None
+            i
+            for i, msg in enumerate(self.history)
+            if msg.role == "user" and msg.image is not None and msg.image_region is None
         ]
+        # Keep the last full-screenshot turn and its answer as text, so the model's
+        # description of the screen survives and the turn stays the diff reference.
+        # Its pixels are not re-sent.
         if image_user_indices:
             image_idx = image_user_indices[-1]
             if image_idx < keep_start:
@@ -319,17 +679,25 @@ class AIAssistant:
         return " | ".join(lines).strip()
 
     def _update_history_summary(self, dropped_messages: list[ChatMessage]) -> None:
-        if not dropped_messages:
-            return
-        user_count = sum(1 for m in dropped_messages if m.role == "user")
-        if user_count <= 0:
+        fresh = [m for m in dropped_messages if not m.summarized]
+        for msg in fresh:
+            msg.summarized = True
+        if not any(m.role == "user" for m in fresh):
             return
-        # Refresh summary only on configured cadence to avoid excessive prompt churn.
+        if self.history_summarizer_enabled:
+            with self._summary_lock:
+                self._summary_pending.extend(fresh)
+            self._schedule_model_summary()
+
+        # Lossy summary is the synchronous fallback until a model summary is ready.
+        # Refresh it only on configured cadence to avoid excessive prompt churn.
         existing_users = sum(1 for m in self.history if m.role == "user")
         if (existing_users % self.history_summary_every_turns) != 0:
             return
+        self._merge_lossy_summary(fresh)
 
-        segment = self._summarize_messages(dropped_messages)
+    def _merge_lossy_summary(self, messages: list[ChatMessage]) -> None:
+        segment = self._summarize_messages(messages)
         if not segment:
             return
         if not self._history_summary:
@@ -340,24 +708,229 @@ class AIAssistant:
             merged = merged[-self.history_summary_max_chars :]
         self._history_summary = merged
 
-    def _build_messages(self, *, include_images: bool = True) -> list[dict[str, Any]]:
-        messages: list[dict[str, Any]] = []
-        for i, msg in enumerate(self.history):
-            if msg.role == "user":
-                is_latest_user = (i == len(self.history) - 1) or all(
-                    m.role == "assistant" for m in self.history[i + 1 :]
-                )
-                img = msg.image if (is_latest_user and include_images) else None
-                messages.append(
-                    {
-                        "role": "user",
-                        "content": self._build_user_content(msg.text, img),
-                    }
+    def _get_summary_backend(self):
+        if self._summary_backend is None:
+            model = (
+                self.history_summary_model
+                or SUMMARY_MODELS.get(self.backend_name)
+                or self.model
+            )
+            self._summary_backend = shared_backend(
+                backend_name=self.backend_name,
+                model=model,
+                anthropic_api_key=self._anthropic_api_key,
+                openai_api_key=self._openai_api_key,
+                ollama_base_url=self._ollama_base_url,
+                openai_base_url=self._openai_base_url,
+                timeout_sec=self._backend_timeout_sec,
+                transport_policy=self._transport_policy,
+                ollama_keep_alive=self._ollama_keep_alive,
+            )
+        return self._summary_backend
+
+    def _schedule_model_summary(self) -> None:
+        """Start a background summary job unless one is already running."""
+        with self._summary_lock:
+            if self._summary_future is not None or not self._summary_pending:
+                return
+            batch = list(self._summary_pending)
+            previous = self._history_summary
+            generation = self._summary_generation
+            if self._summary_executor is None:
+                self._summary_executor = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="history-summary"
                 )
+            self._summary_covers = len(batch)
+            self._summary_future = self._summary_executor.submit(
+                self._run_model_summary, previous, batch, generation
+            )
+
+    def _run_model_summary(
+        self,
+        previous: str,
+        batch: list[ChatMessage],
+        generation: int,
+    ) -> tuple[int, str]:
+        lines = []
+        for msg in batch:
+            text = msg.text.strip()
+            if text:
+                lines.append(f"{msg.role.capitalize()}: {text[:1200]}")
+        prompt = (
+            f"Existing summary:\n{previous or '(none)'}\n\n"
+            "Older turns to fold in:\n" + "\n".join(lines) + "\n\n"
+            f"Return the updated summary in at most {self.history_summary_max_chars} characters."
+        )
+        backend = self._get_summary_backend()
+        response = backend.chat(
+            messages=[{"role": "user", "content": prompt}],
+            system=_SUMMARY_SYSTEM_PROMPT,
+            max_tokens=max(128, self.history_summary_max_chars // 3),
+        )
+        summary = (response.text or "").strip()[: self.history_summary_max_chars]
+        logger.info(
+            "event=HISTORY_SUMMARY flow=background result=%s model=%s turns=%d chars=%d input_tokens=%d output_tokens=%d",
+            "ok" if summary else "empty",
+            getattr(backend, "model", ""),
+            sum(1 for m in batch if m.role == "user"),
+            len(summary),
+            int(response.input_tokens),
+            int(response.output_tokens),
+        )
+        return generation, summary
+
+    def _adopt_ready_summary(self) -> None:
+        """Swap in the newest finished model summary, then queue any newer drops."""
+        with self._summary_lock:
+            future = self._summary_future
+            if future is None or not future.done():
+                return
+            self._summary_future = None
+            covered = self._summary_covers
+            try:
+                generation, summary = future.result()
+            except Exception as exc:
+                logger.warning("event=HISTORY_SUMMARY flow=background result=error error=%s", exc)
+                generation, summary = self._summary_generation, ""
+            if generation != self._summary_generation:
+                return
+            self._summary_pending = self._summary_pending[covered:]
+            if summary:
+                self._history_summary = summary
+                remaining = list(self._summary_pending)
+            else:
+                remaining = []
+        if remaining:
+            # Keep turns dropped while the job ran visible until the next job lands.
+            self._merge_lossy_summary(remaining)
+        self._schedule_model_summary()
+
+    def _wire_for(self, msg: ChatMessage, *, with_image: bool) -> list[WireMessage]:
+        """Return the message in the backend's wire format, converting it only once."""
+        key = (self.backend.backend_name, with_image)
+        cached = msg.wire_cache.get(key)
+        if cached is None:
+            if msg.role == "user":
+                img = msg.image if with_image else None
+                generic = {"role": "user", "content": self._build_user_content(msg.text, img)}
             else:
-                messages.append({"role": "assistant", "content": msg.text})
+                generic = {"role": "assistant", "content": msg.text}
+            cached = self.backend.to_wire(generic)
+            msg.wire_cache[key] = cached
+        return cached
+
+    def set_static_context(self, text: str) -> bool:
+        """Pin session context (app, clipboard, OCR, pages) as the leading user message.
+
+        It stays ahead of the history and outside trimming, so it is never lost
+        and forms a stable, provider-cacheable prefix; follow-up turns only add
+        the question. Returns True when the context changed.
+        """
+        text = text.strip()
+        current = self._static_context.text if self._static_context is not None else ""
+        if text == current:
+            return False
+        self._static_context = ChatMessage(role="user", text=text) if text else None
+        logger.info(
+            "event=STATIC_CONTEXT flow=ask result=%s chars=%d",
+            "updated" if text else "cleared",
+            len(text),
+        )
+        return True
+
+    def _build_messages(self, *, include_images: bool = True) -> list[WireMessage]:
+        """Assemble the request from per-turn wire messages cached on history."""
+        latest_user = -1
+        for i in range(len(self.history) - 1, -1, -1):
+            if self.history[i].role == "user":
+                latest_user = i
+                break
+        # Only the latest turn carries pixels: diff turns send just their crop (or a note)
+        # and lean on the model's earlier answer about the reference screenshot.
+        messages: list[WireMessage] = []
+        if self._static_context is not None:
+            messages.extend(self._wire_for(self._static_context, with_image=False))
+        for i, msg in enumerate(self.history):
+            with_image = (
+                msg.role == "user"
+                and msg.image is not None
+                and include_images
+                and i == latest_user
+            )
+            messages.extend(self._wire_for(msg, with_image=with_image))
         return messages
 
+    def _prepare_turn_message(
+        self,
+        question: str,
+        image: Image.Image | EncodedImage | None,
+    ) -> tuple[ChatMessage, tuple[Image.Image, tuple[int, int]] | None]:
+        """Build the user message, diffing a follow-up capture against the last full image.
+
+        Returns the message plus the diff thumbnail and the size of the frame it
+        was taken from, to adopt as the next reference when this turn carries a
+        full screenshot. Both are in the coordinates of ``as_pil(image)``, the
+        frame later captures are compared in.
+        """
+        if image is None:
+            return ChatMessage(role="user", text=question), None
+        if not (self.image_diff_enabled and self.backend.supports_vision):
+            return ChatMessage(role="user", text=question, image=self._encode_for_turn(image)), None
+
+        frame = as_pil(image)
+        anchor = self._image_anchor
+        if (
+            anchor is None
+            or self._image_anchor_thumb is None
+            or not any(m is anchor for m in self.history)
+        ):
+            full = ChatMessage(role="user", text=question, image=self._encode_for_turn(image))
+            return full, (diff_thumbnail(frame), frame.size)
+
+        diff = diff_frames(
+            self._image_anchor_thumb,
+            self._image_anchor_size,
+            frame,
+            max_area_ratio=self.image_diff_max_area_ratio,
+        )
+        w, h = frame.size
+        logger.info(
+            "Follow-up image diff: kind=%s area_ratio=%.3f box=%s",
+            diff.kind,
+            diff.area_ratio,
+            diff.box,
+        )
+        if diff.kind == "unchanged":
+            note = "[Screen update] The window looks the same as in the earlier screenshot."
+            return ChatMessage(role="user", text=f"{note}\n\n{question}", diff_turn=True), None
+        if diff.kind == "region" and diff.box is not None:
+            left, top, right, bottom = diff.box
+            note = (
+                f"[Screen update] Only part of the {w}x{h} window changed since the earlier "
+                f"screenshot. The attached image is the changed region at x={left}, y={top}, "
+                f"width={right - left}, height={bottom - top}."
+            )
+            crop = ChatMessage(
+                role="user",
+                text=f"{note}\n\n{question}",
+                image=self.encode_image(frame.crop(diff.box)),
+                image_region=diff.box,
+                diff_turn=True,
+            )
+            return crop, None
+        full = ChatMessage(role="user", text=question, image=self._encode_for_turn(image))
+        return full, (diff_thumbnail(frame), frame.size)
+
+    def _remember_image_anchor(
+        self,
+        message: ChatMessage,
+        anchor: tuple[Image.Image, tuple[int, int]] | None,
+    ) -> None:
+        if anchor is None or message.image is None or message.image_region is not None:
+            return
+        self._image_anchor = message
+        self._image_anchor_thumb, self._image_anchor_size = anchor
+
     def _should_include_search(self, question: str) -> bool:
         q_lower = question.lower()
         if any(pattern.search(q_lower) for pattern in _SCREEN_SIGNALS):
@@ -381,14 +954,18 @@ class AIAssistant:
         input_tokens: int,
         output_tokens: int,
         cached_tokens: int = 0,
+        cache_write_tokens: int = 0,
+        model: str | None = None,
     ) -> float:
         if self.backend_name == "ollama":
             return 0.0
-        pricing = _PRICING_PER_MILLION.get(self.model, _DEFAULT_PRICING)
+        pricing = _PRICING_PER_MILLION.get(model or self.model, _DEFAULT_PRICING)
         normal_input = max(input_tokens - cached_tokens, 0)
         return (
             (normal_input / 1_000_000) * pricing["input"]
             + (cached_tokens / 1_000_000) * pricing["input"] * 0.1
+            # Cache writes bill at 1.25x; the base share is already in normal_input.
+            + (cache_write_tokens / 1_000_000) * pricing["input"] * 0.25
             + (output_tokens / 1_000_000) * pricing["output"]
         )
 
@@ -396,6 +973,7 @@ class AIAssistant:
         turn_usage["input"] += int(response.input_tokens)
         turn_usage["output"] += int(response.output_tokens)
         turn_usage["cached"] += int(response.cached_tokens)
+        turn_usage["cache_write"] += int(response.cache_write_tokens)
         logger.info(
             "Tokens - input: %d (cached: %d), output: %d",
             int(response.input_tokens),
@@ -403,140 +981,572 @@ class AIAssistant:
             int(response.output_tokens),
         )
 
-    def _finalize_usage(self, turn_usage: dict[str, int]) -> None:
+    def _finalize_usage(self, turn_usage: dict[str, int], model: str | None = None) -> None:
         cost = self._estimate_cost(
             input_tokens=turn_usage["input"],
             output_tokens=turn_usage["output"],
             cached_tokens=turn_usage["cached"],
+            cache_write_tokens=turn_usage["cache_write"],
+            model=model,
         )
         self._session_cost += cost
         self._last_usage = UsageStats(
             input_tokens=turn_usage["input"],
             output_tokens=turn_usage["output"],
             cached_tokens=turn_usage["cached"],
+            cache_write_tokens=turn_usage["cache_write"],
             estimated_cost_usd=cost,
             session_total_usd=self._session_cost,
         )
+        if turn_usage["input"]:
+            logger.info(
+                "event=PROMPT_CACHE flow=ask backend=%s input_tokens=%d cache_read_tokens=%d "
+                "cache_write_tokens=%d read_ratio=%.2f",
+                self.backend_name,
+                turn_usage["input"],
+                turn_usage["cached"],
+                turn_usage["cache_write"],
+                turn_usage["cached"] / turn_usage["input"],
+            )
+
+    def _tool_handlers(self) -> dict[str, Callable[[dict[str, Any]], str]]:
+        if not self.deep_search_enabled:
+            return TOOL_HANDLERS
+        # Deep mode reads the top result pages so one round usually suffices.
+        deep = partial(
+            _run_deep_search,
+            top_k=self.deep_search_top_k,
+            timeout_sec=self.deep_search_timeout_sec,
+        )
+        return {**TOOL_HANDLERS, SEARCH_TOOL["name"]: deep}
+
+    def _start_search_prefetch(self, query: str) -> _SearchPrefetch:
+        max_results = self.deep_search_top_k if self.deep_search_enabled else 3
+        future = _tool_executor.submit(search, query, max_results)
+        return _SearchPrefetch(query=query, future=future)
+
+    def _prefetched_handler(
+        self,
+        call: ToolCall,
+        prefetch: _SearchPrefetch | None,
+    ) -> Callable[[dict[str, Any]], str] | None:
+        """Return a handler that reuses the prefetch when this call's query is close enough."""
+        if prefetch is None or prefetch.used or call.name != SEARCH_TOOL["name"]:
+            return None
+        query = str(call.input.get("query", "")).strip()
+        similarity = query_similarity(prefetch.query, query)
+        hit = similarity >= PREFETCH_SIMILARITY
+        logger.info(
+            "event=SEARCH_PREFETCH flow=tool result=%s similarity=%.2f",
+            "hit" if hit else "miss",
+            similarity,
+        )
+        if not hit:
+            return None
+        prefetch.used = True
+        future = prefetch.future
+        if self.deep_search_enabled:
+            return lambda tool_input: _run_deep_search(
+                tool_input,
+                top_k=self.deep_search_top_k,
+                timeout_sec=self.deep_search_timeout_sec,
+                results=future.result(),
+            )
+        return lambda _tool_input: format_results(future.result())
+
+    def _tool_error_block(self, call: ToolCall, message: str) -> dict[str, Any]:
+        return {"type": "tool_result", "tool_use_id": call.id, "content": message, "is_error": True}
+
+    def _tool_timeout_message(self, call: ToolCall, timeout_sec: float) -> str:
+        return f"Tool '{call.name}' timed out after {timeout_sec:.0f}s."
+
+    def _log_tool_round(self, calls: list[ToolCall], timeouts: int, started: float) -> None:
+        logger.info(
+            "event=TOOL_ROUND flow=ask calls=%d timeouts=%d duration_ms=%d",
+            len(calls),
+            timeouts,
+            int((time.monotonic() - started) * 1000),
+        )
+
+    def _run_tool_calls(
+        self,
+        calls: list[ToolCall],
+        prefetch: _SearchPrefetch | None = None,
+        timeout_sec: float | None = None,
+    ) -> list[dict[str, Any]]:
+        """Run one round of tool calls concurrently; results keep the call order."""
+        if not calls:
+            return []
+        handlers = self._tool_handlers()
+        timeout_sec = timeout_sec or self.tool_call_timeout_sec
+        started = time.monotonic()
+        deadline = started + timeout_sec
+        futures = []
+        for call in calls:
+            handler = self._prefetched_handler(call, prefetch) or handlers[call.name]
+            futures.append(_tool_executor.submit(handler, call.input))
+
+        results: list[dict[str, Any]] = []
+        timeouts = 0
+        for call, future in zip(calls, futures):
+            try:
+                content = future.result(timeout=max(0.0, deadline - time.monotonic()))
+                results.append({"type": "tool_result", "tool_use_id": call.id, "content": content})
+            except FutureTimeoutError:
+                future.cancel()
+                timeouts += 1
+                results.append(self._tool_error_block(call, self._tool_timeout_message(call, timeout_sec)))
+            except Exception as exc:
+                logger.warning("Tool '%s' failed: %s", call.name, exc)
+                results.append(self._tool_error_block(call, f"Tool '{call.name}' failed: {exc}"))
+        self._log_tool_round(calls, timeouts, started)
+        return results
+
+    async def _arun_tool_calls(
+        self,
+        calls: list[ToolCall],
+        prefetch: _SearchPrefetch | None = None,
+        timeout_sec: float | None = None,
+    ) -> list[dict[str, Any]]:
+        """Async twin of :meth:`_run_tool_calls` built on ``asyncio.gather``."""
+        if not calls:
+            return []
+        handlers = self._tool_handlers()
+        timeout_sec = timeout_sec or self.tool_call_timeout_sec
+        started = time.monotonic()
+        timeouts = 0
+
+        async def _run(call: ToolCall) -> dict[str, Any]:
+            nonlocal timeouts
+            handler = self._prefetched_handler(call, prefetch) or handlers[call.name]
+            try:
+                content = await asyncio.wait_for(
+                    asyncio.to_thread(handler, call.input),
+                    timeout=timeout_sec,
+                )
+                return {"type": "tool_result", "tool_use_id": call.id, "content": content}
+            except asyncio.TimeoutError:
+                timeouts += 1
+                return self._tool_error_block(call, self._tool_timeout_message(call, timeout_sec))
+            except Exception as exc:
+                logger.warning("Tool '%s' failed: %s", call.name, exc)
+                return self._tool_error_block(call, f"Tool '{call.name}' failed: {exc}")
+
+        results = list(await asyncio.gather(*(_run(call) for call in calls)))
+        self._log_tool_round(calls, timeouts, started)
+        return results
+
+    def _tool_round_calls(self, response: BackendResponse, round_num: int) -> list[ToolCall]:
+        for call in response.tool_calls:
+            logger.info("Tool call [round %d]: %s(%s)", round_num + 1, call.name, call.input)
+        return [call for call in response.tool_calls if call.name in TOOL_HANDLERS]
+
+    def _append_tool_round(
+        self,
+        messages: list[dict[str, Any] | WireMessage],
+        calls: list[ToolCall],
+        tool_results: list[dict[str, Any]],
+    ) -> None:
+        assistant_tool_blocks = [
+            {"type": "tool_use", "id": call.id, "name": call.name, "input": call.input}
+            for call in calls
+        ]
+        # Convert each round once so later rounds only serialize the new tail.
+        messages.extend(self.backend.to_wire({"role": "assistant", "content": assistant_tool_blocks}))
+        messages.extend(self.backend.to_wire({"role": "user", "content": tool_results}))
+
+    def _tool_final_text(self, response: BackendResponse) -> str:
+        final_text = self._extract_text_blocks(response)
+        return final_text if final_text else "(No response after search)"
 
     def _handle_tool_call(
         self,
         response: BackendResponse,
-        messages: list[dict[str, Any]],
-        include_search_tool: bool,
-        turn_usage: dict[str, int],
+        messages: list[dict[str, Any] | WireMessage],
+        turn: _Turn,
     ) -> str:
-        max_rounds = 3
-
-        for round_num in range(max_rounds):
-            tool_results: list[dict[str, Any]] = []
-            assistant_tool_blocks: list[dict[str, Any]] = []
-            for call in response.tool_calls:
-                logger.info("Tool call [round %d]: %s(%s)", round_num + 1, call.name, call.input)
-                if call.name != "web_search":
-                    continue
-                query = str(call.input.get("query", "")).strip()
-                results = search(query)
-                assistant_tool_blocks.append(
-                    {
-                        "type": "tool_use",
-                        "id": call.id,
-                        "name": call.name,
-                        "input": call.input,
-                    }
-                )
-                tool_results.append(
-                    {
-                        "type": "tool_result",
-                        "tool_use_id": call.id,
-                        "content": format_results(results),
-                    }
-                )
-
+        plain_len = len(messages)
+        tool_texts: list[str] = []
+        for round_num in range(_MAX_TOOL_ROUNDS):
+            calls = self._tool_round_calls(response, round_num)
+            tool_results = self._run_tool_calls(calls, turn.prefetch, self._tool_timeout(turn))
             if not tool_results:
                 break
+            tool_texts.extend(str(result["content"]) for result in tool_results)
+            if self._must_answer_now(turn):
+                final_kwargs = self._final_chat_kwargs(messages[:plain_len], tool_texts, turn)
+                response = turn.backend.chat(**final_kwargs)
+                self._accumulate_usage(response, turn.usage)
+                break
+            self._append_tool_round(messages, calls, tool_results)
 
-            messages.append({"role": "assistant", "content": assistant_tool_blocks})
-            messages.append({"role": "user", "content": tool_results})
+            response = turn.backend.chat(**self._chat_kwargs(messages, turn))
+            self._accumulate_usage(response, turn.usage)
+            if response.stop_reason != "tool_use":
+                break
+        return self._tool_final_text(response)
 
-            response = self.backend.chat(
-                messages=messages,
-                max_tokens=self.max_tokens,
-                system=self._get_system_payload(),
-                tools=[SEARCH_TOOL] if include_search_tool else None,
-            )
-            self._accumulate_usage(response, turn_usage)
+    async def _ahandle_tool_call(
+        self,
+        response: BackendResponse,
+        messages: list[dict[str, Any] | WireMessage],
+        turn: _Turn,
+    ) -> str:
+        plain_len = len(messages)
+        tool_texts: list[str] = []
+        for round_num in range(_MAX_TOOL_ROUNDS):
+            calls = self._tool_round_calls(response, round_num)
+            tool_results = await self._arun_tool_calls(calls, turn.prefetch, self._tool_timeout(turn))
+            if not tool_results:
+                break
+            tool_texts.extend(str(result["content"]) for result in tool_results)
+            if self._must_answer_now(turn):
+                final_kwargs = self._final_chat_kwargs(messages[:plain_len], tool_texts, turn)
+                response = await turn.backend.achat(**final_kwargs)
+                self._accumulate_usage(response, turn.usage)
+                break
+            self._append_tool_round(messages, calls, tool_results)
 
+            response = await turn.backend.achat(**self._chat_kwargs(messages, turn))
+            self._accumulate_usage(response, turn.usage)
             if response.stop_reason != "tool_use":
                 break
+        return self._tool_final_text(response)
 
-        final_text = self._extract_text_blocks(response)
-        return final_text if final_text else "(No response after search)"
+    def _response_cache_key(
+        self,
+        question: str,
+        image: Image.Image | EncodedImage | None,
+        search_hint_question: str | None,
+        context_digest: str,
+        history: list[ChatMessage] | None = None,
+    ) -> tuple[str, ...]:
+        asked = " ".join((search_hint_question or question).lower().split())
+        if not context_digest or search_hint_question is None:
+            # Without a caller-provided digest the full prompt text stands in for context.
+            context_digest = hashlib.sha1(question.encode("utf-8")).hexdigest()
+        if image is None:
+            image_key = ""
+        elif isinstance(image, EncodedImage):
+            image_key = image.fingerprint
+        else:
+            image_key = image_fingerprint(image)
+        history_key = self._history_digest(self.history if history is None else history)
+        identity = (self.backend_name, self.model, self.personality)
+        return (asked, context_digest, image_key, history_key, *identity)
+
+    @staticmethod
+    def _history_digest(history: list[ChatMessage]) -> str:
+        """Conversation state a follow-up depends on: the last assistant reply, or "" for a fresh chat."""
+        for message in reversed(history):
+            if message.role == "assistant":
+                return hashlib.sha1(message.text.encode("utf-8")).hexdigest()
+        return ""
+
+    def _cached_answer(
+        self,
+        cache_key: tuple[str, ...],
+        question: str,
+        image: Image.Image | EncodedImage | None,
+        search_hint_question: str | None,
+        context_digest: str,
+    ) -> str | None:
+        """Cached answer for this turn, including a double submit of the question just answered."""
+        answer = self._response_cache.get(cache_key)
+        if answer is not None or len(self.history) < 2 or self.history[-1].role != "assistant":
+            return answer
+        # The last exchange may be this same question, cached under the state before it.
+        earlier = self._response_cache_key(
+            question, image, search_hint_question, context_digest, self.history[:-2]
+        )
+        answer = self._response_cache.get(earlier)
+        if answer is None or answer != self.history[-1].text:
+            return None
+        self._response_cache.put(cache_key, answer)
+        return answer
+
+    def _answer_from_cache(self, question: str, answer: str) -> str:
+        self.history.append(ChatMessage(role="user", text=question))
+        self._trim_history()
+        self.history.append(ChatMessage(role="assistant", text=answer))
+        self._last_usage = UsageStats(session_total_usd=self._session_cost, cache_hit=True)
+        return answer
+
+    def _begin_turn(
+        self,
+        question: str,
+        image: Image.Image | EncodedImage | None,
+        *,
+        search_hint_question: str | None,
+        force_search_tool: bool,
+        ocr_text: str,
+        context_digest: str,
+        budget: TurnBudget | None = None,
+        static_context: str | None = None,
+        response_mode: ResponseMode | None = None,
+    ) -> _Turn | str:
+        """Record the user turn and prepare request state; a str is a cached answer.
+
+        ``static_context`` replaces the pinned session context; None keeps it.
+        ``response_mode`` feeds model routing when it is enabled.
+        """
+        if static_context is not None:
+            self.set_static_context(static_context)
+        hint = search_hint_question or question
+        cache_key = None
+        if self.response_cache_enabled:
+            if force_search_tool or self._should_include_search(hint):
+                logger.info("event=RESPONSE_CACHE flow=ask result=bypass reason=search_turn")
+            else:
+                cache_key = self._response_cache_key(question, image, search_hint_question, context_digest)
+                cached_answer = self._cached_answer(
+                    cache_key, question, image, search_hint_question, context_digest
+                )
+                if cached_answer is not None:
+                    logger.info("event=RESPONSE_CACHE flow=ask result=hit key=%s", cache_key[1][:8])
+                    return self._answer_from_cache(question, cached_answer)
+                logger.info("event=RESPONSE_CACHE flow=ask result=miss key=%s", cache_key[1][:8])
+
+        self._ocr_active_for_turn = bool(ocr_text.strip())
+        self._low_detail_for_turn = image is not None and budget is not None and not budget.allows("image")
+        user_message, anchor = self._prepare_turn_message(question, image)
+        self.history.append(user_message)
+        self._trim_history()
+        self._adopt_ready_summary()
+        route = self._route_turn(hint, image is not None, response_mode)
+        backend = self._backend_for_model(route.model)
+
+        include_search_tool = backend.supports_tools and (
+            force_search_tool or self._should_include_search(hint)
+        )
+        if include_search_tool and budget is not None and not budget.allows("search"):
+            include_search_tool = False
+        prefetch = None
+        if include_search_tool and self.search_prefetch_enabled and self._should_include_search(hint):
+            # Keyword-matched turns almost always search; overlap it with the first call.
+            prefetch = self._start_search_prefetch(hint)
+        return _Turn(
+            user_message=user_message,
+            anchor=anchor,
+            include_search_tool=include_search_tool,
+            prefetch=prefetch,
+            cache_key=cache_key,
+            has_image=image is not None,
+            backend=backend,
+            model=route.model,
+            budget=budget,
+        )
+
+    def _first_request_messages(self, turn: _Turn) -> list[dict[str, Any] | WireMessage]:
+        messages: list[dict[str, Any] | WireMessage] = list(
+            self._build_messages(include_images=turn.backend.supports_vision)
+        )
+        if turn.has_image and not turn.backend.supports_vision:
+            logger.info("Backend '%s' does not support vision; dropping image.", self.backend_name)
+        logger.info(
+            "Sending request (backend=%s, model=%s, max_tokens=%d, history=%d, tools=%s)",
+            self.backend_name,
+            turn.model,
+            self.max_tokens,
+            len(self.history),
+            "web_search" if turn.include_search_tool else "none",
+        )
+        return messages
+
+    def _chat_kwargs(self, messages: list[dict[str, Any] | WireMessage], turn: _Turn) -> dict[str, Any]:
+        kwargs: dict[str, Any] = {
+            "messages": messages,
+            "max_tokens": self.max_tokens,
+            "system": self._get_system_payload(),
+            "tools": [SEARCH_TOOL] if turn.include_search_tool else None,
+        }
+        if turn.budget is not None and turn.budget.enabled:
+            kwargs["timeout_sec"] = turn.budget.backend_timeout(self._backend_timeout_sec)
+        return kwargs
+
+    def _must_answer_now(self, turn: _Turn) -> bool:
+        """Whether the budget only leaves the reserve for one last call without tools."""
+        return turn.budget is not None and turn.budget.enabled and not turn.budget.allows("search")
+
+    def _final_chat_kwargs(
+        self,
+        messages: list[dict[str, Any] | WireMessage],
+        tool_texts: list[str],
+        turn: _Turn,
+    ) -> dict[str, Any]:
+        """Fold gathered tool results into plain text and ask for an answer without tools.
+
+        ``messages`` must not contain tool blocks, since no tools are declared.
+        """
+        note = (
+            "[Search results]\n" + "\n\n".join(tool_texts)
+            + "\n\nAnswer now from these results; no further searches are possible."
+        )
+        final = list(messages) + turn.backend.to_wire(
+            {"role": "user", "content": [{"type": "text", "text": note}]}
+        )
+        kwargs = self._chat_kwargs(final, turn)
+        kwargs["tools"] = None
+        kwargs["timeout_sec"] = turn.budget.final_timeout(self._backend_timeout_sec)
+        logger.info(
+            "event=TURN_BUDGET flow=ask result=final_call timeout_ms=%d",
+            int(kwargs["timeout_sec"] * 1000),
+        )
+        return kwargs
+
+    def _tool_timeout(self, turn: _Turn) -> float:
+        if turn.budget is None or not turn.budget.enabled:
+            return self.tool_call_timeout_sec
+        return turn.budget.stage_timeout(self.tool_call_timeout_sec)
+
+    def _complete_turn(self, turn: _Turn, answer: str, used_tools: bool) -> str:
+        self._finalize_usage(turn.usage, model=turn.model)
+        self.history.append(ChatMessage(role="assistant", text=answer))
+        self._remember_image_anchor(turn.user_message, turn.anchor)
+        if turn.cache_key is not None and answer and not used_tools:
+            self._response_cache.put(turn.cache_key, answer)
+        return answer
+
+    def _abort_turn(self, turn: _Turn) -> None:
+        if self.history and self.history[-1] is turn.user_message:
+            self.history.pop()
 
     def ask(
         self,
         question: str,
-        image: Image.Image | None = None,
+        image: Image.Image | EncodedImage | None = None,
         *,
         search_hint_question: str | None = None,
         force_search_tool: bool = False,
         ocr_text: str = "",
+        context_digest: str = "",
+        cancel_token: Any = None,
+        budget: TurnBudget | None = None,
+        static_context: str | None = None,
+        response_mode: ResponseMode | None = None,
     ) -> str:
-        self._ocr_active_for_turn = bool(ocr_text.strip())
-        self.history.append(ChatMessage(role="user", text=question, image=image))
-        self._trim_history()
+        """Answer one turn. With a ``cancel_token`` (anything with ``is_set``) the
+        request runs on the async path and setting the token aborts it mid-flight,
+        raising :class:`RequestCancelled`."""
+        turn = self._begin_turn(
+            question,
+            image,
+            search_hint_question=search_hint_question,
+            force_search_tool=force_search_tool,
+            ocr_text=ocr_text,
+            context_digest=context_digest,
+            budget=budget,
+            static_context=static_context,
+            response_mode=response_mode,
+        )
+        if isinstance(turn, str):
+            return turn
+        if cancel_token is not None:
+            return self._run_cancellable(turn, cancel_token)
+        try:
+            messages = self._first_request_messages(turn)
+            response = turn.backend.chat(**self._chat_kwargs(messages, turn))
+            self._accumulate_usage(response, turn.usage)
 
-        include_search_tool = (
-            self.backend.supports_tools
-            and (force_search_tool or self._should_include_search(search_hint_question or question))
+            used_tools = response.stop_reason == "tool_use" and turn.include_search_tool
+            if used_tools:
+                answer = self._handle_tool_call(response, messages, turn)
+            else:
+                answer = self._extract_text_blocks(response)
+            return self._complete_turn(turn, answer, used_tools)
+        except Exception:
+            logger.exception("Assistant request failed")
+            self._abort_turn(turn)
+            raise
+        finally:
+            self._ocr_active_for_turn = False
+            self._low_detail_for_turn = False
+
+    def _run_cancellable(self, turn: _Turn, cancel_token: Any) -> str:
+        future = _async_loop.submit(self._arun_turn(turn))
+        while True:
+            try:
+                return future.result(timeout=_CANCEL_POLL_SEC)
+            except FutureTimeoutError:
+                if not cancel_token.is_set():
+                    continue
+            if future.cancel():
+                # The task unwinds on the loop thread; drop the turn here so the
+                # caller sees consistent history as soon as ask() returns.
+                self._abort_turn(turn)
+                self._ocr_active_for_turn = False
+                self._low_detail_for_turn = False
+                raise RequestCancelled("Request cancelled.")
+
+    async def aask(
+        self,
+        question: str,
+        image: Image.Image | EncodedImage | None = None,
+        *,
+        search_hint_question: str | None = None,
+        force_search_tool: bool = False,
+        ocr_text: str = "",
+        context_digest: str = "",
+        budget: TurnBudget | None = None,
+        static_context: str | None = None,
+        response_mode: ResponseMode | None = None,
+    ) -> str:
+        """Async :meth:`ask`; cancelling the task drops the unanswered user turn."""
+        turn = self._begin_turn(
+            question,
+            image,
+            search_hint_question=search_hint_question,
+            force_search_tool=force_search_tool,
+            ocr_text=ocr_text,
+            context_digest=context_digest,
+            budget=budget,
+            static_context=static_context,
+            response_mode=response_mode,
         )
-        turn_usage = {"input": 0, "output": 0, "cached": 0}
+        if isinstance(turn, str):
+            return turn
+        return await self._arun_turn(turn)
 
+    async def _arun_turn(self, turn: _Turn) -> str:
         try:
-            messages = self._build_messages(include_images=self.backend.supports_vision)
-            if image is not None and not self.backend.supports_vision:
-                logger.info("Backend '%s' does not support vision; dropping image.", self.backend_name)
+            messages = self._first_request_messages(turn)
+            response = await turn.backend.achat(**self._chat_kwargs(messages, turn))
+            self._accumulate_usage(response, turn.usage)
 
+            used_tools = response.stop_reason == "tool_use" and turn.include_search_tool
+            if used_tools:
+                answer = await self._ahandle_tool_call(response, messages, turn)
+            else:
+                answer = self._extract_text_blocks(response)
+            return self._complete_turn(turn, answer, used_tools)
+        except asyncio.CancelledError:
             logger.info(
-                "Sending request (backend=%s, model=%s, max_tokens=%d, history=%d, tools=%s)",
+                "event=ASK_CANCELLED flow=ask backend=%s input_tokens=%d",
                 self.backend_name,
-                self.model,
-                self.max_tokens,
-                len(self.history),
-                "web_search" if include_search_tool else "none",
+                turn.usage["input"],
             )
-
-            response = self.backend.chat(
-                messages=messages,
-                max_tokens=self.max_tokens,
-                system=self._get_system_payload(),
-                tools=[SEARCH_TOOL] if include_search_tool else None,
-            )
-            self._accumulate_usage(response, turn_usage)
-
-            if response.stop_reason == "tool_use" and include_search_tool:
-                answer = self._handle_tool_call(
-                    response,
-                    messages,
-                    include_search_tool,
-                    turn_usage,
-                )
-            else:
-                answer = self._extract_text_blocks(response)
-
-            self._finalize_usage(turn_usage)
-            self.history.append(ChatMessage(role="assistant", text=answer))
-            return answer
+            self._abort_turn(turn)
+            raise
         except Exception:
             logger.exception("Assistant request failed")
-            if self.history and self.history[-1].role == "user":
-                self.history.pop()
+            self._abort_turn(turn)
             raise
         finally:
             self._ocr_active_for_turn = False
+            self._low_detail_for_turn = False
 
     def clear_history(self):
         self.history.clear()
+        self._static_context = None
+        self._response_cache.clear()
         self._history_summary = ""
+        with self._summary_lock:
+            self._summary_pending = []
+            self._summary_future = None
+            self._summary_generation += 1
+        self._image_anchor = None
+        self._image_anchor_thumb = None
+        self._image_anchor_size = (0, 0)
 
     def spawn_with_overrides(
         self,
@@ -555,7 +1565,32 @@ class AIAssistant:
             history_window_turns=self.history_window_turns,
             history_summary_every_turns=self.history_summary_every_turns,
             history_summary_max_chars=self.history_summary_max_chars,
+            history_token_budget=self.history_token_budget,
             ollama_base_url=self._ollama_base_url,
             openai_base_url=self._openai_base_url,
             backend_timeout_sec=self._backend_timeout_sec,
+            image_diff_enabled=self.image_diff_enabled,
+            image_diff_max_area_ratio=self.image_diff_max_area_ratio,
+            history_summarizer_enabled=self.history_summarizer_enabled,
+            history_summary_model=self.history_summary_model,
+            tool_call_timeout_sec=self.tool_call_timeout_sec,
+            deep_search_enabled=self.deep_search_enabled,
+            deep_search_top_k=self.deep_search_top_k,
+            deep_search_timeout_sec=self.deep_search_timeout_sec,
+            search_prefetch_enabled=self.search_prefetch_enabled,
+            response_cache_enabled=self.response_cache_enabled,
+            response_cache_ttl_sec=self._response_cache.ttl_sec,
+            response_cache_max_entries=self._response_cache.max_entries,
+            backend_max_retries=self._transport_policy.max_retries,
+            circuit_breaker_failures=self._transport_policy.breaker_failures,
+            circuit_breaker_cooldown_sec=self._transport_policy.breaker_cooldown_sec,
+            fallback_backend=self.fallback_backend,
+            fallback_model=self.fallback_model,
+            hedge_requests=self.hedge_requests,
+            ollama_keep_alive=self._ollama_keep_alive,
+            model_routing_enabled=self.model_routing_enabled,
+            model_routes=self._model_routes,
+            model_routing_short_chars=self._router.short_question_chars,
+            model_routing_long_context_tokens=self._router.long_context_tokens,
+            backend_instance=self.backend,
         )
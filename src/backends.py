@@ -2,15 +2,22 @@
 
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from dataclasses import dataclass
-from typing import Any
+from typing import Any, Callable
 from urllib.error import HTTPError, URLError
 from urllib.request import Request, urlopen
 
 import anthropic
 
+from .transport import Transport, TransportPolicy, async_http_request, new_async_http_client
+
 logger = logging.getLogger(__name__)
 
 DEFAULT_BACKEND = "anthropic"
@@ -19,9 +26,27 @@ DEFAULT_MODELS = {
     "openai": "gpt-4o-mini",
     "ollama": "llava:13b",
 }
+# Cheaper models used for background chores such as history summaries.
+# Ollama runs locally, so it keeps the configured model.
+SUMMARY_MODELS = {
+    "anthropic": "claude-haiku-4-5-20251001",
+    "openai": "gpt-4o-mini",
+}
+
+# Anthropic rejects requests with more cache_control breakpoints than this.
+MAX_CACHE_BREAKPOINTS = 4
+# A user turn at least this long (or carrying an image) is worth its own breakpoint.
+CACHE_LARGE_TURN_MIN_CHARS = 4000
 
 OPENAI_BASE_URL = "https://api.openai.com/v1"
 OLLAMA_BASE_URL = "http://127.0.0.1:11434"
+OLLAMA_PS_TIMEOUT_SEC = 2.0
+# Ollama's 400 body for a model without tool support: "<model> does not support tools".
+_OLLAMA_NO_TOOLS_ERROR = "does not support tools"
+# A wake-up within this long of the last warm-up skips the residency check entirely.
+WARM_UP_MIN_INTERVAL_SEC = 30.0
+
+_warm_up_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="backend-warm-up")
 
 
 @dataclass(slots=True)
@@ -31,6 +56,26 @@ class ToolCall:
     input: dict[str, Any]
 
 
+@dataclass(slots=True)
+class WireMessage:
+    """One conversation message already converted to a backend's request format.
+
+    ``source`` keeps the generic message so another backend type can still
+    convert it; ``encoded`` caches the JSON text so HTTP backends serialize
+    each stored turn only once.
+    """
+
+    backend: str
+    data: dict[str, Any]
+    source: dict[str, Any]
+    encoded: str = ""
+
+    def to_json(self) -> str:
+        if not self.encoded:
+            self.encoded = json.dumps(self.data)
+        return self.encoded
+
+
 @dataclass(slots=True)
 class BackendResponse:
     text: str
@@ -39,12 +84,16 @@ class BackendResponse:
     input_tokens: int = 0
     output_tokens: int = 0
     cached_tokens: int = 0
+    cache_write_tokens: int = 0
+    # Set by composite backends to the backend that produced this answer.
+    served_by: str = ""
 
 
 class ModelBackend:
     supports_tools: bool = False
     supports_vision: bool = False
     backend_name: str = ""
+    image_media_types: frozenset[str] = frozenset({"image/jpeg", "image/png", "image/webp"})
 
     def chat(
         self,
@@ -53,12 +102,76 @@ class ModelBackend:
         system: list[dict[str, Any]] | str,
         max_tokens: int,
         tools: list[dict[str, Any]] | None = None,
+        timeout_sec: float | None = None,
     ) -> BackendResponse:
         raise NotImplementedError
 
+    async def achat(
+        self,
+        *,
+        messages: list[dict[str, Any]],
+        system: list[dict[str, Any]] | str,
+        max_tokens: int,
+        tools: list[dict[str, Any]] | None = None,
+        timeout_sec: float | None = None,
+    ) -> BackendResponse:
+        """Async chat; backends without a native client run ``chat`` on a worker thread."""
+        kwargs: dict[str, Any] = {
+            "messages": messages,
+            "system": system,
+            "max_tokens": max_tokens,
+            "tools": tools,
+        }
+        if timeout_sec is not None:
+            kwargs["timeout_sec"] = timeout_sec
+        return await asyncio.to_thread(self.chat, **kwargs)
+
     def validate(self) -> tuple[bool, str]:
         raise NotImplementedError
 
+    def schedule_warm_up(self, reason: str = "startup") -> Future | None:
+        """Start loading the model in the background; remote backends have nothing to load."""
+        return None
+
+    def _convert_message(self, message: dict[str, Any]) -> list[dict[str, Any]]:
+        raise NotImplementedError
+
+    def to_wire(self, message: dict[str, Any]) -> list[WireMessage]:
+        """Convert one generic message into this backend's wire format."""
+        return [
+            WireMessage(backend=self.backend_name, data=data, source=message)
+            for data in self._convert_message(message)
+        ]
+
+    def _wire_items(self, messages: list[dict[str, Any] | WireMessage]) -> list[dict[str, Any] | WireMessage]:
+        """Pass through pre-converted messages and convert the rest."""
+        items: list[dict[str, Any] | WireMessage] = []
+        for msg in messages:
+            if isinstance(msg, WireMessage):
+                if msg.backend == self.backend_name:
+                    items.append(msg)
+                else:
+                    items.extend(self._convert_message(msg.source))
+                continue
+            items.extend(self._convert_message(msg))
+        return items
+
+
+def _read_url(req: Request, timeout: float) -> bytes:
+    with urlopen(req, timeout=timeout) as resp:
+        return resp.read()
+
+
+def _encode_json_payload(payload: dict[str, Any]) -> bytes:
+    """Serialize a request body, reusing cached JSON for pre-converted messages."""
+    messages = payload.get("messages")
+    if not isinstance(messages, list) or not any(isinstance(m, WireMessage) for m in messages):
+        return json.dumps(payload).encode("utf-8")
+    head = json.dumps({k: v for k, v in payload.items() if k != "messages"})
+    parts = [m.to_json() if isinstance(m, WireMessage) else json.dumps(m) for m in messages]
+    separator = ", " if head != "{}" else ""
+    return f'{head[:-1]}{separator}"messages": [{", ".join(parts)}]}}'.encode("utf-8")
+
 
 def _normalize_backend_name(name: str | None) -> str:
     value = (name or DEFAULT_BACKEND).strip().lower()
@@ -125,6 +238,104 @@ def _extract_text_blocks(content: Any) -> str:
     return str(content or "").strip()
 
 
+def _function_tools(tools: list[dict[str, Any]] | None) -> list[dict[str, Any]]:
+    """Anthropic-style tool definitions in the OpenAI/Ollama ``function`` shape."""
+    return [
+        {
+            "type": "function",
+            "function": {
+                "name": tool.get("name", ""),
+                "description": tool.get("description", ""),
+                "parameters": tool.get("input_schema") or {"type": "object", "properties": {}},
+            },
+        }
+        for tool in tools or []
+    ]
+
+
+def _tool_use_blocks(content: Any) -> list[dict[str, Any]]:
+    if not isinstance(content, list):
+        return []
+    return [block for block in content if isinstance(block, dict) and block.get("type") == "tool_use"]
+
+
+def _function_arguments(raw: Any) -> dict[str, Any]:
+    """OpenAI sends arguments as a JSON string, Ollama as an object."""
+    if isinstance(raw, dict):
+        return raw
+    try:
+        parsed = json.loads(raw or "{}")
+    except (TypeError, ValueError):
+        logger.warning("Dropping malformed tool arguments: %r", raw)
+        return {}
+    return parsed if isinstance(parsed, dict) else {}
+
+
+_clients: dict[tuple[str, str], Any] = {}
+_backends: dict[tuple[Any, ...], ModelBackend] = {}
+_http_clients: dict[str, tuple[asyncio.AbstractEventLoop, Any]] = {}
+_registry_lock = threading.Lock()
+
+
+def _shared_client(kind: str, api_key: str | None) -> Any:
+    """One Anthropic SDK client (and connection pool) per API key, whatever the model."""
+    key = (kind, api_key or "")
+    with _registry_lock:
+        client = _clients.get(key)
+        if client is None:
+            factory = anthropic.AsyncAnthropic if kind == "async" else anthropic.Anthropic
+            client = factory(api_key=api_key)
+            _clients[key] = client
+        return client
+
+
+def _shared_http_client(base_url: str) -> Any:
+    """One pooled httpx.AsyncClient per base URL for the JSON backends' asyncio path.
+
+    Pooled connections belong to the event loop that opened them, so a call
+    from a different loop (e.g. a fresh ``asyncio.run``) starts a new pool.
+    """
+    loop = asyncio.get_running_loop()
+    with _registry_lock:
+        entry = _http_clients.get(base_url)
+        if entry is None or entry[0] is not loop:
+            entry = (loop, new_async_http_client())
+            _http_clients[base_url] = entry
+        return entry[1]
+
+
+def _is_large_user_turn(message: dict[str, Any]) -> bool:
+    if message.get("role") != "user":
+        return False
+    content = message.get("content", "")
+    if isinstance(content, str):
+        return len(content) >= CACHE_LARGE_TURN_MIN_CHARS
+    if any(block.get("type") == "image" for block in content):
+        return True
+    return sum(len(str(block.get("text", ""))) for block in content) >= CACHE_LARGE_TURN_MIN_CHARS
+
+
+def _is_question_turn(message: dict[str, Any]) -> bool:
+    """A user message that starts a turn, as opposed to one carrying tool results."""
+    if message.get("role") != "user":
+        return False
+    content = message.get("content", "")
+    return isinstance(content, str) or not all(block.get("type") == "tool_result" for block in content)
+
+
+def _with_cache_control(message: dict[str, Any]) -> dict[str, Any]:
+    """Copy ``message`` with a breakpoint on its last block; stored wire dicts stay untouched."""
+    content = message.get("content", "")
+    if isinstance(content, str):
+        blocks = [{"type": "text", "text": content}]
+    else:
+        blocks = list(content)
+    if not blocks:
+        return message
+    blocks[-1] = {**blocks[-1], "cache_control": {"type": "ephemeral"}}
+    return {**message, "content": blocks}
+
+
 class AnthropicBackend(ModelBackend):
     backend_name = "anthropic"
     supports_tools = True
@@ -132,69 +343,122 @@ class AnthropicBackend(ModelBackend):
 
     def __init__(self, api_key: str | None, model: str):
         self.model = model
-        self.client = anthropic.Anthropic(api_key=api_key)
+        self._api_key = api_key
+        self.client = _shared_client("sync", api_key)
+        self._async_client: anthropic.AsyncAnthropic | None = None
 
-    def _to_anthropic_messages(self, messages: list[dict[str, Any]]) -> list[dict[str, Any]]:
-        converted: list[dict[str, Any]] = []
-        for msg in messages:
-            role = msg.get("role", "")
-            content = msg.get("content", "")
-            if role == "assistant" and isinstance(content, str):
-                converted.append({"role": "assistant", "content": content})
-                continue
-            if role == "assistant" and isinstance(content, list):
-                blocks: list[dict[str, Any]] = []
-                for block in content:
-                    block_type = block.get("type")
-                    if block_type == "text":
-                        blocks.append({"type": "text", "text": block.get("text", "")})
-                    elif block_type == "tool_use":
-                        blocks.append(
-                            {
-                                "type": "tool_use",
-                                "id": block.get("id", ""),
-                                "name": block.get("name", ""),
-                                "input": block.get("input", {}),
-                            }
-                        )
-                converted.append({"role": "assistant", "content": blocks})
-                continue
+    @property
+    def async_client(self) -> anthropic.AsyncAnthropic:
+        if self._async_client is None:
+            self._async_client = _shared_client("async", self._api_key)
+        return self._async_client
 
-            if role != "user":
-                continue
-            if isinstance(content, str):
-                converted.append({"role": "user", "content": [{"type": "text", "text": content}]})
-                continue
+    @async_client.setter
+    def async_client(self, value) -> None:
+        self._async_client = value
 
+    def _convert_message(self, msg: dict[str, Any]) -> list[dict[str, Any]]:
+        role = msg.get("role", "")
+        content = msg.get("content", "")
+        if role == "assistant" and isinstance(content, str):
+            return [{"role": "assistant", "content": content}]
+        if role == "assistant" and isinstance(content, list):
             blocks: list[dict[str, Any]] = []
             for block in content:
                 block_type = block.get("type")
                 if block_type == "text":
                     blocks.append({"type": "text", "text": block.get("text", "")})
-                elif block_type == "image":
-                    source = block.get("source", {})
-                    media_type = source.get("media_type") or block.get("media_type") or "image/jpeg"
-                    data = source.get("data") or block.get("data", "")
-                    blocks.append(
-                        {
-                            "type": "image",
-                            "source": {
-                                "type": "base64",
-                                "media_type": media_type,
-                                "data": data,
-                            },
-                        }
-                    )
-                elif block_type == "tool_result":
+                elif block_type == "tool_use":
                     blocks.append(
                         {
-                            "type": "tool_result",
-                            "tool_use_id": block.get("tool_use_id", ""),
-                            "content": block.get("content", ""),
+                            "type": "tool_use",
+                            "id": block.get("id", ""),
+                            "name": block.get("name", ""),
+                            "input": block.get("input", {}),
                         }
                     )
-            converted.append({"role": "user", "content": blocks})
-        return converted
+            return [{"role": "assistant", "content": blocks}]
+
+        if role != "user":
+            return []
+        if isinstance(content, str):
+            return [{"role": "user", "content": [{"type": "text", "text": content}]}]
+
+        blocks = []
+        for block in content:
+            block_type = block.get("type")
+            if block_type == "text":
+                blocks.append({"type": "text", "text": block.get("text", "")})
+            elif block_type == "image":
+                source = block.get("source", {})
+                media_type = source.get("media_type") or block.get("media_type") or "image/jpeg"
+                data = source.get("data") or block.get("data", "")
+                blocks.append(
+                    {
+                        "type": "image",
+                        "source": {
+                            "type": "base64",
+                            "media_type": media_type,
+                            "data": data,
+                        },
+                    }
+                )
+            elif block_type == "tool_result":
+                result = {
+                    "type": "tool_result",
+                    "tool_use_id": block.get("tool_use_id", ""),
+                    "content": block.get("content", ""),
+                }
+                if block.get("is_error"):
+                    result["is_error"] = True
+                blocks.append(result)
+        return [{"role": "user", "content": blocks}]
+
+    def _to_anthropic_messages(
+        self,
+        messages: list[dict[str, Any] | WireMessage],
+    ) -> list[dict[str, Any]]:
+        return [
+            item.data if isinstance(item, WireMessage) else item
+            for item in self._wire_items(messages)
+        ]
+
+    def _with_cache_breakpoints(
+        self,
+        messages: list[dict[str, Any]],
+        system: list[dict[str, Any]] | str,
+    ) -> list[dict[str, Any]]:
+        """Mark cache breakpoints on copies of the wire messages.
+
+        In priority order: the request tail (the next turn or tool round reads
+        everything before it), the first large context turn, and the last
+        history message before the current question. System breakpoints count
+        against the same limit.
+        """
+        used = sum(1 for block in system if "cache_control" in block) if isinstance(system, list) else 0
+        budget = MAX_CACHE_BREAKPOINTS - used
+        if budget <= 0 or not messages:
+            return messages
+
+        candidates = [len(messages) - 1]
+        large = next((i for i, msg in enumerate(messages) if _is_large_user_turn(msg)), None)
+        if large is not None:
+            candidates.append(large)
+        question = next(
+            (i for i in range(len(messages) - 1, -1, -1) if _is_question_turn(messages[i])),
+            None,
+        )
+        if question is not None and question > 0:
+            candidates.append(question - 1)
+
+        marked: list[int] = []
+        for index in candidates:
+            if index not in marked and len(marked) < budget:
+                marked.append(index)
+        result = list(messages)
+        for index in marked:
+            result[index] = _with_cache_control(result[index])
+        return result
 
     def chat(
         self,
@@ -203,17 +467,47 @@ class AnthropicBackend(ModelBackend):
         system: list[dict[str, Any]] | str,
         max_tokens: int,
         tools: list[dict[str, Any]] | None = None,
+        timeout_sec: float | None = None,
     ) -> BackendResponse:
-        tools_arg = tools if tools else anthropic.NOT_GIVEN
-        system_arg = system if isinstance(system, list) else [{"type": "text", "text": system}]
         response = self.client.messages.create(
-            model=self.model,
-            max_tokens=max_tokens,
-            system=system_arg,
-            tools=tools_arg,
-            messages=self._to_anthropic_messages(messages),
+            **self._create_kwargs(messages, system, max_tokens, tools, timeout_sec)
         )
+        return self._parse_response(response)
 
+    async def achat(
+        self,
+        *,
+        messages: list[dict[str, Any]],
+        system: list[dict[str, Any]] | str,
+        max_tokens: int,
+        tools: list[dict[str, Any]] | None = None,
+        timeout_sec: float | None = None,
+    ) -> BackendResponse:
+        response = await self.async_client.messages.create(
+            **self._create_kwargs(messages, system, max_tokens, tools, timeout_sec)
+        )
+        return self._parse_response(response)
+
+    def _create_kwargs(
+        self,
+        messages: list[dict[str, Any]],
+        system: list[dict[str, Any]] | str,
+        max_tokens: int,
+        tools: list[dict[str, Any]] | None,
+        timeout_sec: float | None = None,
+    ) -> dict[str, Any]:
+        kwargs: dict[str, Any] = {
+            "model": self.model,
+            "max_tokens": max_tokens,
+            "system": system if isinstance(system, list) else [{"type": "text", "text": system}],
+            "tools": tools if tools else anthropic.NOT_GIVEN,
+            "messages": self._with_cache_breakpoints(self._to_anthropic_messages(messages), system),
+        }
+        if timeout_sec is not None:
+            kwargs["timeout"] = timeout_sec
+        return kwargs
+
+    def _parse_response(self, response: Any) -> BackendResponse:
         text_parts: list[str] = []
         tool_calls: list[ToolCall] = []
         for block in getattr(response, "content", []):
@@ -232,9 +526,12 @@ class AnthropicBackend(ModelBackend):
                 )
 
         usage = getattr(response, "usage", None)
-        input_tokens = int(getattr(usage, "input_tokens", 0) or 0)
         output_tokens = int(getattr(usage, "output_tokens", 0) or 0)
         cached_tokens = int(getattr(usage, "cache_read_input_tokens", 0) or 0)
+        cache_write_tokens = int(getattr(usage, "cache_creation_input_tokens", 0) or 0)
+        # Anthropic reports only the uncached tail as input_tokens; report the
+        # whole prompt like the other backends so cached_tokens is a share of it.
+        input_tokens = int(getattr(usage, "input_tokens", 0) or 0) + cached_tokens + cache_write_tokens
 
         return BackendResponse(
             text="\n".join(text_parts).strip(),
@@ -243,6 +540,7 @@ class AnthropicBackend(ModelBackend):
             input_tokens=input_tokens,
             output_tokens=output_tokens,
             cached_tokens=cached_tokens,
+            cache_write_tokens=cache_write_tokens,
         )
 
     def validate(self) -> tuple[bool, str]:
@@ -263,9 +561,48 @@ class AnthropicBackend(ModelBackend):
             return False, f"Unexpected error while validating key: {exc}"
 
 
-class OpenAIBackend(ModelBackend):
+class _JSONHTTPBackend(ModelBackend):
+    """Backend spoken over plain JSON POSTs, with blocking and asyncio transports."""
+
+    base_url: str
+    timeout_sec: int = 45
+    transport: Transport
+
+    def _request_parts(self, path: str, payload: dict[str, Any]) -> tuple[str, bytes, dict[str, str]]:
+        raise NotImplementedError
+
+    def _request(
+        self,
+        path: str,
+        payload: dict[str, Any],
+        timeout_sec: float | None = None,
+    ) -> dict[str, Any]:
+        url, body, headers = self._request_parts(path, payload)
+        req = Request(url, data=body, method="POST", headers=headers)
+        data = self.transport.call(
+            lambda timeout: _read_url(req, timeout),
+            timeout_sec=timeout_sec or self.timeout_sec,
+        )
+        return json.loads(data.decode("utf-8", errors="replace"))
+
+    async def _arequest(
+        self,
+        path: str,
+        payload: dict[str, Any],
+        timeout_sec: float | None = None,
+    ) -> dict[str, Any]:
+        url, body, headers = self._request_parts(path, payload)
+        client = _shared_http_client(self.base_url)
+        data = await self.transport.acall(
+            lambda timeout: async_http_request(client, url, data=body, headers=headers, timeout_sec=timeout),
+            timeout_sec=timeout_sec or self.timeout_sec,
+        )
+        return json.loads(data.decode("utf-8", errors="replace"))
+
+
+class OpenAIBackend(_JSONHTTPBackend):
     backend_name = "openai"
-    supports_tools = False
+    supports_tools = True
     supports_vision = True
 
     def __init__(
@@ -275,73 +612,87 @@ class OpenAIBackend(ModelBackend):
         *,
         base_url: str = OPENAI_BASE_URL,
         timeout_sec: int = 45,
+        transport_policy: TransportPolicy | None = None,
     ):
         self.api_key = api_key or ""
         self.model = model
         self.base_url = base_url.rstrip("/")
         self.timeout_sec = max(1, int(timeout_sec))
+        self.transport = Transport(f"openai:{self.base_url}", transport_policy)
 
-    def _request(self, path: str, payload: dict[str, Any]) -> dict[str, Any]:
+    def _request_parts(self, path: str, payload: dict[str, Any]) -> tuple[str, bytes, dict[str, str]]:
         if not self.api_key:
             raise RuntimeError("Missing OpenAI API key.")
-        url = f"{self.base_url}{path}"
-        body = json.dumps(payload).encode("utf-8")
-        req = Request(
-            url,
-            data=body,
-            method="POST",
-            headers={
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {self.api_key}",
-            },
-        )
-        with urlopen(req, timeout=self.timeout_sec) as resp:
-            data = resp.read()
-        return json.loads(data.decode("utf-8", errors="replace"))
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}",
+        }
+        return f"{self.base_url}{path}", _encode_json_payload(payload), headers
+
+    def _convert_message(self, msg: dict[str, Any]) -> list[dict[str, Any]]:
+        role = msg.get("role", "")
+        content = msg.get("content", "")
+        if role == "assistant":
+            item: dict[str, Any] = {"role": "assistant", "content": _extract_text_blocks(content)}
+            tool_uses = _tool_use_blocks(content)
+            if tool_uses:
+                item["content"] = item["content"] or None
+                item["tool_calls"] = [
+                    {
+                        "id": block.get("id", ""),
+                        "type": "function",
+                        "function": {
+                            "name": block.get("name", ""),
+                            "arguments": json.dumps(block.get("input", {})),
+                        },
+                    }
+                    for block in tool_uses
+                ]
+            return [item]
+        if role != "user":
+            return []
+
+        if isinstance(content, str):
+            return [{"role": "user", "content": content}]
+
+        # Tool results are separate "tool" messages that must directly follow the call.
+        tool_messages = [
+            {
+                "role": "tool",
+                "tool_call_id": block.get("tool_use_id", ""),
+                "content": str(block.get("content", "")),
+            }
+            for block in content
+            if block.get("type") == "tool_result"
+        ]
+        blocks: list[dict[str, Any]] = []
+        for block in content:
+            block_type = block.get("type")
+            if block_type == "text":
+                blocks.append({"type": "text", "text": block.get("text", "")})
+            elif block_type == "image":
+                source = block.get("source", {})
+                media_type = source.get("media_type", "image/jpeg")
+                data = source.get("data", "")
+                data_url = f"data:{media_type};base64,{data}"
+                blocks.append({"type": "image_url", "image_url": {"url": data_url}})
+
+        if not blocks:
+            return tool_messages or [{"role": "user", "content": ""}]
+        if len(blocks) == 1 and blocks[0]["type"] == "text":
+            return tool_messages + [{"role": "user", "content": blocks[0]["text"]}]
+        return tool_messages + [{"role": "user", "content": blocks}]
 
     def _to_openai_messages(
         self,
-        messages: list[dict[str, Any]],
+        messages: list[dict[str, Any] | WireMessage],
         system: list[dict[str, Any]] | str,
-    ) -> list[dict[str, Any]]:
-        converted: list[dict[str, Any]] = []
+    ) -> list[dict[str, Any] | WireMessage]:
+        converted: list[dict[str, Any] | WireMessage] = []
         system_text = _coerce_system_text(system)
         if system_text:
             converted.append({"role": "system", "content": system_text})
-
-        for msg in messages:
-            role = msg.get("role", "")
-            content = msg.get("content", "")
-            if role == "assistant":
-                converted.append({"role": "assistant", "content": _extract_text_blocks(content)})
-                continue
-            if role != "user":
-                continue
-
-            if isinstance(content, str):
-                converted.append({"role": "user", "content": content})
-                continue
-
-            blocks: list[dict[str, Any]] = []
-            for block in content:
-                block_type = block.get("type")
-                if block_type == "text":
-                    blocks.append({"type": "text", "text": block.get("text", "")})
-                elif block_type == "image":
-                    source = block.get("source", {})
-                    media_type = source.get("media_type", "image/jpeg")
-                    data = source.get("data", "")
-                    data_url = f"data:{media_type};base64,{data}"
-                    blocks.append({"type": "image_url", "image_url": {"url": data_url}})
-                elif block_type == "tool_result":
-                    blocks.append({"type": "text", "text": str(block.get("content", ""))})
-
-            if not blocks:
-                converted.append({"role": "user", "content": ""})
-            elif len(blocks) == 1 and blocks[0]["type"] == "text":
-                converted.append({"role": "user", "content": blocks[0]["text"]})
-            else:
-                converted.append({"role": "user", "content": blocks})
+        converted.extend(self._wire_items(messages))
         return converted
 
     def chat(
@@ -351,7 +702,30 @@ class OpenAIBackend(ModelBackend):
         system: list[dict[str, Any]] | str,
         max_tokens: int,
         tools: list[dict[str, Any]] | None = None,
+        timeout_sec: float | None = None,
     ) -> BackendResponse:
+        payload = self._chat_payload(messages, system, max_tokens, tools)
+        return self._parse_chat(self._request("/chat/completions", payload, timeout_sec))
+
+    async def achat(
+        self,
+        *,
+        messages: list[dict[str, Any]],
+        system: list[dict[str, Any]] | str,
+        max_tokens: int,
+        tools: list[dict[str, Any]] | None = None,
+        timeout_sec: float | None = None,
+    ) -> BackendResponse:
+        payload = self._chat_payload(messages, system, max_tokens, tools)
+        return self._parse_chat(await self._arequest("/chat/completions", payload, timeout_sec))
+
+    def _chat_payload(
+        self,
+        messages: list[dict[str, Any]],
+        system: list[dict[str, Any]] | str,
+        max_tokens: int,
+        tools: list[dict[str, Any]] | None,
+    ) -> dict[str, Any]:
         payload: dict[str, Any] = {
             "model": self.model,
             "messages": self._to_openai_messages(messages, system),
@@ -359,9 +733,10 @@ class OpenAIBackend(ModelBackend):
             "temperature": 0.2,
         }
         if tools:
-            logger.info("OpenAI backend currently ignores tool definitions.")
+            payload["tools"] = _function_tools(tools)
+        return payload
 
-        data = self._request("/chat/completions", payload)
+    def _parse_chat(self, data: dict[str, Any]) -> BackendResponse:
         choices = data.get("choices", [])
         if not choices:
             return BackendResponse(text="", stop_reason="end_turn", tool_calls=[])
@@ -370,6 +745,15 @@ class OpenAIBackend(ModelBackend):
         message = first.get("message", {})
         content = message.get("content", "")
         text = _extract_text_blocks(content)
+        tool_calls = [
+            ToolCall(
+                id=str(call.get("id", "")),
+                name=str((call.get("function") or {}).get("name", "")),
+                input=_function_arguments((call.get("function") or {}).get("arguments")),
+            )
+            for call in message.get("tool_calls") or []
+            if isinstance(call, dict)
+        ]
         usage = data.get("usage", {})
         cached_tokens = int(
             (
@@ -377,10 +761,11 @@ class OpenAIBackend(ModelBackend):
             ).get("cached_tokens", 0)
             or 0
         )
+        stop_reason = str(first.get("finish_reason") or "end_turn")
         return BackendResponse(
             text=text,
-            stop_reason=str(first.get("finish_reason") or "end_turn"),
-            tool_calls=[],
+            stop_reason="tool_use" if tool_calls else stop_reason,
+            tool_calls=tool_calls,
             input_tokens=int(usage.get("prompt_tokens", 0) or 0),
             output_tokens=int(usage.get("completion_tokens", 0) or 0),
             cached_tokens=cached_tokens,
@@ -402,10 +787,13 @@ class OpenAIBackend(ModelBackend):
             return False, f"Unexpected OpenAI validation error: {exc}"
 
 
-class OllamaBackend(ModelBackend):
+class OllamaBackend(_JSONHTTPBackend):
     backend_name = "ollama"
-    supports_tools = False
+    # Cleared on an instance whose model rejects tool definitions.
+    supports_tools = True
     supports_vision = True
+    # llama.cpp image loaders do not decode WebP.
+    image_media_types = frozenset({"image/jpeg", "image/png"})
 
     def __init__(
         self,
@@ -413,68 +801,82 @@ class OllamaBackend(ModelBackend):
         *,
         base_url: str = OLLAMA_BASE_URL,
         timeout_sec: int = 45,
+        transport_policy: TransportPolicy | None = None,
+        keep_alive: str | int = "",
+        clock: Callable[[], float] = time.monotonic,
     ):
         self.model = model
         self.base_url = base_url.rstrip("/")
         self.timeout_sec = max(1, int(timeout_sec))
+        self.transport = Transport(f"ollama:{self.base_url}", transport_policy)
+        # "" leaves Ollama's server default; otherwise a duration ("30m") or seconds (-1 = forever).
+        self.keep_alive = keep_alive
+        self._clock = clock
+        self._warm_lock = threading.Lock()
+        self._warm_future: Future | None = None
+        self._last_warm_at: float | None = None
 
-    def _request(self, path: str, payload: dict[str, Any]) -> dict[str, Any]:
-        url = f"{self.base_url}{path}"
-        body = json.dumps(payload).encode("utf-8")
-        req = Request(
-            url,
-            data=body,
-            method="POST",
-            headers={"Content-Type": "application/json"},
-        )
-        with urlopen(req, timeout=self.timeout_sec) as resp:
-            data = resp.read()
-        return json.loads(data.decode("utf-8", errors="replace"))
+    def _request_parts(self, path: str, payload: dict[str, Any]) -> tuple[str, bytes, dict[str, str]]:
+        headers = {"Content-Type": "application/json"}
+        return f"{self.base_url}{path}", _encode_json_payload(payload), headers
 
-    def _to_ollama_messages(self, messages: list[dict[str, Any]], system: list[dict[str, Any]] | str):
-        converted: list[dict[str, Any]] = []
-        system_text = _coerce_system_text(system)
-        if system_text:
-            converted.append({"role": "system", "content": system_text})
+    def _convert_message(self, msg: dict[str, Any]) -> list[dict[str, Any]]:
+        role = msg.get("role", "")
+        content = msg.get("content", "")
+        if role == "assistant":
+            item: dict[str, Any] = {"role": "assistant", "content": _extract_text_blocks(content)}
+            tool_uses = _tool_use_blocks(content)
+            if tool_uses:
+                item["tool_calls"] = [
+                    {"function": {"name": block.get("name", ""), "arguments": block.get("input", {})}}
+                    for block in tool_uses
+                ]
+            return [item]
+        if role != "user":
+            return []
 
-        for msg in messages:
-            role = msg.get("role", "")
-            content = msg.get("content", "")
-            if role == "assistant":
-                converted.append({"role": "assistant", "content": _extract_text_blocks(content)})
-                continue
-            if role != "user":
-                continue
+        if isinstance(content, str):
+            return [{"role": "user", "content": content}]
 
-            if isinstance(content, str):
-                converted.append({"role": "user", "content": content})
-                continue
-
-            text_parts: list[str] = []
-            images: list[str] = []
-            for block in content:
-                block_type = block.get("type")
-                if block_type == "text":
-                    text = str(block.get("text", "")).strip()
-                    if text:
-                        text_parts.append(text)
-                elif block_type == "tool_result":
-                    text = str(block.get("content", "")).strip()
-                    if text:
-                        text_parts.append(text)
-                elif block_type == "image":
-                    source = block.get("source", {})
-                    data = source.get("data") or block.get("data")
-                    if data:
-                        images.append(data)
-            item: dict[str, Any] = {
-                "role": "user",
-                "content": "\n".join(text_parts).strip(),
-            }
-            if images:
-                item["images"] = images
-            converted.append(item)
+        # Ollama matches tool results to calls by order, so ids are not sent.
+        tool_messages = [
+            {"role": "tool", "content": str(block.get("content", ""))}
+            for block in content
+            if block.get("type") == "tool_result"
+        ]
+        text_parts: list[str] = []
+        images: list[str] = []
+        for block in content:
+            block_type = block.get("type")
+            if block_type == "text":
+                text = str(block.get("text", "")).strip()
+                if text:
+                    text_parts.append(text)
+            elif block_type == "image":
+                source = block.get("source", {})
+                data = source.get("data") or block.get("data")
+                if data:
+                    images.append(data)
+        if tool_messages and not text_parts and not images:
+            return tool_messages
+        item = {
+            "role": "user",
+            "content": "\n".join(text_parts).strip(),
+        }
+        if images:
+            item["images"] = images
+        return tool_messages + [item]
 
+    def _to_ollama_messages(
+        self,
+        messages: list[dict[str, Any] | WireMessage],
+        system: list[dict[str, Any]] | str,
+    ) -> list[dict[str, Any] | WireMessage]:
+        converted: list[dict[str, Any] | WireMessage] = []
+        system_text = _coerce_system_text(system)
+        if system_text:
+            converted.append({"role": "system", "content": system_text})
+        converted.extend(self._wire_items(messages))
         return converted
 
     def chat(
@@ -484,22 +886,89 @@ class OllamaBackend(ModelBackend):
         system: list[dict[str, Any]] | str,
         max_tokens: int,
         tools: list[dict[str, Any]] | None = None,
+        timeout_sec: float | None = None,
     ) -> BackendResponse:
-        if tools:
-            logger.info("Ollama backend currently ignores tool definitions.")
-        payload = {
+        payload = self._chat_payload(messages, system, max_tokens, tools)
+        try:
+            return self._parse_chat(self._request("/api/chat", payload, timeout_sec))
+        except HTTPError as exc:
+            if not self._drop_unsupported_tools(exc, payload):
+                raise
+        return self._parse_chat(self._request("/api/chat", payload, timeout_sec))
+
+    async def achat(
+        self,
+        *,
+        messages: list[dict[str, Any]],
+        system: list[dict[str, Any]] | str,
+        max_tokens: int,
+        tools: list[dict[str, Any]] | None = None,
+        timeout_sec: float | None = None,
+    ) -> BackendResponse:
+        payload = self._chat_payload(messages, system, max_tokens, tools)
+        try:
+            return self._parse_chat(await self._arequest("/api/chat", payload, timeout_sec))
+        except HTTPError as exc:
+            if not self._drop_unsupported_tools(exc, payload):
+                raise
+        return self._parse_chat(await self._arequest("/api/chat", payload, timeout_sec))
+
+    def _drop_unsupported_tools(self, exc: HTTPError, payload: dict[str, Any]) -> bool:
+        """Strip tools after the server says the model has no tool support; True to retry.
+
+        Other 400s (malformed messages, oversized context) leave tools alone,
+        since this backend instance is shared by every assistant on the model.
+        """
+        if exc.code != 400 or "tools" not in payload:
+            return False
+        try:
+            body = exc.read().decode("utf-8", errors="replace")
+        except Exception:
+            body = ""
+        if _OLLAMA_NO_TOOLS_ERROR not in body.lower():
+            return False
+        logger.info("Ollama model %s rejected tool definitions; continuing without tools.", self.model)
+        self.supports_tools = False
+        del payload["tools"]
+        return True
+
+    def _chat_payload(
+        self,
+        messages: list[dict[str, Any]],
+        system: list[dict[str, Any]] | str,
+        max_tokens: int,
+        tools: list[dict[str, Any]] | None,
+    ) -> dict[str, Any]:
+        payload: dict[str, Any] = {
             "model": self.model,
             "messages": self._to_ollama_messages(messages, system),
             "stream": False,
             "options": {"num_predict": max_tokens},
         }
-        data = self._request("/api/chat", payload)
+        if tools and self.supports_tools:
+            payload["tools"] = _function_tools(tools)
+        if self.keep_alive not in ("", None):
+            payload["keep_alive"] = self.keep_alive
+        return payload
+
+    def _parse_chat(self, data: dict[str, Any]) -> BackendResponse:
         message = data.get("message", {})
         text = str(message.get("content", "")).strip()
+        tool_calls = [
+            ToolCall(
+                id=f"ollama_call_{index}",
+                name=str((call.get("function") or {}).get("name", "")),
+                input=_function_arguments((call.get("function") or {}).get("arguments")),
+            )
+            for index, call in enumerate(message.get("tool_calls") or [])
+            if isinstance(call, dict)
+        ]
+        stop_reason = str(data.get("done_reason", "end_turn") or "end_turn")
         return BackendResponse(
             text=text,
-            stop_reason=str(data.get("done_reason", "end_turn") or "end_turn"),
-            tool_calls=[],
+            # Ollama reports "stop" even when the turn ends in tool calls.
+            stop_reason="tool_use" if tool_calls else stop_reason,
+            tool_calls=tool_calls,
             input_tokens=int(data.get("prompt_eval_count", 0) or 0),
             output_tokens=int(data.get("eval_count", 0) or 0),
             cached_tokens=0,
@@ -527,6 +996,310 @@ class OllamaBackend(ModelBackend):
         except Exception as exc:
             return False, f"Unexpected Ollama validation error: {exc}"
 
+    def is_loaded(self) -> bool:
+        """Whether ``/api/ps`` lists this model as resident in memory."""
+        req = Request(f"{self.base_url}/api/ps", method="GET")
+        data = json.loads(_read_url(req, OLLAMA_PS_TIMEOUT_SEC).decode("utf-8", errors="replace"))
+        wanted = _ollama_tag(self.model)
+        for item in data.get("models", []) or []:
+            if not isinstance(item, dict):
+                continue
+            if _ollama_tag(str(item.get("name") or item.get("model") or "")) == wanted:
+                return True
+        return False
+
+    def warm_up(self, reason: str = "startup") -> bool:
+        """Load the model with an empty generate request; True when a load was sent."""
+        try:
+            loaded = self.is_loaded()
+        except (HTTPError, URLError, OSError, ValueError) as exc:
+            # Older servers have no /api/ps; warming an already loaded model is harmless.
+            logger.info("Ollama residency check failed, warming anyway: %s", exc)
+            loaded = False
+        if loaded:
+            logger.info(
+                "event=BACKEND_WARM_UP flow=%s backend=ollama model=%s result=skipped reason=resident",
+                reason,
+                self.model,
+            )
+            return False
+
+        started = time.monotonic()
+        payload: dict[str, Any] = {"model": self.model}
+        if self.keep_alive not in ("", None):
+            payload["keep_alive"] = self.keep_alive
+        url, body, headers = self._request_parts("/api/generate", payload)
+        # Bypasses the retry transport: a slow first load must not count against the breaker.
+        _read_url(Request(url, data=body, method="POST", headers=headers), self.timeout_sec)
+        logger.info(
+            "event=BACKEND_WARM_UP flow=%s backend=ollama model=%s result=loaded duration_ms=%d",
+            reason,
+            self.model,
+            int((time.monotonic() - started) * 1000),
+        )
+        return True
+
+    def _warm_up_task(self, reason: str) -> bool:
+        try:
+            return self.warm_up(reason)
+        except Exception as exc:
+            logger.warning("Ollama warm-up failed: %s", exc)
+            return False
+        finally:
+            with self._warm_lock:
+                self._last_warm_at = self._clock()
+
+    def schedule_warm_up(self, reason: str = "startup") -> Future | None:
+        """Warm up on a worker thread; concurrent calls share one in-flight warm-up."""
+        with self._warm_lock:
+            if self._warm_future is not None and not self._warm_future.done():
+                return self._warm_future
+            last = self._last_warm_at
+            if last is not None and self._clock() - last < WARM_UP_MIN_INTERVAL_SEC:
+                return None
+            self._warm_future = _warm_up_executor.submit(self._warm_up_task, reason)
+            return self._warm_future
+
+
+def _ollama_tag(name: str) -> str:
+    """Ollama lists untagged models as ``name:latest``."""
+    name = name.strip()
+    return name if ":" in name else f"{name}:latest"
+
+
+class LatencyStats:
+    """Rolling window of successful request latencies for one backend."""
+
+    def __init__(self, window: int = 50):
+        self._samples: deque[float] = deque(maxlen=max(1, int(window)))
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(float(seconds))
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self._samples)
+
+    def percentile(self, pct: float) -> float | None:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        idx = min(len(samples) - 1, int(round(pct / 100.0 * (len(samples) - 1))))
+        return samples[idx]
+
+
+_hedge_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="backend-hedge")
+
+
+class HedgedBackend(ModelBackend):
+    """Primary backend with a secondary used for hedging and failover.
+
+    The primary request starts first. If it has not answered within the
+    hedge delay (the primary's p95 latency once enough samples exist), the
+    same request also goes to the secondary and the first good answer wins.
+    A primary error fails over to the secondary straight away.
+    """
+
+    MIN_SAMPLES = 5
+
+    def __init__(
+        self,
+        primary: ModelBackend,
+        secondary: ModelBackend,
+        *,
+        hedge: bool = True,
+        default_hedge_delay_sec: float = 4.0,
+        min_hedge_delay_sec: float = 0.5,
+        max_hedge_delay_sec: float = 20.0,
+    ):
+        self.primary = primary
+        self.secondary = secondary
+        self.hedge = bool(hedge)
+        self.default_hedge_delay_sec = float(default_hedge_delay_sec)
+        self.min_hedge_delay_sec = float(min_hedge_delay_sec)
+        self.max_hedge_delay_sec = float(max_hedge_delay_sec)
+        self.stats = {"primary": LatencyStats(), "secondary": LatencyStats()}
+        # History is stored in the primary's wire format; the secondary re-converts.
+        self.backend_name = primary.backend_name
+        self.supports_vision = primary.supports_vision
+        self.image_media_types = primary.image_media_types & secondary.image_media_types
+
+    @property
+    def supports_tools(self) -> bool:
+        # Read live: the primary may drop tools after its model rejects them.
+        return self.primary.supports_tools
+
+    @property
+    def model(self) -> str:
+        return getattr(self.primary, "model", "")
+
+    @property
+    def client(self):
+        return getattr(self.primary, "client", None)
+
+    @client.setter
+    def client(self, value):
+        self.primary.client = value
+
+    def _convert_message(self, message: dict[str, Any]) -> list[dict[str, Any]]:
+        return self.primary._convert_message(message)
+
+    def hedge_delay(self) -> float:
+        stats = self.stats["primary"]
+        if stats.count() < self.MIN_SAMPLES:
+            return self.default_hedge_delay_sec
+        p95 = stats.percentile(95) or self.default_hedge_delay_sec
+        return min(self.max_hedge_delay_sec, max(self.min_hedge_delay_sec, p95))
+
+    def _timed_chat(self, role: str, kwargs: dict[str, Any]) -> BackendResponse:
+        backend = self.primary if role == "primary" else self.secondary
+        started = time.monotonic()
+        response = backend.chat(**kwargs)
+        self.stats[role].record(time.monotonic() - started)
+        response.served_by = backend.backend_name
+        return response
+
+    async def _atimed_chat(self, role: str, kwargs: dict[str, Any]) -> BackendResponse:
+        backend = self.primary if role == "primary" else self.secondary
+        started = time.monotonic()
+        response = await backend.achat(**kwargs)
+        self.stats[role].record(time.monotonic() - started)
+        response.served_by = backend.backend_name
+        return response
+
+    def _log(self, result: str, winner: str, delay: float) -> None:
+        logger.info(
+            "event=BACKEND_HEDGE flow=chat result=%s winner=%s hedge_delay_ms=%d",
+            result,
+            winner,
+            int(delay * 1000),
+        )
+
+    def chat(
+        self,
+        *,
+        messages: list[dict[str, Any]],
+        system: list[dict[str, Any]] | str,
+        max_tokens: int,
+        tools: list[dict[str, Any]] | None = None,
+        timeout_sec: float | None = None,
+    ) -> BackendResponse:
+        kwargs: dict[str, Any] = {
+            "messages": messages,
+            "system": system,
+            "max_tokens": max_tokens,
+            "tools": tools,
+        }
+        if timeout_sec is not None:
+            kwargs["timeout_sec"] = timeout_sec
+        delay = self.hedge_delay()
+        primary = _hedge_executor.submit(self._timed_chat, "primary", kwargs)
+        done, _pending = wait([primary], timeout=delay if self.hedge else None)
+        if done:
+            try:
+                response = primary.result()
+                self._log("primary", self.primary.backend_name, delay)
+                return response
+            except Exception as exc:
+                logger.warning("Primary backend %s failed, failing over: %s", self.primary.backend_name, exc)
+                response = self._timed_chat("secondary", kwargs)
+                self._log("failover", self.secondary.backend_name, delay)
+                return response
+
+        secondary = _hedge_executor.submit(self._timed_chat, "secondary", kwargs)
+        pending: set[Future] = {primary, secondary}
+        first_error: Exception = RuntimeError("No backend answered.")
+        errors = 0
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in (primary, secondary):
+                if future not in done:
+                    continue
+                try:
+                    response = future.result()
+                except Exception as exc:
+                    if errors == 0:
+                        first_error = exc
+                    errors += 1
+                    continue
+                for loser in pending:
+                    # Running HTTP calls cannot be interrupted; the late answer is dropped.
+                    loser.cancel()
+                self._log("hedged", response.served_by, delay)
+                return response
+        raise first_error
+
+    async def achat(
+        self,
+        *,
+        messages: list[dict[str, Any]],
+        system: list[dict[str, Any]] | str,
+        max_tokens: int,
+        tools: list[dict[str, Any]] | None = None,
+        timeout_sec: float | None = None,
+    ) -> BackendResponse:
+        """Async :meth:`chat` on tasks, so cancelling the turn aborts both requests."""
+        kwargs: dict[str, Any] = {
+            "messages": messages,
+            "system": system,
+            "max_tokens": max_tokens,
+            "tools": tools,
+        }
+        if timeout_sec is not None:
+            kwargs["timeout_sec"] = timeout_sec
+        delay = self.hedge_delay()
+        primary = asyncio.ensure_future(self._atimed_chat("primary", kwargs))
+        tasks = [primary]
+        try:
+            done, _pending = await asyncio.wait(tasks, timeout=delay if self.hedge else None)
+            if done:
+                try:
+                    response = primary.result()
+                    self._log("primary", self.primary.backend_name, delay)
+                    return response
+                except Exception as exc:
+                    logger.warning(
+                        "Primary backend %s failed, failing over: %s", self.primary.backend_name, exc
+                    )
+                    response = await self._atimed_chat("secondary", kwargs)
+                    self._log("failover", self.secondary.backend_name, delay)
+                    return response
+
+            secondary = asyncio.ensure_future(self._atimed_chat("secondary", kwargs))
+            tasks.append(secondary)
+            pending = set(tasks)
+            first_error: BaseException = RuntimeError("No backend answered.")
+            errors = 0
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in tasks:
+                    if task not in done:
+                        continue
+                    if task.exception() is not None:
+                        if errors == 0:
+                            first_error = task.exception()
+                        errors += 1
+                        continue
+                    response = task.result()
+                    self._log("hedged", response.served_by, delay)
+                    return response
+            raise first_error
+        finally:
+            # Cancels the losing request, or both when the turn itself is cancelled.
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def validate(self) -> tuple[bool, str]:
+        return self.primary.validate()
+
+    def schedule_warm_up(self, reason: str = "startup") -> Future | None:
+        self.secondary.schedule_warm_up(reason)
+        return self.primary.schedule_warm_up(reason)
+
 
 def build_backend(
     *,
@@ -537,6 +1310,8 @@ def build_backend(
     ollama_base_url: str,
     openai_base_url: str,
     timeout_sec: int,
+    transport_policy: TransportPolicy | None = None,
+    ollama_keep_alive: str | int = "",
 ) -> ModelBackend:
     backend = _normalize_backend_name(backend_name)
     resolved_model = resolve_model_for_backend(backend, model)
@@ -549,9 +1324,69 @@ def build_backend(
             model=resolved_model,
             base_url=openai_base_url,
             timeout_sec=timeout_sec,
+            transport_policy=transport_policy,
         )
     return OllamaBackend(
         model=resolved_model,
         base_url=ollama_base_url,
         timeout_sec=timeout_sec,
+        transport_policy=transport_policy,
+        keep_alive=ollama_keep_alive,
     )
+
+
+def shared_backend(
+    *,
+    backend_name: str,
+    model: str,
+    anthropic_api_key: str | None,
+    openai_api_key: str | None,
+    ollama_base_url: str,
+    openai_base_url: str,
+    timeout_sec: int,
+    transport_policy: TransportPolicy | None = None,
+    ollama_keep_alive: str | int = "",
+) -> ModelBackend:
+    """:func:`build_backend`, reusing an existing instance for the same connection settings.
+
+    Assistants that differ only in prompt, history or token limits share one
+    backend, so they also share its HTTP client and warm connections.
+    """
+    backend = _normalize_backend_name(backend_name)
+    resolved_model = resolve_model_for_backend(backend, model)
+    credential = {"anthropic": anthropic_api_key, "openai": openai_api_key}.get(backend) or ""
+    base_url = {"openai": openai_base_url, "ollama": ollama_base_url}.get(backend, "")
+    key = (
+        backend,
+        resolved_model,
+        credential,
+        base_url,
+        int(timeout_sec),
+        transport_policy,
+        str(ollama_keep_alive) if backend == "ollama" else "",
+    )
+    with _registry_lock:
+        existing = _backends.get(key)
+    if existing is not None:
+        return existing
+    created = build_backend(
+        backend_name=backend,
+        model=resolved_model,
+        anthropic_api_key=anthropic_api_key,
+        openai_api_key=openai_api_key,
+        ollama_base_url=ollama_base_url,
+        openai_base_url=openai_base_url,
+        timeout_sec=timeout_sec,
+        transport_policy=transport_policy,
+        ollama_keep_alive=ollama_keep_alive,
+    )
+    with _registry_lock:
+        # Another thread may have built the same backend meanwhile; keep the first.
+        return _backends.setdefault(key, created)
+
+
+def clear_backend_registry() -> None:
+    with _registry_lock:
+        _backends.clear()
+        _clients.clear()
+        _http_clients.clear()
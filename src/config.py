@@ -18,9 +18,35 @@ DEFAULT_CONFIG = {
     "force_onboarding": False,
     "backend": "anthropic",
     "model": "claude-sonnet-4-20250514",
+    "model_routing": False,
+    "model_routes": {
+        "anthropic": {"fast": "claude-haiku-4-5-20251001", "large": ""},
+        "openai": {"fast": "gpt-4o-mini", "large": ""},
+        "ollama": {"fast": "", "large": ""},
+    },
+    "model_routing_short_chars": 160,
+    "model_routing_long_context_tokens": 8000,
     "openai_base_url": "https://api.openai.com/v1",
     "ollama_base_url": "http://127.0.0.1:11434",
+    "ollama_keep_alive": "30m",
+    "ollama_warm_up": True,
     "backend_timeout_sec": 45,
+    "fallback_backend": "",
+    "fallback_model": "",
+    "hedge_requests": True,
+    "backend_max_retries": 2,
+    "circuit_breaker_failures": 3,
+    "circuit_breaker_cooldown_sec": 30,
+    "turn_deadline_sec": 30,
+    "tool_call_timeout_sec": 15,
+    "search_backends": ["duckduckgo", "brave"],
+    "search_deadline_sec": 4,
+    "search_prefetch": True,
+    "response_cache": False,
+    "response_cache_ttl_sec": 120,
+    "deep_search": False,
+    "deep_search_top_k": 3,
+    "deep_search_timeout_sec": 8,
     "personality": "buddy",
     "hotkey_activate": "ctrl+shift+space",
     "hotkey_clipboard": "ctrl+shift+v",
@@ -28,13 +54,18 @@ DEFAULT_CONFIG = {
     "screenshot_interval": 3.0,
     "hash_threshold": 12,
     "max_tokens": 400,
-    "history_window_turns": 6,
+    "history_window_turns": 20,
+    "history_token_budget": 6000,
     "history_summary_every_turns": 6,
     "history_summary_max_chars": 1800,
+    "history_summarizer": True,
+    "history_summary_model": "",
+    "followup_image_diff": True,
+    "image_diff_max_area_ratio": 0.35,
     "enable_monitor": False,
     "allow_private_url_browse": True,
-    "context_max_chars": 9000,
-    "context_reference_refresh_turns": 3,
+    "context_max_tokens": 2250,
+    "token_encoding": "",
     "url_cache_ttl_sec": 300,
     "ocr_cache_ttl_sec": 300,
     "context_telemetry": True,
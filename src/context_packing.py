@@ -0,0 +1,166 @@
+"""Choose which context blocks to send, and how much of each, under a token budget."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any
+
+from .tokens import estimate_tokens, prefix_tokens, truncate_to_tokens
+
+# Trim points offered to the solver besides "all" and "none", as shares of the
+# smaller of the block and the whole budget.
+TRIM_LEVELS = (1.0, 0.75, 0.5, 0.25)
+# Utility of a trimmed block is priority * kept_share ** exponent; < 1 rewards keeping
+# the head of several blocks over all of one.
+TRIM_UTILITY_EXPONENT = 0.5
+# Outweighs any sum of priorities, so required blocks are only dropped when they cannot fit.
+REQUIRED_BONUS = 1_000_000.0
+# A boundary cut may give back at most this share of the token-exact prefix.
+BOUNDARY_MAX_GIVEBACK = 0.4
+_BOUNDARIES = ("\n\n", "\n", "。", ". ", " ")
+
+
+@dataclass(frozen=True, slots=True)
+class _Option:
+    tokens: int
+    value: float
+    text: str
+    trimmed: bool
+
+
+@dataclass(slots=True)
+class _Group:
+    idx: int
+    name: str
+    priority: int
+    required: bool
+    text: str
+    options: list[_Option]
+
+
+def cut_at_boundary(text: str, max_tokens: int) -> str:
+    """Prefix of ``text`` within ``max_tokens``, ending at a paragraph, line or sentence break."""
+    prefix = truncate_to_tokens(text, max_tokens)
+    if len(prefix) >= len(text) or not prefix:
+        return prefix
+    floor = int(len(prefix) * (1.0 - BOUNDARY_MAX_GIVEBACK))
+    for sep in _BOUNDARIES:
+        pos = prefix.rfind(sep, floor)
+        if pos > 0:
+            # Keep sentence punctuation; drop the break itself.
+            return prefix[: pos + len(sep.rstrip())].rstrip()
+    return prefix
+
+
+def _options(
+    text: str,
+    full_tokens: int,
+    priority: int,
+    required: bool,
+    allow_trim: bool,
+    budget: int,
+) -> list[_Option]:
+    bonus = REQUIRED_BONUS if required else 0.0
+    options = [_Option(full_tokens, priority + bonus, text, False)]
+    if not allow_trim:
+        return options
+    seen = {len(text)}
+    cap = min(full_tokens, budget)
+    for level in TRIM_LEVELS:
+        cut = cut_at_boundary(text, int(cap * level))
+        if not cut or len(cut) in seen:
+            continue
+        seen.add(len(cut))
+        tokens = prefix_tokens(text, len(cut))
+        share = min(1.0, tokens / full_tokens)
+        options.append(_Option(tokens, priority * share**TRIM_UTILITY_EXPONENT + bonus, cut, True))
+    return options
+
+
+def _pareto(states: list[tuple[int, float, tuple[int, ...]]]) -> list[tuple[int, float, tuple[int, ...]]]:
+    """Keep states that no cheaper-or-equal state beats on value."""
+    states.sort(key=lambda s: (s[0], -s[1], s[2]))
+    frontier: list[tuple[int, float, tuple[int, ...]]] = []
+    for state in states:
+        if not frontier or state[1] > frontier[-1][1]:
+            frontier.append(state)
+    return frontier
+
+
+def _solve(groups: list[_Group], budget: int) -> tuple[int, ...]:
+    """Multiple-choice knapsack over each block's options; -1 means the block is dropped."""
+    frontier: list[tuple[int, float, tuple[int, ...]]] = [(0, 0.0, ())]
+    for group in groups:
+        states = []
+        for used, value, picks in frontier:
+            states.append((used, value, picks + (-1,)))
+            for pick, option in enumerate(group.options):
+                if used + option.tokens <= budget:
+                    states.append((used + option.tokens, value + option.value, picks + (pick,)))
+        frontier = _pareto(states)
+    # The frontier is sorted by cost with rising value, so the last state is the best.
+    return frontier[-1][2]
+
+
+def _fill_slack(groups: list[_Group], picks: list[int], budget: int) -> list[str]:
+    """Grow trimmed blocks (highest priority first) into budget the fixed levels left unused."""
+    texts = [group.options[pick].text if pick >= 0 else "" for group, pick in zip(groups, picks)]
+    slack = budget - sum(g.options[p].tokens for g, p in zip(groups, picks) if p >= 0)
+    order = sorted(range(len(groups)), key=lambda i: (-groups[i].priority, groups[i].idx))
+    for i in order:
+        group, pick = groups[i], picks[i]
+        if slack <= 0:
+            break
+        if pick < 0 or not group.options[pick].trimmed:
+            continue
+        current = group.options[pick].tokens
+        grown = cut_at_boundary(group.text, current + slack)
+        if len(grown) > len(texts[i]):
+            slack -= prefix_tokens(group.text, len(grown)) - current
+            texts[i] = grown
+    return texts
+
+
+def pack_blocks(
+    blocks: list[dict[str, Any]],
+    budget_tokens: int,
+) -> tuple[list[tuple[str, str]], list[dict[str, Any]], bool]:
+    """Pick blocks and trim levels that maximize priority-weighted utility within the budget.
+
+    Returns ``(packed, dropped, trimmed)`` with packed blocks ordered by
+    priority. Ties resolve the same way every time for the same input.
+    """
+    budget = max(0, int(budget_tokens))
+    groups: list[_Group] = []
+    for idx, block in enumerate(blocks):
+        text = str(block.get("text", ""))
+        if not text:
+            continue
+        priority = int(block.get("priority", 50))
+        required = bool(block.get("required", False))
+        allow_trim = bool(block.get("allow_trim", False))
+        groups.append(
+            _Group(
+                idx=idx,
+                name=str(block.get("name", f"block_{idx}")),
+                priority=priority,
+                required=required,
+                text=text,
+                options=_options(text, estimate_tokens(text), priority, required, allow_trim, budget),
+            )
+        )
+
+    picks = list(_solve(groups, budget))
+    texts = _fill_slack(groups, picks, budget)
+
+    packed: list[tuple[int, int, str, str]] = []
+    dropped: list[dict[str, Any]] = []
+    trimmed = False
+    for group, pick, text in zip(groups, picks, texts):
+        if pick < 0:
+            dropped.append({"name": group.name, "reason": "no_budget" if group.required else "budget_pruned"})
+            continue
+        trimmed = trimmed or len(text) < len(group.text)
+        packed.append((group.priority, group.idx, group.name, text))
+    packed.sort(key=lambda item: (-item[0], item[1]))
+    return [(name, text) for _priority, _idx, name, text in packed], dropped, trimmed
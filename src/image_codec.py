@@ -0,0 +1,310 @@
+"""Adaptive screenshot encoding that picks the smallest codec keeping text sharp."""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from PIL import Image, ImageChops, ImageFilter, ImageStat, features
+
+logger = logging.getLogger(__name__)
+
+# Minimum edge fidelity (0..1) a candidate must keep relative to the source frame.
+DEFAULT_SHARPNESS_FLOOR = 0.80
+# Re-run the full codec trial for an app type after this many encodes.
+DEFAULT_TRIAL_INTERVAL = 8
+PNG_PALETTE_COLORS = 128
+
+_MEDIA_TYPES = {
+    "jpeg": "image/jpeg",
+    "jpeg_gray": "image/jpeg",
+    "webp": "image/webp",
+    "png": "image/png",
+}
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="image-codec")
+
+
+@dataclass(slots=True)
+class EncodedCandidate:
+    """One encoded variant of a frame and how well it kept edge detail."""
+
+    codec: str
+    media_type: str
+    data: bytes
+    sharpness: float = 1.0
+
+
+@dataclass(frozen=True, slots=True)
+class EncodedImage:
+    """Immutable compressed screenshot; pixels are only decoded on demand."""
+
+    data: bytes
+    width: int
+    height: int
+    media_type: str
+    fingerprint: str
+    source_size: tuple[int, int] = (0, 0)
+    codec: str = ""
+
+    @property
+    def size(self) -> tuple[int, int]:
+        return (self.width, self.height)
+
+    @property
+    def b64(self) -> str:
+        return base64.standard_b64encode(self.data).decode("ascii")
+
+    def to_pil(self) -> Image.Image:
+        img = Image.open(io.BytesIO(self.data))
+        img.load()
+        return img
+
+
+def image_fingerprint(img: Image.Image) -> str:
+    """Content hash of a downscaled grayscale frame (stable across re-encodes)."""
+    small = img.convert("L").resize((128, 128))
+    return hashlib.blake2b(small.tobytes(), digest_size=16).hexdigest()
+
+
+def as_pil(image: Image.Image | EncodedImage) -> Image.Image:
+    if isinstance(image, EncodedImage):
+        return image.to_pil()
+    return image
+
+
+def webp_available() -> bool:
+    try:
+        return bool(features.check("webp"))
+    except Exception:
+        return False
+
+
+def is_text_dominant(img: Image.Image) -> bool:
+    """Heuristic: low saturation and a few flat colors covering most pixels."""
+    probe = img.convert("RGB").resize((128, 128), Image.NEAREST)
+    saturation = ImageStat.Stat(probe.convert("HSV").getchannel("S")).mean[0]
+    if saturation > 48:
+        return False
+    histogram = probe.convert("L").histogram()
+    # 32 luminance bins; text frames concentrate in background + ink bins.
+    bins = [sum(histogram[i : i + 8]) for i in range(0, 256, 8)]
+    top = sorted(bins, reverse=True)[:4]
+    return sum(top) / float(sum(bins) or 1) >= 0.75
+
+
+def _edge_map(img: Image.Image) -> Image.Image:
+    return img.convert("L").filter(ImageFilter.FIND_EDGES)
+
+
+def _sharpness(reference_edges: Image.Image, data: bytes) -> float:
+    """Return 1 - normalized edge error between the source and a decoded candidate."""
+    with Image.open(io.BytesIO(data)) as decoded:
+        edges = _edge_map(decoded)
+    ref_energy = ImageStat.Stat(reference_edges).mean[0]
+    if ref_energy <= 0.5:
+        return 1.0
+    error = ImageStat.Stat(ImageChops.difference(reference_edges, edges)).mean[0]
+    return max(0.0, min(1.0, 1.0 - error / ref_energy))
+
+
+def _encode(img: Image.Image, codec: str, quality: int) -> bytes:
+    buf = io.BytesIO()
+    if codec == "jpeg":
+        img.convert("RGB").save(buf, format="JPEG", quality=quality)
+    elif codec == "jpeg_gray":
+        img.convert("L").save(buf, format="JPEG", quality=min(95, quality + 10))
+    elif codec == "webp":
+        img.convert("RGB").save(buf, format="WEBP", quality=quality, method=4)
+    elif codec == "png":
+        palette = img.convert("RGB").quantize(
+            colors=PNG_PALETTE_COLORS,
+            method=Image.Quantize.FASTOCTREE,
+        )
+        palette.save(buf, format="PNG", optimize=False)
+    else:
+        raise ValueError(f"Unknown codec: {codec}")
+    return buf.getvalue()
+
+
+def candidate_codecs(img: Image.Image, media_types: frozenset[str] | None = None) -> list[str]:
+    """Codecs worth trying for this frame, limited to the media types a backend accepts."""
+    codecs = ["jpeg", "png"]
+    if webp_available():
+        codecs.append("webp")
+    if is_text_dominant(img):
+        codecs.append("jpeg_gray")
+    if media_types:
+        codecs = [c for c in codecs if _MEDIA_TYPES[c] in media_types] or ["jpeg"]
+    return codecs
+
+
+def trial_encode(
+    img: Image.Image,
+    *,
+    quality: int,
+    codecs: list[str] | None = None,
+    sharpness_floor: float = DEFAULT_SHARPNESS_FLOOR,
+) -> EncodedCandidate:
+    """Encode with every candidate codec in parallel and keep the best one.
+
+    The smallest candidate at or above ``sharpness_floor`` wins. When none
+    qualifies the frame is photographic or noisy, so plain JPEG is kept.
+    """
+    codecs = codecs or candidate_codecs(img)
+    reference_edges = _edge_map(img)
+
+    def _run(codec: str) -> EncodedCandidate | None:
+        try:
+            data = _encode(img, codec, quality)
+            return EncodedCandidate(
+                codec=codec,
+                media_type=_MEDIA_TYPES[codec],
+                data=data,
+                sharpness=_sharpness(reference_edges, data),
+            )
+        except Exception as exc:
+            logger.warning("Image codec %s failed: %s", codec, exc)
+            return None
+
+    results = [r for r in _executor.map(_run, codecs) if r is not None]
+    if not results:
+        data = _encode(img, "jpeg", quality)
+        return EncodedCandidate(codec="jpeg", media_type=_MEDIA_TYPES["jpeg"], data=data)
+
+    passing = [r for r in results if r.sharpness >= sharpness_floor]
+    if passing:
+        return min(passing, key=lambda r: len(r.data))
+    baseline = [r for r in results if r.codec == "jpeg"]
+    return baseline[0] if baseline else min(results, key=lambda r: len(r.data))
+
+
+class CodecSelector:
+    """Remember the winning codec per app type and only re-trial occasionally."""
+
+    def __init__(
+        self,
+        *,
+        trial_interval: int = DEFAULT_TRIAL_INTERVAL,
+        sharpness_floor: float = DEFAULT_SHARPNESS_FLOOR,
+        media_types: frozenset[str] | None = None,
+    ):
+        self.trial_interval = max(1, int(trial_interval))
+        self.sharpness_floor = float(sharpness_floor)
+        self.media_types = media_types
+        self._choices: dict[str, tuple[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def remembered(self, app_type: str) -> str:
+        with self._lock:
+            entry = self._choices.get(app_type)
+        return entry[0] if entry else ""
+
+    def encode(self, img: Image.Image, *, app_type: str, quality: int) -> EncodedCandidate:
+        with self._lock:
+            entry = self._choices.get(app_type)
+            if entry is not None and entry[1] < self.trial_interval:
+                self._choices[app_type] = (entry[0], entry[1] + 1)
+                codec = entry[0]
+            else:
+                codec = ""
+
+        if codec:
+            try:
+                data = _encode(img, codec, quality)
+                return EncodedCandidate(codec=codec, media_type=_MEDIA_TYPES[codec], data=data)
+            except Exception as exc:
+                logger.warning("Remembered codec %s failed, re-running trial: %s", codec, exc)
+
+        best = trial_encode(
+            img,
+            quality=quality,
+            codecs=candidate_codecs(img, self.media_types),
+            sharpness_floor=self.sharpness_floor,
+        )
+        with self._lock:
+            self._choices[app_type] = (best.codec, 1)
+        logger.info(
+            "Image codec trial: app=%s winner=%s size=%.0fKB sharpness=%.2f",
+            app_type or "default",
+            best.codec,
+            len(best.data) / 1024,
+            best.sharpness,
+        )
+        return best
+
+
+# --- Follow-up frame diffing ---
+
+DIFF_THUMB_SIZE = 256
+DIFF_PIXEL_DELTA = 24
+# Changed-pixel share below which a frame counts as unchanged (cursor blink, clock).
+DIFF_NOISE_FRACTION = 0.002
+DIFF_PAD_RATIO = 0.02
+DEFAULT_DIFF_MAX_AREA_RATIO = 0.35
+
+
+@dataclass(slots=True)
+class FrameDiff:
+    """How a follow-up capture differs from the reference frame."""
+
+    kind: str  # "unchanged", "region" or "full"
+    box: tuple[int, int, int, int] | None = None
+    area_ratio: float = 0.0
+
+
+def diff_thumbnail(img: Image.Image) -> Image.Image:
+    thumb = img.convert("L")
+    thumb.thumbnail((DIFF_THUMB_SIZE, DIFF_THUMB_SIZE))
+    return thumb
+
+
+def diff_frames(
+    reference_thumb: Image.Image,
+    reference_size: tuple[int, int],
+    frame: Image.Image,
+    *,
+    max_area_ratio: float = DEFAULT_DIFF_MAX_AREA_RATIO,
+) -> FrameDiff:
+    """Compare a new capture against a reference thumbnail.
+
+    Returns ``region`` with a padded box in ``frame`` pixel coordinates when
+    the changed bounding box covers at most ``max_area_ratio`` of the frame.
+    """
+    if frame.size != reference_size:
+        return FrameDiff(kind="full", area_ratio=1.0)
+
+    thumb = diff_thumbnail(frame)
+    if thumb.size != reference_thumb.size:
+        return FrameDiff(kind="full", area_ratio=1.0)
+
+    mask = ImageChops.difference(reference_thumb, thumb).point(
+        lambda v: 255 if v > DIFF_PIXEL_DELTA else 0
+    )
+    changed = mask.histogram()[255]
+    total = thumb.size[0] * thumb.size[1]
+    bbox = mask.getbbox()
+    if bbox is None or changed <= total * DIFF_NOISE_FRACTION:
+        return FrameDiff(kind="unchanged")
+
+    left, top, right, bottom = bbox
+    area_ratio = ((right - left) * (bottom - top)) / float(total)
+    if area_ratio > max_area_ratio:
+        return FrameDiff(kind="full", area_ratio=area_ratio)
+
+    scale_x = frame.size[0] / thumb.size[0]
+    scale_y = frame.size[1] / thumb.size[1]
+    pad_x = int(frame.size[0] * DIFF_PAD_RATIO)
+    pad_y = int(frame.size[1] * DIFF_PAD_RATIO)
+    box = (
+        max(0, int(left * scale_x) - pad_x),
+        max(0, int(top * scale_y) - pad_y),
+        min(frame.size[0], int(right * scale_x) + pad_x),
+        min(frame.size[1], int(bottom * scale_y) + pad_y),
+    )
+    return FrameDiff(kind="region", box=box, area_ratio=area_ratio)
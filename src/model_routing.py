@@ -0,0 +1,82 @@
+"""Per-turn model routing: fast model for light turns, large model for heavy ones."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any
+
+from .backends import SUMMARY_MODELS
+from .interaction_mode import ResponseMode
+
+TIER_FAST = "fast"
+TIER_DEFAULT = "default"
+TIER_LARGE = "large"
+
+# Text-only questions up to this many characters count as short.
+DEFAULT_SHORT_QUESTION_CHARS = 160
+# Estimated prompt tokens (history + pinned context) at which a turn counts as long-context.
+DEFAULT_LONG_CONTEXT_TOKENS = 8000
+
+# An empty model name means "use the configured model" for that tier.
+DEFAULT_MODEL_ROUTES: dict[str, dict[str, str]] = {
+    "anthropic": {TIER_FAST: SUMMARY_MODELS["anthropic"], TIER_LARGE: ""},
+    "openai": {TIER_FAST: SUMMARY_MODELS["openai"], TIER_LARGE: ""},
+    "ollama": {TIER_FAST: "", TIER_LARGE: ""},
+}
+
+
+@dataclass(frozen=True, slots=True)
+class RouteChoice:
+    tier: str
+    model: str
+    reason: str
+
+
+class ModelRouter:
+    """Pick a model tier for a turn from its response mode, image and context size."""
+
+    def __init__(
+        self,
+        default_model: str,
+        routes: dict[str, Any] | None = None,
+        *,
+        short_question_chars: int = DEFAULT_SHORT_QUESTION_CHARS,
+        long_context_tokens: int = DEFAULT_LONG_CONTEXT_TOKENS,
+    ):
+        self.default_model = default_model
+        routes = routes if isinstance(routes, dict) else {}
+        self.models = {
+            TIER_FAST: str(routes.get(TIER_FAST) or "").strip() or default_model,
+            TIER_LARGE: str(routes.get(TIER_LARGE) or "").strip() or default_model,
+        }
+        self.short_question_chars = max(0, int(short_question_chars))
+        self.long_context_tokens = max(1, int(long_context_tokens))
+
+    def route(
+        self,
+        *,
+        response_mode: ResponseMode | None,
+        has_image: bool,
+        question_chars: int,
+        context_tokens: int,
+    ) -> RouteChoice:
+        if context_tokens >= self.long_context_tokens:
+            return self._choice(TIER_LARGE, "long_context")
+        if response_mode == ResponseMode.CASUAL:
+            return self._choice(TIER_FAST, "casual")
+        if not has_image and question_chars <= self.short_question_chars:
+            return self._choice(TIER_FAST, "short_text")
+        if has_image:
+            return self._choice(TIER_LARGE, "vision")
+        return self._choice(TIER_DEFAULT, "default")
+
+    def _choice(self, tier: str, reason: str) -> RouteChoice:
+        return RouteChoice(tier=tier, model=self.models.get(tier, self.default_model), reason=reason)
+
+
+def routes_for_backend(backend_name: str, model_routes: Any) -> dict[str, str]:
+    """Merge a backend's configured route map over the built-in defaults."""
+    merged = dict(DEFAULT_MODEL_ROUTES.get(backend_name, {}))
+    if isinstance(model_routes, dict) and isinstance(model_routes.get(backend_name), dict):
+        merged.update({k: str(v or "") for k, v in model_routes[backend_name].items()})
+    return merged
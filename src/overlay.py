@@ -5,8 +5,9 @@ import threading
 import tkinter as tk
 import tkinter.font as tkfont
 
-from PIL import Image, ImageTk
+from PIL import ImageTk
 
+from .image_codec import EncodedImage
 from .interaction_mode import AssistantTurnResult, ResponseMode
 from .pet import Pet, PetState
 from .sprites import SpriteManager
@@ -111,7 +112,7 @@ class OverlayWindow:
 
         self._root: tk.Tk | None = None
         self._hwnd: int = 0
-        self._image: Image.Image | None = None
+        self._image: EncodedImage | None = None
         self._window_title: str = "BuddyGPT"
         self._pet = Pet()
         self._sprites = SpriteManager(frame_size=SPRITE_SIZE, chroma=CHROMA_RGB)
@@ -487,8 +488,9 @@ class OverlayWindow:
         if usage is None:
             self._hide_cost_label()
             return
+        prefix = "cached" if usage.cache_hit else f"~${usage.estimated_cost_usd:.4f}"
         self._cost_label.config(
-            text=f"~${usage.estimated_cost_usd:.4f} - session: ${usage.session_total_usd:.4f}"
+            text=f"{prefix} - session: ${usage.session_total_usd:.4f}"
         )
         self._cost_label.pack(pady=(0, 2), before=self._input_canvas)
 
@@ -573,7 +575,7 @@ class OverlayWindow:
                 self._set_window_height(bubble_h=self._bubble_total_h, with_input=True)
             self._update_status("Keep chatting")
 
-    def show(self, image: Image.Image | None = None, window_title: str = ""):
+    def show(self, image: EncodedImage | None = None, window_title: str = ""):
         self._image = image
         self._window_title = window_title
         if self._root:
@@ -0,0 +1,176 @@
+"""Fast local token estimates for budgeting prompt context."""
+
+from __future__ import annotations
+
+import bisect
+import logging
+import math
+import re
+from functools import lru_cache
+from typing import Iterator
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+
+    TIKTOKEN_IMPORT_OK = True
+except Exception:
+    TIKTOKEN_IMPORT_OK = False
+    tiktoken = None  # type: ignore[assignment]
+
+# Memoized texts; blocks are re-estimated every turn, so repeats are common.
+ESTIMATE_CACHE_SIZE = 1024
+# Pieces between memoized checkpoints; a prefix lookup re-scans at most this many.
+CHECKPOINT_STRIDE = 64
+
+# One alternative per script class; the first match wins, so order matters.
+_PIECE_RE = re.compile(
+    r"(?P<blob>[A-Za-z0-9+/=]{24,})"  # base64, hashes, minified code
+    r"|(?P<cjk>[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]+)"
+    r"|(?P<word>[A-Za-z]+)"
+    r"|(?P<digits>[0-9]+)"
+    r"|(?P<space>\s+)"
+    r"|(?P<letters>[^\W\d_]+)"  # other scripts: Cyrillic, Greek, Arabic, ...
+    r"|(?P<symbols>[^\w\s]+|_+)"
+    r"|(?P<other>.)"  # anything else, e.g. non-ASCII digits
+)
+
+
+def _word_tokens(length: int) -> float:
+    # Common English words are one token; long ones split every ~6 letters.
+    return 1.0 + (length - 1) // 6
+
+
+# Tokens per piece of each class, as a function of its length in characters.
+_PIECE_COST = {
+    "blob": lambda n: n / 2.5,
+    "cjk": lambda n: n * 1.1,
+    "word": _word_tokens,
+    "digits": lambda n: math.ceil(n / 3),
+    "letters": lambda n: n / 2.0,
+    "symbols": lambda n: math.ceil(n / 2),
+    "other": float,
+}
+
+_encoding = None
+_encoding_name = ""
+
+
+def set_token_encoding(name: str) -> bool:
+    """Use a BPE vocabulary (via the optional tiktoken package) instead of heuristics.
+
+    An empty name restores the heuristics. Returns False when the vocabulary
+    cannot be loaded, in which case the heuristics stay in use.
+    """
+    global _encoding, _encoding_name
+    name = str(name or "").strip()
+    if name == _encoding_name:
+        return _encoding is not None or not name
+    encoding = None
+    if name:
+        if not TIKTOKEN_IMPORT_OK or tiktoken is None:
+            logger.warning("Token encoding %s requested but tiktoken is not installed.", name)
+        else:
+            try:
+                encoding = tiktoken.get_encoding(name)
+            except Exception as exc:
+                logger.warning("Token encoding %s unavailable, using heuristics: %s", name, exc)
+    _encoding = encoding
+    _encoding_name = name
+    _estimate.cache_clear()
+    _checkpoints.cache_clear()
+    return encoding is not None or not name
+
+
+def _space_tokens(piece: str) -> float:
+    # A single space merges into the next word; newlines and indentation runs do not.
+    if piece == " ":
+        return 0.0
+    return 1.0 if "\n" in piece or len(piece) > 1 else 0.0
+
+
+def _pieces(text: str, pos: int = 0) -> Iterator[tuple[int, int, float]]:
+    """``(start, end, tokens)`` of each piece of ``text`` from ``pos`` on."""
+    for match in _PIECE_RE.finditer(text, pos):
+        kind = match.lastgroup or "other"
+        piece = match.group()
+        cost = _space_tokens(piece) if kind == "space" else _PIECE_COST[kind](len(piece))
+        yield match.start(), match.end(), cost
+
+
+@lru_cache(maxsize=ESTIMATE_CACHE_SIZE)
+def _checkpoints(text: str) -> tuple[tuple[int, ...], tuple[float, ...]]:
+    """Piece end offsets and cumulative token counts every ``CHECKPOINT_STRIDE`` pieces.
+
+    Starts at ``(0, 0.0)`` and ends with the whole text, so the cache holds a
+    few numbers per text rather than a tuple entry per piece.
+    """
+    ends = [0]
+    totals = [0.0]
+    total = 0.0
+    end = 0
+    for count, (_start, end, cost) in enumerate(_pieces(text), start=1):
+        total += cost
+        if count % CHECKPOINT_STRIDE == 0:
+            ends.append(end)
+            totals.append(total)
+    if ends[-1] != end:
+        ends.append(end)
+        totals.append(total)
+    return tuple(ends), tuple(totals)
+
+
+@lru_cache(maxsize=ESTIMATE_CACHE_SIZE)
+def _estimate(text: str) -> int:
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    _ends, totals = _checkpoints(text)
+    return max(1, math.ceil(totals[-1]))
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimated token count of ``text`` (0 for empty text)."""
+    if not text:
+        return 0
+    return _estimate(text)
+
+
+def prefix_tokens(text: str, cut: int) -> int:
+    """Estimated tokens of ``text[:cut]``, scanned on from the nearest memoized checkpoint."""
+    if cut <= 0 or not text:
+        return 0
+    if cut >= len(text):
+        return estimate_tokens(text)
+    if _encoding is not None:
+        return estimate_tokens(text[:cut])
+    ends, totals = _checkpoints(text)
+    i = bisect.bisect_right(ends, cut) - 1
+    spent = totals[i]
+    for start, end, cost in _pieces(text, ends[i]):
+        if end >= cut:
+            spent += (cut - start) * (cost / (end - start))
+            break
+        spent += cost
+    return math.ceil(spent)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Longest prefix of ``text`` whose estimate fits ``max_tokens``."""
+    if max_tokens <= 0 or not text:
+        return ""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    if _encoding is not None:
+        return _encoding.decode(_encoding.encode(text, disallowed_special=())[:max_tokens])
+    ends, totals = _checkpoints(text)
+    i = bisect.bisect_right(totals, max_tokens) - 1
+    spent = totals[i]
+    for start, end, cost in _pieces(text, ends[i]):
+        if spent + cost > max_tokens:
+            # Cut inside the first piece that does not fit at its per-character rate.
+            rate = cost / (end - start)
+            extra = int((max_tokens - spent) / rate) if rate > 0 else 0
+            return text[: min(start + extra, end)]
+        spent += cost
+    return text
@@ -0,0 +1,307 @@
+"""Retry, deadline and circuit-breaker policy for backend HTTP calls."""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+from email.message import Message
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, TypeVar
+from urllib.error import HTTPError, URLError
+
+try:
+    import httpx
+except ImportError:  # some anthropic releases ship the same client as httpx2
+    import httpx2 as httpx  # type: ignore[no-redef]
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS = frozenset({408, 425, 429, 500, 502, 503, 504})
+# Longest Retry-After we are willing to honor inside one user turn.
+MAX_RETRY_AFTER_SEC = 30.0
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without touching the network while a backend's breaker is open."""
+
+
+@dataclass(frozen=True, slots=True)
+class TransportPolicy:
+    max_retries: int = 2
+    base_delay_sec: float = 0.5
+    max_delay_sec: float = 8.0
+    breaker_failures: int = 3
+    breaker_cooldown_sec: float = 30.0
+
+
+class CircuitBreaker:
+    """Open after N consecutive failures; allow one probe once the cool-down passes."""
+
+    def __init__(
+        self,
+        *,
+        failure_threshold: int,
+        cooldown_sec: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.cooldown_sec = max(0.0, float(cooldown_sec))
+        self._clock = clock
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if self._clock() - self._opened_at >= self.cooldown_sec:
+                return "half_open"
+            return "open"
+
+    def before_call(self, label: str) -> None:
+        with self._lock:
+            if self._opened_at is None:
+                return
+            remaining = self.cooldown_sec - (self._clock() - self._opened_at)
+            if remaining > 0 or self._probing:
+                raise CircuitOpenError(
+                    f"{label} is unavailable after repeated failures; retrying in {max(remaining, 0):.0f}s."
+                )
+            self._probing = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def release_probe(self) -> None:
+        """Forget an abandoned half-open probe (e.g. a cancelled request) so another may run."""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self, label: str) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+                logger.warning(
+                    "event=CIRCUIT_OPEN flow=transport backend=%s failures=%d cooldown_sec=%.0f",
+                    label,
+                    self._failures,
+                    self.cooldown_sec,
+                )
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(key: str, policy: TransportPolicy) -> CircuitBreaker:
+    """Shared breaker per backend endpoint, so re-created backends see the same state."""
+    with _breakers_lock:
+        breaker = _breakers.get(key)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                failure_threshold=policy.breaker_failures,
+                cooldown_sec=policy.breaker_cooldown_sec,
+            )
+            _breakers[key] = breaker
+        return breaker
+
+
+def parse_retry_after(value: str | None, *, now: float | None = None) -> float | None:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    now = time.time() if now is None else now
+    return max(0.0, when.timestamp() - now)
+
+
+def _is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, HTTPError):
+        return exc.code in RETRYABLE_STATUS
+    return isinstance(exc, (URLError, TimeoutError, ConnectionError))
+
+
+class Transport:
+    """Run one logical request with jittered backoff under an overall deadline."""
+
+    def __init__(
+        self,
+        key: str,
+        policy: TransportPolicy | None = None,
+        *,
+        sleep: Callable[[float], None] = time.sleep,
+        clock: Callable[[], float] = time.monotonic,
+        rng: random.Random | None = None,
+    ):
+        self.key = key
+        self.policy = policy or TransportPolicy()
+        self.breaker = get_breaker(key, self.policy)
+        self._sleep = sleep
+        self._clock = clock
+        self._rng = rng or random.Random()
+
+    def backoff_delay(self, attempt: int) -> float:
+        ceiling = min(self.policy.max_delay_sec, self.policy.base_delay_sec * (2**attempt))
+        return self._rng.uniform(0, ceiling)
+
+    def _next_delay(self, exc: Exception, attempt: int, deadline: float) -> float | None:
+        """Seconds to wait before retrying ``exc``, or None to give up."""
+        if isinstance(exc, HTTPError) and not _is_retryable(exc):
+            # The server answered; a 4xx says nothing about its health.
+            self.breaker.record_success()
+            return None
+        if not _is_retryable(exc):
+            self.breaker.record_failure(self.key)
+            return None
+        delay = self.backoff_delay(attempt)
+        if isinstance(exc, HTTPError) and exc.code in {429, 503}:
+            retry_after = parse_retry_after(exc.headers.get("Retry-After") if exc.headers else None)
+            if retry_after is not None:
+                delay = max(delay, min(retry_after, MAX_RETRY_AFTER_SEC))
+        remaining = deadline - self._clock()
+        if attempt >= self.policy.max_retries or delay >= remaining:
+            self.breaker.record_failure(self.key)
+            logger.warning(
+                "event=TRANSPORT_GIVE_UP flow=transport backend=%s attempts=%d error=%s",
+                self.key,
+                attempt + 1,
+                exc,
+            )
+            return None
+        logger.info(
+            "event=TRANSPORT_RETRY flow=transport backend=%s attempt=%d delay_ms=%d error=%s",
+            self.key,
+            attempt + 1,
+            int(delay * 1000),
+            exc,
+        )
+        return delay
+
+    def _attempt_timeout(self, attempt: int, timeout_sec: float, deadline: float) -> float:
+        if attempt == 0:
+            return timeout_sec
+        return max(0.001, min(timeout_sec, deadline - self._clock()))
+
+    def call(self, fn: Callable[[float], T], *, timeout_sec: float, deadline_sec: float | None = None) -> T:
+        """Call ``fn(attempt_timeout)`` until it succeeds, retries run out, or the deadline passes.
+
+        The first attempt gets the full ``timeout_sec``; retries only get what
+        is left of ``deadline_sec`` (defaults to ``timeout_sec``).
+        """
+        self.breaker.before_call(self.key)
+        deadline = self._clock() + (deadline_sec or timeout_sec)
+        attempt = 0
+        while True:
+            try:
+                result = fn(self._attempt_timeout(attempt, timeout_sec, deadline))
+            except Exception as exc:
+                delay = self._next_delay(exc, attempt, deadline)
+                if delay is None:
+                    raise
+                self._sleep(delay)
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            return result
+
+    async def acall(
+        self,
+        fn: Callable[[float], Awaitable[T]],
+        *,
+        timeout_sec: float,
+        deadline_sec: float | None = None,
+    ) -> T:
+        """Async twin of :meth:`call`; cancellation propagates immediately."""
+        self.breaker.before_call(self.key)
+        deadline = self._clock() + (deadline_sec or timeout_sec)
+        attempt = 0
+        while True:
+            attempt_timeout = self._attempt_timeout(attempt, timeout_sec, deadline)
+            try:
+                result = await asyncio.wait_for(fn(attempt_timeout), attempt_timeout)
+            except asyncio.CancelledError:
+                # Says nothing about the backend's health, but must not leave a probe in flight.
+                self.breaker.release_probe()
+                raise
+            except Exception as exc:
+                delay = self._next_delay(exc, attempt, deadline)
+                if delay is None:
+                    raise
+                try:
+                    await asyncio.sleep(delay)
+                except asyncio.CancelledError:
+                    self.breaker.release_probe()
+                    raise
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            return result
+
+
+# Idle keep-alive connections stay this long, so consecutive turns skip the TCP/TLS handshake.
+HTTP_KEEPALIVE_EXPIRY_SEC = 60.0
+HTTP_MAX_CONNECTIONS = 10
+
+
+def new_async_http_client() -> httpx.AsyncClient:
+    """Pooled client for one base URL; honors HTTP(S)_PROXY and NO_PROXY like urllib."""
+    return httpx.AsyncClient(
+        timeout=None,  # each request passes the attempt timeout
+        follow_redirects=True,
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SEC,
+        ),
+        trust_env=True,
+    )
+
+
+async def async_http_request(
+    client: httpx.AsyncClient,
+    url: str,
+    *,
+    data: bytes | None = None,
+    headers: dict[str, str] | None = None,
+    method: str = "POST",
+    timeout_sec: float | None = None,
+) -> bytes:
+    """Send one request on a pooled client and return the response body.
+
+    Errors mirror urllib: HTTPError for status >= 400 and URLError for
+    connection or protocol failures, so the retry policy treats both paths alike.
+    """
+    try:
+        response = await client.request(method, url, content=data, headers=headers, timeout=timeout_sec)
+    except httpx.TransportError as exc:
+        raise URLError(exc) from exc
+    if response.status_code >= 400:
+        response_headers = Message()
+        for name, value in response.headers.multi_items():
+            response_headers[name] = value
+        body = io.BytesIO(response.content)
+        raise HTTPError(url, response.status_code, response.reason_phrase, response_headers, body)
+    return response.content
@@ -0,0 +1,126 @@
+"""Small thread-safe TTL + LRU cache with single-flight loading."""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Callable, Generic, Hashable, TypeVar
+
+V = TypeVar("V")
+
+
+@dataclass(slots=True)
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    coalesced: int = 0
+    evictions: int = 0
+    size: int = 0
+
+
+class TTLCache(Generic[V]):
+    """Bounded cache whose entries expire ``ttl_sec`` after they were stored.
+
+    ``get_or_load`` runs the loader once per key even when several threads
+    ask for the same missing key at the same time; the others wait for it.
+    """
+
+    def __init__(
+        self,
+        *,
+        ttl_sec: float,
+        max_entries: int,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttl_sec = max(0.0, float(ttl_sec))
+        self.max_entries = max(1, int(max_entries))
+        self._clock = clock
+        self._entries: OrderedDict[Hashable, tuple[float, V]] = OrderedDict()
+        self._inflight: dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self._stats = CacheStats()
+
+    def _lookup(self, key: Hashable) -> tuple[bool, V | None]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if self._clock() >= expires_at:
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def get(self, key: Hashable) -> V | None:
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                self._stats.hits += 1
+            else:
+                self._stats.misses += 1
+            return value
+
+    def put(self, key: Hashable, value: V) -> None:
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl_sec, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats.evictions += 1
+
+    def get_or_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], V],
+        *,
+        should_cache: Callable[[V], bool] | None = None,
+    ) -> V:
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                self._stats.hits += 1
+                return value  # type: ignore[return-value]
+            pending = self._inflight.get(key)
+            if pending is None:
+                self._stats.misses += 1
+                pending = Future()
+                self._inflight[key] = pending
+                owner = True
+            else:
+                self._stats.coalesced += 1
+                owner = False
+
+        if not owner:
+            return pending.result()
+
+        try:
+            value = loader()
+        except BaseException as exc:
+            with self._lock:
+                self._inflight.pop(key, None)
+            pending.set_exception(exc)
+            raise
+        if should_cache is None or should_cache(value):
+            self.put(key, value)
+        with self._lock:
+            self._inflight.pop(key, None)
+        pending.set_result(value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._stats = CacheStats()
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                hits=self._stats.hits,
+                misses=self._stats.misses,
+                coalesced=self._stats.coalesced,
+                evictions=self._stats.evictions,
+                size=len(self._entries),
+            )
@@ -0,0 +1,76 @@
+"""End-to-end latency budget for one user turn."""
+
+from __future__ import annotations
+
+import math
+import time
+from typing import Callable
+
+DEFAULT_TURN_DEADLINE_SEC = 30.0
+# Always held back for the model call itself.
+BACKEND_RESERVE_SEC = 8.0
+# Slack beyond the backend reserve each optional stage needs; the stage with the
+# largest requirement is dropped first (browse, then OCR, then image detail, then search).
+STAGE_MIN_SLACK_SEC = {
+    "browse": 10.0,
+    "ocr": 6.0,
+    "image": 4.0,
+    "search": 2.0,
+}
+MIN_STAGE_TIMEOUT_SEC = 0.5
+MIN_BACKEND_TIMEOUT_SEC = 1.0
+
+
+class TurnBudget:
+    """Deadline shared by every stage of a turn; ``deadline_sec <= 0`` disables it."""
+
+    def __init__(
+        self,
+        deadline_sec: float = DEFAULT_TURN_DEADLINE_SEC,
+        *,
+        backend_reserve_sec: float = BACKEND_RESERVE_SEC,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.deadline_sec = float(deadline_sec)
+        self.backend_reserve_sec = max(0.0, float(backend_reserve_sec))
+        self._clock = clock
+        self._started = clock()
+        self.degraded: list[str] = []
+
+    @property
+    def enabled(self) -> bool:
+        return self.deadline_sec > 0
+
+    def elapsed(self) -> float:
+        return self._clock() - self._started
+
+    def remaining(self) -> float:
+        if not self.enabled:
+            return math.inf
+        return self.deadline_sec - self.elapsed()
+
+    def slack(self) -> float:
+        """Time left for optional stages once the backend reserve is set aside."""
+        return self.remaining() - self.backend_reserve_sec
+
+    def allows(self, stage: str) -> bool:
+        """Whether ``stage`` still fits; a refusal is recorded as a degradation."""
+        if self.slack() >= STAGE_MIN_SLACK_SEC.get(stage, 0.0):
+            return True
+        self.degrade(stage)
+        return False
+
+    def degrade(self, stage: str) -> None:
+        if stage not in self.degraded:
+            self.degraded.append(stage)
+
+    def stage_timeout(self, default_sec: float) -> float:
+        """Cap an optional stage's own timeout so it cannot eat the backend reserve."""
+        return max(MIN_STAGE_TIMEOUT_SEC, min(float(default_sec), self.slack()))
+
+    def backend_timeout(self, default_sec: float) -> float:
+        return max(MIN_BACKEND_TIMEOUT_SEC, min(float(default_sec), self.remaining()))
+
+    def final_timeout(self, default_sec: float) -> float:
+        """Timeout for the last model call of a turn: never less than the backend reserve."""
+        return min(float(default_sec), max(self.backend_reserve_sec, self.remaining()))
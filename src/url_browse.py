@@ -6,6 +6,7 @@ import ipaddress
 import logging
 import re
 import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from dataclasses import dataclass
 from html.parser import HTMLParser
 from typing import Iterable
@@ -29,6 +30,10 @@ DEFAULT_MAX_CHARS_PER_URL = 6000
 DEFAULT_MAX_TOTAL_CHARS = 18000
 
 _URL_PATTERN = re.compile(r"https?://[^\s<>()\"']+")
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+_WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+_fetch_executor = ThreadPoolExecutor(max_workers=6, thread_name_prefix="url-fetch")
 
 
 @dataclass(slots=True)
@@ -277,3 +282,71 @@ def build_browse_context(
         if total >= max_total_chars:
             break
     return separator.join(parts)
+
+
+def fetch_pages(
+    urls: list[str],
+    *,
+    per_url_timeout: float = DEFAULT_PER_URL_TIMEOUT,
+    global_timeout: float = DEFAULT_GLOBAL_TIMEOUT,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    allow_private: bool = False,
+) -> list[FetchedPage]:
+    """Fetch several pages concurrently under one global deadline.
+
+    Returns one page per URL in input order; fetches still running at the
+    deadline are reported as ``global_timeout`` failures.
+    """
+    if not urls:
+        return []
+    timeout_sec = min(per_url_timeout, global_timeout)
+    futures = [
+        _fetch_executor.submit(
+            fetch_public_page,
+            url=url,
+            timeout_sec=timeout_sec,
+            max_bytes=max_bytes,
+            allow_private=allow_private,
+        )
+        for url in urls
+    ]
+    wait(futures, timeout=global_timeout)
+    pages: list[FetchedPage] = []
+    for url, future in zip(urls, futures):
+        if future.done() and not future.cancelled():
+            pages.append(future.result())
+        else:
+            future.cancel()
+            pages.append(FetchedPage(url=url, ok=False, error="global_timeout"))
+    return pages
+
+
+def extract_relevant_passages(text: str, query: str, max_chars: int = 1500) -> str:
+    """Pick the sentences that share the most words with ``query``, in page order."""
+    terms = {w for w in _WORD_PATTERN.findall(query.lower()) if len(w) > 2}
+    sentences = [s.strip() for s in _SENTENCE_SPLIT.split(text) if s.strip()]
+    if not sentences:
+        return ""
+    if not terms:
+        return text[:max_chars]
+
+    scored = []
+    for idx, sentence in enumerate(sentences):
+        words = set(_WORD_PATTERN.findall(sentence.lower()))
+        score = len(terms & words)
+        if score:
+            scored.append((score, idx))
+    if not scored:
+        return text[:max_chars]
+
+    picked: list[int] = []
+    used = 0
+    for _score, idx in sorted(scored, key=lambda item: (-item[0], item[1])):
+        length = len(sentences[idx]) + 1
+        if used + length > max_chars:
+            continue
+        picked.append(idx)
+        used += length
+    if not picked:
+        return sentences[scored[0][1]][:max_chars]
+    return " ".join(sentences[i] for i in sorted(picked))
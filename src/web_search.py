@@ -1,32 +1,222 @@
 """Web search via DuckDuckGo — free, no API key needed."""
 
+import json
 import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from datetime import datetime
+from pathlib import Path
 
 from ddgs import DDGS
 
+from .ttl_cache import CacheStats, TTLCache
+from .url_browse import extract_relevant_passages, fetch_pages
+
 logger = logging.getLogger(__name__)
 
+SEARCH_CACHE_TTL_SEC = 600
+SEARCH_CACHE_MAX_ENTRIES = 128
+SEARCH_DEADLINE_SEC = 4.0
+DEEP_SEARCH_TOP_K = 3
+DEEP_SEARCH_TIMEOUT_SEC = 8.0
+DEEP_SEARCH_PASSAGE_CHARS = 1500
+
+_STOPWORDS = frozenset(
+    {"a", "an", "the", "of", "in", "on", "for", "to", "and", "or", "is", "are",
+     "what", "whats", "how", "about", "with", "latest", "current", "today", "please"}
+)
+_TOKEN_RE = re.compile(r"[\w.+#-]+", re.UNICODE)
+
+_cache: TTLCache[list[dict]] = TTLCache(
+    ttl_sec=SEARCH_CACHE_TTL_SEC,
+    max_entries=SEARCH_CACHE_MAX_ENTRIES,
+)
+
+
+def normalize_query(query: str) -> str:
+    """Canonical cache key: lowercase bag of words without stopwords or this year's tag.
+
+    Models append the current year to recency queries, so "rust release 2026"
+    and "Latest Rust release" share a key. Other years are kept because they
+    change the meaning of the query.
+    """
+    year = str(datetime.now().year)
+    tokens = [t.strip(".-") for t in _TOKEN_RE.findall(query.lower())]
+    kept = {t for t in tokens if t and t not in _STOPWORDS and t != year}
+    if not kept:
+        return " ".join(query.lower().split())
+    return " ".join(sorted(kept))
+
 
 def search(query: str, max_results: int = 3) -> list[dict]:
-    """Search the web and return top results.
+    """Search the web and return top results, served from a short-lived cache.
 
     Returns list of {"title": ..., "url": ..., "snippet": ...}
     """
-    try:
-        with DDGS() as ddgs:
-            results = list(ddgs.text(query, max_results=max_results))
-        logger.info("Search '%s' → %d results", query, len(results))
-        return [
-            {
-                "title": r.get("title", ""),
-                "url": r.get("href", ""),
-                "snippet": r.get("body", ""),
-            }
-            for r in results
-        ]
-    except Exception as e:
-        logger.error("Search failed: %s", e)
-        return []
+    key = (normalize_query(query), int(max_results))
+    results = _cache.get_or_load(
+        key,
+        lambda: _search_uncached(query, max_results),
+        should_cache=bool,
+    )
+    return [dict(r) for r in results]
+
+
+def cache_stats() -> CacheStats:
+    return _cache.stats()
+
+
+def clear_cache() -> None:
+    _cache.clear()
+
+
+class SearchProvider:
+    """One search source. Implementations return normalized result dicts."""
+
+    name: str = ""
+
+    def search(self, query: str, max_results: int) -> list[dict]:
+        raise NotImplementedError
+
+
+class DDGSProvider(SearchProvider):
+    """Metasearch through ``ddgs`` pinned to one engine (``auto`` lets ddgs pick)."""
+
+    def __init__(self, backend: str = "duckduckgo", timeout_sec: float = SEARCH_DEADLINE_SEC):
+        self.backend = backend or "auto"
+        self.timeout_sec = timeout_sec
+        self.name = f"ddgs:{self.backend}"
+
+    def search(self, query: str, max_results: int) -> list[dict]:
+        with DDGS(timeout=max(1, int(round(self.timeout_sec)))) as ddgs:
+            raw = ddgs.text(query, max_results=max_results, backend=self.backend)
+        return [normalize_result(r) for r in raw or []]
+
+
+class FixtureProvider(SearchProvider):
+    """Canned results keyed by normalized query, for tests and offline benchmarks."""
+
+    name = "fixture"
+
+    def __init__(self, results: dict[str, list[dict]] | None = None, latency_sec: float = 0.0):
+        self.results = {normalize_query(q): list(r) for q, r in (results or {}).items()}
+        self.latency_sec = max(0.0, float(latency_sec))
+
+    @classmethod
+    def from_json(cls, path: str | Path, latency_sec: float = 0.0) -> "FixtureProvider":
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        return cls(data, latency_sec=latency_sec)
+
+    def search(self, query: str, max_results: int) -> list[dict]:
+        if self.latency_sec:
+            time.sleep(self.latency_sec)
+        rows = self.results.get(normalize_query(query), [])
+        return [normalize_result(r) for r in rows[:max_results]]
+
+
+def normalize_result(raw: dict) -> dict:
+    return {
+        "title": str(raw.get("title", "") or ""),
+        "url": str(raw.get("href") or raw.get("url") or raw.get("link") or ""),
+        "snippet": str(raw.get("body") or raw.get("snippet") or ""),
+    }
+
+
+_providers: list[SearchProvider] = [DDGSProvider("duckduckgo"), DDGSProvider("brave")]
+_deadline_sec: float = SEARCH_DEADLINE_SEC
+_provider_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="search-provider")
+
+
+def configure(
+    *,
+    providers: list[SearchProvider] | None = None,
+    backends: list[str] | None = None,
+    deadline_sec: float | None = None,
+) -> None:
+    """Set the provider chain (tried in order) and the per-provider deadline."""
+    global _providers, _deadline_sec
+    if deadline_sec is not None:
+        _deadline_sec = max(0.5, float(deadline_sec))
+    if providers is None and backends:
+        providers = [DDGSProvider(b, timeout_sec=_deadline_sec) for b in backends]
+    if providers:
+        _providers = list(providers)
+    _cache.clear()
+
+
+def _search_uncached(query: str, max_results: int) -> list[dict]:
+    for provider in _providers:
+        started = time.monotonic()
+        future = _provider_executor.submit(provider.search, query, max_results)
+        try:
+            results = future.result(timeout=_deadline_sec)
+        except FutureTimeoutError:
+            # The worker thread cannot be interrupted; it finishes in the background.
+            future.cancel()
+            logger.warning("Search provider %s missed %.1fs deadline", provider.name, _deadline_sec)
+            continue
+        except Exception as e:
+            logger.error("Search failed (%s): %s", provider.name, e)
+            continue
+        logger.info(
+            "Search '%s' → %d results (provider=%s, %.0fms)",
+            query,
+            len(results),
+            provider.name,
+            (time.monotonic() - started) * 1000,
+        )
+        if results:
+            return results
+    return []
+
+
+def deep_search(
+    query: str,
+    *,
+    top_k: int = DEEP_SEARCH_TOP_K,
+    timeout_sec: float = DEEP_SEARCH_TIMEOUT_SEC,
+    passage_chars: int = DEEP_SEARCH_PASSAGE_CHARS,
+    results: list[dict] | None = None,
+) -> list[dict]:
+    """Search, then read the top results in parallel and attach relevant passages.
+
+    Results keep the ``{title, url, snippet}`` shape plus ``passages`` for
+    pages that loaded before the deadline. Pass ``results`` to skip the search.
+    """
+    if results is None:
+        results = search(query, max_results=max(1, top_k))
+    else:
+        results = [dict(r) for r in results[: max(1, top_k)]]
+    urls = [r["url"] for r in results if r.get("url")]
+    started = time.monotonic()
+    pages = {p.url: p for p in fetch_pages(urls, global_timeout=timeout_sec)}
+    fetched = 0
+    for result in results:
+        page = pages.get(result.get("url", ""))
+        if page is None or not page.ok:
+            continue
+        passages = extract_relevant_passages(page.text, query, max_chars=passage_chars)
+        if passages:
+            result["passages"] = passages
+            fetched += 1
+    logger.info(
+        "event=DEEP_SEARCH flow=tool results=%d fetched=%d duration_ms=%d",
+        len(results),
+        fetched,
+        int((time.monotonic() - started) * 1000),
+    )
+    return results
+
+
+def query_similarity(a: str, b: str) -> float:
+    """Jaccard overlap of two queries after normalization."""
+    left = set(normalize_query(a).split())
+    right = set(normalize_query(b).split())
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
 
 
 def format_results(results: list[dict]) -> str:
@@ -35,5 +225,8 @@ def format_results(results: list[dict]) -> str:
         return "No results found."
     parts = []
     for r in results:
-        parts.append(f"• {r['title']}\n  {r['snippet']}\n  {r['url']}")
+        part = f"• {r['title']}\n  {r['snippet']}\n  {r['url']}"
+        if r.get("passages"):
+            part += f"\n  From the page: {r['passages']}"
+        parts.append(part)
     return "\n\n".join(parts)
@@ -8,6 +8,7 @@ from unittest.mock import MagicMock
 
 import pytest
 
+from src.backends import clear_backend_registry
 from src.notifications.daily_chat import DailyChatSource
 from src.notifications.state import NotificationState
 
@@ -37,6 +38,14 @@ class FakeAI:
         pass
 
 
+@pytest.fixture(autouse=True)
+def _isolated_backend_registry():
+    """Tests swap fake clients onto backends, so never share them across tests."""
+    clear_backend_registry()
+    yield
+    clear_backend_registry()
+
+
 @pytest.fixture()
 def fake_state(tmp_path: Path) -> NotificationState:
     """NotificationState backed by a temporary JSON file."""
@@ -70,12 +79,14 @@ def default_config() -> dict:
         "hash_threshold": 12,
         "max_tokens": 400,
         "history_window_turns": 6,
+        "history_token_budget": 6000,
         "history_summary_every_turns": 6,
         "history_summary_max_chars": 1800,
+        "history_summarizer": False,
+        "search_prefetch": False,
         "enable_monitor": False,
         "allow_private_url_browse": True,
-        "context_max_chars": 9000,
-        "context_reference_refresh_turns": 3,
+        "context_max_tokens": 2250,
         "url_cache_ttl_sec": 300,
         "ocr_cache_ttl_sec": 300,
         "context_telemetry": True,
@@ -7,7 +7,11 @@ from types import SimpleNamespace
 import anthropic
 from PIL import Image
 
-from src.ai_assistant import AIAssistant, ChatMessage, SEARCH_TOOL
+from src.ai_assistant import AIAssistant, ChatMessage, RequestCancelled, SEARCH_TOOL
+from src.backends import BackendResponse
+from src.image_codec import EncodedImage
+from src.interaction_mode import ResponseMode
+from src.turn_budget import TurnBudget
 
 
 class _Block:
@@ -98,6 +102,39 @@ def test_history_trim_keeps_recent_turns_and_latest_image_turn():
     ]
 
 
+def test_history_trim_keeps_turns_that_fit_token_budget():
+    ai = AIAssistant(api_key="sk-test", history_window_turns=20, history_token_budget=300)
+    ai.history = [
+        ChatMessage(role="user", text="big log " + "x" * 4000),
+        ChatMessage(role="assistant", text="big-reply"),
+        ChatMessage(role="user", text="small1"),
+        ChatMessage(role="assistant", text="small1-reply"),
+        ChatMessage(role="user", text="small2"),
+        ChatMessage(role="assistant", text="small2-reply"),
+        ChatMessage(role="user", text="latest"),
+    ]
+
+    ai._trim_history()
+
+    assert [m.text for m in ai.history][0] == "small1"
+    assert len(ai.history) == 5
+    assert all(m.token_estimate > 0 for m in ai.history)
+
+
+def test_history_trim_always_keeps_latest_turn_over_budget():
+    ai = AIAssistant(api_key="sk-test", history_token_budget=256)
+    ai.history = [
+        ChatMessage(role="user", text="short"),
+        ChatMessage(role="assistant", text="reply"),
+        ChatMessage(role="user", text="y" * 8000),
+    ]
+
+    ai._trim_history()
+
+    assert len(ai.history) == 1
+    assert ai.history[0].text.startswith("y")
+
+
 def test_personality_sets_default_max_tokens():
     ai = AIAssistant(api_key="sk-test", personality="detailed")
     assert ai.max_tokens == 1500
@@ -128,3 +165,573 @@ def test_history_summary_added_to_system_prompt_after_trim():
     prompt = ai._get_full_system_prompt()
     assert "Session summary" in prompt
     assert "old user" in prompt.lower()
+
+
+def test_tool_calls_in_one_round_run_concurrently_in_call_order(monkeypatch):
+    import threading
+    import time
+
+    from src import ai_assistant as ai_mod
+    from src.backends import ToolCall
+
+    barrier = threading.Barrier(2, timeout=2)
+
+    def _slow_search(query):
+        barrier.wait()
+        time.sleep(0.05 if query == "first" else 0.0)
+        return [{"title": query, "url": "https://example.com", "snippet": query}]
+
+    monkeypatch.setattr(ai_mod, "search", _slow_search)
+    ai = AIAssistant(api_key="sk-test")
+    calls = [
+        ToolCall(id="tu_1", name="web_search", input={"query": "first"}),
+        ToolCall(id="tu_2", name="web_search", input={"query": "second"}),
+    ]
+
+    results = ai._run_tool_calls(calls)
+
+    assert [r["tool_use_id"] for r in results] == ["tu_1", "tu_2"]
+    assert "first" in results[0]["content"]
+    assert "is_error" not in results[0]
+
+
+def test_tool_call_timeout_returns_error_result(monkeypatch):
+    import threading
+
+    from src import ai_assistant as ai_mod
+    from src.backends import ToolCall
+
+    release = threading.Event()
+    monkeypatch.setitem(ai_mod.TOOL_HANDLERS, "slow_tool", lambda _input: release.wait(5) and "late")
+    ai = AIAssistant(api_key="sk-test", tool_call_timeout_sec=1)
+
+    try:
+        results = ai._run_tool_calls([ToolCall(id="tu_slow", name="slow_tool", input={})])
+    finally:
+        release.set()
+
+    assert results[0]["tool_use_id"] == "tu_slow"
+    assert results[0]["is_error"] is True
+    assert "timed out" in results[0]["content"]
+
+
+def _tool_use_turn(query):
+    block = SimpleNamespace(type="tool_use", id="tu_1", name="web_search", input={"query": query})
+    return [
+        _Response([block], stop_reason="tool_use"),
+        _Response([_Block("Answer")], stop_reason="end_turn"),
+    ]
+
+
+def _prefetch_ai(monkeypatch, tool_query):
+    from src import ai_assistant as ai_mod
+
+    queries = []
+
+    def _fake_search(query, max_results=3):
+        queries.append(query)
+        return [{"title": query, "url": "https://example.com", "snippet": "s"}]
+
+    monkeypatch.setattr(ai_mod, "search", _fake_search)
+    ai = AIAssistant(api_key="sk-test", search_prefetch_enabled=True)
+    ai.client = _Client(_tool_use_turn(tool_query))
+    return ai, queries
+
+
+def test_search_prefetch_reused_for_similar_tool_query(monkeypatch):
+    ai, queries = _prefetch_ai(monkeypatch, "latest python release version 2026")
+
+    assert ai.ask("What is the latest Python release version?") == "Answer"
+
+    assert queries == ["What is the latest Python release version?"]
+    tool_result = ai.client.messages.calls[1]["messages"][-1]["content"][0]
+    assert "What is the latest Python release version?" in tool_result["content"]
+
+
+def test_search_prefetch_discarded_for_different_tool_query(monkeypatch):
+    ai, queries = _prefetch_ai(monkeypatch, "rust borrow checker docs")
+
+    ai.ask("What is the latest Python release version?")
+
+    assert queries[-1] == "rust borrow checker docs"
+    assert len(queries) == 2
+
+
+def test_response_cache_answers_repeat_question_without_model_call():
+    ai = AIAssistant(api_key="sk-test", response_cache_enabled=True)
+    ai.client = _Client([_Response([_Block("Use a context manager.")], stop_reason="end_turn")])
+
+    first = ai.ask("CTX\n\nHow do I close this file?", search_hint_question="How do I close this file?", context_digest="abc")
+    again = ai.ask("CTX ref\n\nhow do I  close this file?", search_hint_question="how do I  close this file?", context_digest="abc")
+
+    assert first == again == "Use a context manager."
+    assert len(ai.client.messages.calls) == 1
+    assert ai.get_last_usage().cache_hit is True
+    assert [m.role for m in ai.history] == ["user", "assistant", "user", "assistant"]
+
+
+def test_response_cache_keys_follow_ups_on_the_conversation_so_far():
+    ai = AIAssistant(api_key="sk-test", response_cache_enabled=True)
+    ai.client = _Client(
+        [
+            _Response([_Block("Use pathlib.")], stop_reason="end_turn"),
+            _Response([_Block("It handles separators.")], stop_reason="end_turn"),
+            _Response([_Block("Use a context manager.")], stop_reason="end_turn"),
+            _Response([_Block("It closes on errors.")], stop_reason="end_turn"),
+        ]
+    )
+
+    ai.ask("How do I join paths?", search_hint_question="How do I join paths?", context_digest="a")
+    assert ai.ask("why?", search_hint_question="why?", context_digest="a") == "It handles separators."
+    ai.ask("How do I close this file?", search_hint_question="How do I close this file?", context_digest="a")
+
+    assert ai.ask("why?", search_hint_question="why?", context_digest="a") == "It closes on errors."
+    assert ai.get_last_usage().cache_hit is False
+    assert len(ai.client.messages.calls) == 4
+    assert ai.ask("why?", search_hint_question="why?", context_digest="a") == "It closes on errors."
+    assert ai.ask("why?", search_hint_question="why?", context_digest="a") == "It closes on errors."
+    assert len(ai.client.messages.calls) == 4
+
+
+def test_response_cache_misses_on_new_context_and_bypasses_search_turns():
+    ai = AIAssistant(api_key="sk-test", response_cache_enabled=True)
+    ai.client = _Client(
+        [
+            _Response([_Block("One")], stop_reason="end_turn"),
+            _Response([_Block("Two")], stop_reason="end_turn"),
+            _Response([_Block("News 1")], stop_reason="end_turn"),
+            _Response([_Block("News 2")], stop_reason="end_turn"),
+        ]
+    )
+
+    assert ai.ask("Explain this", search_hint_question="Explain this", context_digest="a") == "One"
+    assert ai.ask("Explain this", search_hint_question="Explain this", context_digest="b") == "Two"
+    assert ai.ask("latest news today") == "News 1"
+    assert ai.ask("latest news today") == "News 2"
+    assert ai.get_last_usage().cache_hit is False
+
+
+class _AsyncMessagesAPI(_MessagesAPI):
+    async def create(self, **kwargs):
+        return super().create(**kwargs)
+
+
+def test_aask_runs_tool_round_with_async_client(monkeypatch):
+    import asyncio
+
+    from src import ai_assistant as ai_mod
+
+    monkeypatch.setattr(
+        ai_mod,
+        "search",
+        lambda query, max_results=3: [{"title": query, "url": "https://example.com", "snippet": "s"}],
+    )
+    block_a = SimpleNamespace(type="tool_use", id="tu_a", name="web_search", input={"query": "alpha"})
+    block_b = SimpleNamespace(type="tool_use", id="tu_b", name="web_search", input={"query": "beta"})
+    ai = AIAssistant(api_key="sk-test")
+    ai.backend.async_client = SimpleNamespace(
+        messages=_AsyncMessagesAPI(
+            [
+                _Response([block_a, block_b], stop_reason="tool_use"),
+                _Response([_Block("Both found.")], stop_reason="end_turn"),
+            ]
+        )
+    )
+
+    answer = asyncio.run(ai.aask("latest alpha and beta news"))
+
+    assert answer == "Both found."
+    results = ai.backend.async_client.messages.calls[1]["messages"][-1]["content"]
+    assert [r["tool_use_id"] for r in results] == ["tu_a", "tu_b"]
+    assert [m.role for m in ai.history] == ["user", "assistant"]
+
+
+def test_aask_cancellation_drops_pending_user_turn():
+    import asyncio
+
+    class _SlowAsync:
+        async def create(self, **_kwargs):
+            await asyncio.sleep(10)
+
+    ai = AIAssistant(api_key="sk-test")
+    ai.backend.async_client = SimpleNamespace(messages=_SlowAsync())
+
+    async def _run():
+        task = asyncio.create_task(ai.aask("explain this"))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            return "cancelled"
+        return "finished"
+
+    assert asyncio.run(_run()) == "cancelled"
+    assert ai.history == []
+
+
+def _image_blocks(call):
+    return [
+        block
+        for msg in call["messages"]
+        if msg["role"] == "user"
+        for block in msg["content"]
+        if block["type"] == "image"
+    ]
+
+
+def test_followup_with_unchanged_capture_sends_no_image():
+    ai = AIAssistant(api_key="sk-test")
+    ai.client = _Client(
+        [
+            _Response([_Block("first")]),
+            _Response([_Block("second")]),
+        ]
+    )
+    frame = Image.new("RGB", (400, 300), (255, 255, 255))
+
+    ai.ask("What is this?", image=frame)
+    ai.ask("And now?", image=frame.copy())
+
+    second = ai.client.messages.calls[1]
+    assert _image_blocks(second) == []
+    assert "looks the same" in second["messages"][-1]["content"][-1]["text"]
+    assert ai.history[-2].diff_turn is True
+    assert ai.history[-2].image is None
+
+
+def test_followup_with_small_change_sends_region_crop():
+    ai = AIAssistant(api_key="sk-test")
+    ai.client = _Client(
+        [
+            _Response([_Block("first")]),
+            _Response([_Block("second")]),
+        ]
+    )
+    frame = Image.new("RGB", (400, 300), (255, 255, 255))
+    changed = frame.copy()
+    changed.paste((0, 0, 0), (300, 200, 340, 230))
+
+    ai.ask("What is this?", image=frame)
+    ai.ask("What changed?", image=changed)
+
+    turn = ai.history[-2]
+    assert turn.image_region is not None
+    left, top, right, bottom = turn.image_region
+    assert left <= 300 and top <= 200 and right >= 340 and bottom >= 230
+    assert turn.image.size == (right - left, bottom - top)
+    sent = _image_blocks(ai.client.messages.calls[1])
+    assert len(sent) == 1
+    assert sent[0]["source"]["data"] == turn.image.b64
+    assert "changed region at x=" in turn.text
+
+
+def test_followup_with_large_change_sends_full_image():
+    ai = AIAssistant(api_key="sk-test")
+    ai.client = _Client(
+        [
+            _Response([_Block("first")]),
+            _Response([_Block("second")]),
+        ]
+    )
+    ai.ask("What is this?", image=Image.new("RGB", (400, 300), (255, 255, 255)))
+    ai.ask("And this?", image=Image.new("RGB", (400, 300), (0, 0, 0)))
+
+    turn = ai.history[-2]
+    assert turn.diff_turn is False
+    assert turn.image.size == (400, 300)
+    assert len(_image_blocks(ai.client.messages.calls[1])) == 1
+
+
+def test_history_keeps_encoded_image_and_reuses_bytes(monkeypatch):
+    ai = AIAssistant(api_key="sk-test", image_diff_enabled=False)
+    ai.client = _Client([_Response([_Block("one")])])
+    encodes = {"n": 0}
+    original = ai.encode_image
+
+    def _counting_encode(img):
+        encodes["n"] += 1
+        return original(img)
+
+    monkeypatch.setattr(ai, "encode_image", _counting_encode)
+    frame = Image.new("RGB", (1600, 900), (240, 240, 240))
+
+    ai.ask("What is this?", image=frame)
+    record = ai.history[0].image
+    assert isinstance(record, EncodedImage)
+    assert record.source_size == (1600, 900)
+    assert max(record.size) <= 1024
+    assert len(record.data) < 1600 * 900 * 3 // 10
+
+    messages = ai._build_messages()
+    assert messages[0].data["content"][0]["source"]["data"] == record.b64
+    assert encodes["n"] == 1
+
+
+def test_followup_with_encoded_captures_diffs_in_the_encoded_frame():
+    ai = AIAssistant(api_key="sk-test")
+    ai.client = _Client(
+        [
+            _Response([_Block("first")]),
+            _Response([_Block("second")]),
+        ]
+    )
+    frame = Image.new("RGB", (1920, 1080), (255, 255, 255))
+    changed = frame.copy()
+    changed.paste((0, 0, 0), (1500, 900, 1640, 980))
+    first, second = ai.encode_image(frame), ai.encode_image(changed)
+    assert first.size != first.source_size
+
+    ai.ask("What is this?", image=first)
+    ai.ask("What changed?", image=second)
+
+    turn = ai.history[-2]
+    assert turn.diff_turn is True
+    assert turn.image_region is not None
+    right, bottom = turn.image_region[2:]
+    assert right <= second.width and bottom <= second.height
+    assert len(_image_blocks(ai.client.messages.calls[1])) == 1
+
+
+def test_history_turns_are_converted_once_across_requests(monkeypatch):
+    ai = AIAssistant(api_key="sk-test")
+    ai.client = _Client([_Response([_Block(f"reply {i}")]) for i in range(3)])
+    converted = []
+    original = ai.backend.to_wire
+
+    def _tracking_to_wire(message):
+        converted.append(message["role"])
+        return original(message)
+
+    monkeypatch.setattr(ai.backend, "to_wire", _tracking_to_wire)
+
+    ai.ask("first")
+    ai.ask("second")
+    ai.ask("third")
+
+    # Each turn is converted once: 3 user turns + 2 prior assistant replies.
+    assert converted == ["user", "assistant", "user", "assistant", "user"]
+    sent = ai.client.messages.calls[2]["messages"]
+    assert [m["role"] for m in sent] == ["user", "assistant", "user", "assistant", "user"]
+
+
+class _SummaryBackend:
+    def __init__(self, text="", error=None):
+        self.text = text
+        self.error = error
+        self.calls = []
+        self.model = "summary-test"
+
+    def chat(self, **kwargs):
+        self.calls.append(kwargs)
+        if self.error is not None:
+            raise self.error
+        return BackendResponse(text=self.text, stop_reason="end_turn", tool_calls=[])
+
+
+def _summarizer_history():
+    return [
+        ChatMessage(role="user", text="old user 1"),
+        ChatMessage(role="assistant", text="old assistant 1"),
+        ChatMessage(role="user", text="old user 2"),
+        ChatMessage(role="assistant", text="old assistant 2"),
+        ChatMessage(role="user", text="latest"),
+    ]
+
+
+def test_background_summary_replaces_lossy_summary_on_next_turn():
+    ai = AIAssistant(
+        api_key="sk-test",
+        history_window_turns=1,
+        history_summary_every_turns=1,
+        history_summarizer_enabled=True,
+    )
+    summary_backend = _SummaryBackend(text="User debugged old issues 1 and 2.")
+    ai._summary_backend = summary_backend
+    ai.history = _summarizer_history()
+
+    ai._trim_history()
+    assert "old user" in ai._history_summary
+    ai._summary_future.result(timeout=5)
+    ai._adopt_ready_summary()
+
+    assert ai._history_summary == "User debugged old issues 1 and 2."
+    assert "old user 2" in summary_backend.calls[0]["messages"][0]["content"]
+    assert ai._summary_pending == []
+
+
+def test_background_summary_failure_keeps_lossy_summary():
+    ai = AIAssistant(
+        api_key="sk-test",
+        history_window_turns=1,
+        history_summary_every_turns=1,
+        history_summarizer_enabled=True,
+    )
+    ai._summary_backend = _SummaryBackend(error=RuntimeError("boom"))
+    ai.history = _summarizer_history()
+
+    ai._trim_history()
+    lossy = ai._history_summary
+    ai._summary_executor.shutdown(wait=True)
+    ai._adopt_ready_summary()
+
+    assert lossy and ai._history_summary == lossy
+    assert ai._summary_future is None
+
+
+def test_ask_cancel_token_aborts_in_flight_request():
+    import asyncio
+    import threading
+    import time
+
+    class _SlowAsync:
+        async def create(self, **_kwargs):
+            await asyncio.sleep(10)
+
+    ai = AIAssistant(api_key="sk-test")
+    ai.backend.async_client = SimpleNamespace(messages=_SlowAsync())
+    token = threading.Event()
+    threading.Timer(0.1, token.set).start()
+
+    started = time.monotonic()
+    try:
+        ai.ask("explain this", cancel_token=token)
+    except RequestCancelled:
+        pass
+    else:
+        raise AssertionError("expected RequestCancelled")
+
+    assert time.monotonic() - started < 2
+    assert ai.history == []
+
+
+def test_tight_turn_budget_skips_search_and_caps_backend_timeout():
+    now = {"t": 0.0}
+    budget = TurnBudget(12.0, clock=lambda: now["t"])
+    now["t"] = 5.0
+    ai = AIAssistant(api_key="sk-test")
+    ai.client = _Client([_Response([_Block("Done")], stop_reason="end_turn")])
+
+    ai.ask("What is the latest Python release today?", budget=budget)
+
+    call = ai.client.messages.calls[0]
+    assert call["tools"] is anthropic.NOT_GIVEN
+    assert call["timeout"] == 7.0
+    assert budget.degraded == ["search"]
+
+
+def test_slow_tool_round_leaves_reserve_for_final_call_without_tools(monkeypatch):
+    from src import ai_assistant as ai_mod
+
+    now = {"t": 0.0}
+    budget = TurnBudget(30.0, clock=lambda: now["t"])
+
+    def _slow_search(query, max_results=3):
+        now["t"] = 25.0
+        return [{"title": "Python 3.14", "url": "https://example.com", "snippet": "released"}]
+
+    monkeypatch.setattr(ai_mod, "search", _slow_search)
+    ai = AIAssistant(api_key="sk-test")
+    ai.client = _Client(_tool_use_turn("python release"))
+
+    answer = ai.ask("What is the latest Python release today?", budget=budget)
+
+    first, final = ai.client.messages.calls
+    assert first["tools"] == [SEARCH_TOOL]
+    assert final["tools"] is anthropic.NOT_GIVEN
+    assert final["timeout"] >= 8.0
+    assert not any(
+        block.get("type") in ("tool_use", "tool_result")
+        for message in final["messages"]
+        for block in message["content"]
+        if isinstance(block, dict)
+    )
+    assert "Python 3.14" in str(final["messages"][-1]["content"])
+    assert answer == "Answer"
+
+
+def test_assistants_share_backend_and_client_per_connection_settings():
+    ai = AIAssistant(api_key="sk-test")
+    spawned = ai.spawn_with_overrides(system_prompt="news", max_tokens=50)
+    same_key = AIAssistant(api_key="sk-test", personality="coach")
+    other_key = AIAssistant(api_key="sk-other")
+
+    assert spawned.backend is ai.backend
+    assert same_key.backend is ai.backend
+    assert other_key.backend is not ai.backend
+    assert spawned.system_prompt == "news" and spawned.max_tokens == 50
+    assert spawned.history is not ai.history
+
+    summary_backend = ai._get_summary_backend()
+    assert summary_backend is not ai.backend
+    assert summary_backend.client is ai.backend.client
+
+
+def test_openai_backend_runs_search_tool_round(monkeypatch):
+    import json
+
+    from src import ai_assistant as ai_mod
+
+    function = {"name": "web_search", "arguments": '{"query": "q"}'}
+    tool_call = {"id": "c1", "type": "function", "function": function}
+    replies = [
+        {"message": {"content": None, "tool_calls": [tool_call]}, "finish_reason": "tool_calls"},
+        {"message": {"content": "Found it"}, "finish_reason": "stop"},
+    ]
+    sent = []
+
+    class _Reply:
+        def __init__(self, payload):
+            self._data = json.dumps(payload).encode()
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *_exc):
+            return False
+
+        def read(self):
+            return self._data
+
+    def _fake_urlopen(req, timeout):
+        sent.append(json.loads(req.data.decode("utf-8")))
+        return _Reply({"choices": [replies.pop(0)]})
+
+    monkeypatch.setattr("src.backends.urlopen", _fake_urlopen)
+    monkeypatch.setattr(ai_mod, "search", lambda query, max_results=3: [{"title": query, "url": "u"}])
+    ai = AIAssistant(backend="openai", openai_api_key="sk-openai-test")
+
+    assert ai.ask("What is the latest Python release today?") == "Found it"
+    assert sent[0]["tools"][0]["function"]["name"] == "web_search"
+    assert sent[1]["messages"][-1]["role"] == "tool"
+
+
+def test_static_context_leads_messages_and_survives_trim():
+    ai = AIAssistant(api_key="sk-test", history_window_turns=1)
+    ai.client = _Client([_Response([_Block(f"a{i}")]) for i in range(3)])
+
+    ai.ask("q0", static_context="[Active app: Terminal]")
+    ai.ask("q1", static_context="[Active app: Terminal]")
+    ai.ask("q2")
+
+    sent = ai.client.messages.calls[-1]["messages"]
+    assert sent[0]["content"][-1]["text"] == "[Active app: Terminal]"
+    assert all("Terminal" not in msg.text for msg in ai.history)
+    assert len(ai.history) == 2
+
+    ai.clear_history()
+    assert ai._build_messages() == []
+
+
+def test_model_routing_sends_casual_turns_to_fast_model():
+    ai = AIAssistant(api_key="sk-test", model_routing_enabled=True)
+    ai.client = _Client([_Response([_Block("big answer")])])
+    fast = ai._backend_for_model("claude-haiku-4-5-20251001")
+    fast.client = _Client([_Response([_Block("quick answer")])])
+
+    assert ai.ask("hey buddy, how's it going?", response_mode=ResponseMode.CASUAL) == "quick answer"
+    assert fast.client.messages.calls[0]["model"] == "claude-haiku-4-5-20251001"
+
+    ai.ask("why does this traceback mention a missing fixture? " * 5, image=Image.new("RGB", (64, 64)))
+    assert ai.client.messages.calls[0]["model"] == ai.model
+    assert ai.get_last_usage().estimated_cost_usd > 0
@@ -1,8 +1,26 @@
 """Unit tests for backend model helpers and HTTP adapter behavior."""
 
+import asyncio
 import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
 
-from src.backends import OllamaBackend, OpenAIBackend, resolve_model_for_backend
+import pytest
+
+from src.backends import (
+    MAX_CACHE_BREAKPOINTS,
+    AnthropicBackend,
+    BackendResponse,
+    HedgedBackend,
+    ModelBackend,
+    OllamaBackend,
+    OpenAIBackend,
+    WireMessage,
+    _encode_json_payload,
+    resolve_model_for_backend,
+)
 
 
 class _FakeResponse:
@@ -115,3 +133,346 @@ def test_ollama_backend_chat_parses_response(monkeypatch):
     assert result.text == "hello from ollama"
     assert result.input_tokens == 20
     assert result.output_tokens == 9
+
+
+
+def _openai_tool_call(call_id: str, query: str) -> dict:
+    return {
+        "id": call_id,
+        "type": "function",
+        "function": {"name": "web_search", "arguments": json.dumps({"query": query})},
+    }
+
+
+_SEARCH_TOOL_DEF = {"name": "web_search", "description": "d", "input_schema": {"type": "object"}}
+
+
+def test_openai_backend_maps_parallel_tool_calls_and_results(monkeypatch):
+    captured = {}
+
+    def _fake_urlopen(req, timeout):
+        captured["payload"] = json.loads(req.data.decode("utf-8"))
+        return _FakeResponse(
+            {
+                "choices": [
+                    {
+                        "message": {
+                            "content": None,
+                            "tool_calls": [_openai_tool_call("c1", "a"), _openai_tool_call("c2", "b")],
+                        },
+                        "finish_reason": "tool_calls",
+                    }
+                ],
+            }
+        )
+
+    monkeypatch.setattr("src.backends.urlopen", _fake_urlopen)
+    backend = OpenAIBackend(api_key="sk-openai-test", model="gpt-4o-mini")
+    tool_use = {"type": "tool_use", "id": "c0", "name": "web_search", "input": {"query": "x"}}
+    messages = [
+        {"role": "user", "content": "news?"},
+        {"role": "assistant", "content": [tool_use]},
+        {"role": "user", "content": [{"type": "tool_result", "tool_use_id": "c0", "content": "results"}]},
+    ]
+    result = backend.chat(messages=messages, system="sys", max_tokens=20, tools=[_SEARCH_TOOL_DEF])
+
+    assert result.stop_reason == "tool_use"
+    assert [(call.id, call.input["query"]) for call in result.tool_calls] == [("c1", "a"), ("c2", "b")]
+    sent = captured["payload"]
+    assert sent["tools"][0]["function"]["parameters"] == {"type": "object"}
+    assert sent["messages"][2]["tool_calls"][0]["function"]["arguments"] == '{"query": "x"}'
+    assert sent["messages"][3] == {"role": "tool", "tool_call_id": "c0", "content": "results"}
+
+
+def test_ollama_backend_parses_tool_calls_and_drops_tools_when_unsupported(monkeypatch):
+    from io import BytesIO
+    from urllib.error import HTTPError
+
+    payloads = []
+
+    def _fake_urlopen(req, timeout):
+        payload = json.loads(req.data.decode("utf-8"))
+        payloads.append(payload)
+        if len(payloads) == 1:
+            tool_call = {"function": {"name": "web_search", "arguments": {"query": "q"}}}
+            message = {"content": "", "tool_calls": [tool_call]}
+            return _FakeResponse({"message": message, "done_reason": "stop"})
+        if "tools" in payload:
+            body = b'{"error": "registry.ollama.ai/library/llava:13b does not support tools"}'
+            raise HTTPError(req.full_url, 400, "Bad Request", {}, BytesIO(body))
+        return _FakeResponse({"message": {"content": "plain"}, "done_reason": "stop"})
+
+    monkeypatch.setattr("src.backends.urlopen", _fake_urlopen)
+    backend = OllamaBackend(model="llava:13b")
+    messages = [{"role": "user", "content": "news?"}]
+
+    first = backend.chat(messages=messages, system="", max_tokens=5, tools=[_SEARCH_TOOL_DEF])
+    assert first.stop_reason == "tool_use"
+    assert first.tool_calls[0].name == "web_search" and first.tool_calls[0].input == {"query": "q"}
+
+    second = backend.chat(messages=messages, system="", max_tokens=5, tools=[_SEARCH_TOOL_DEF])
+    assert second.text == "plain"
+    assert "tools" not in payloads[-1]
+    assert backend.supports_tools is False
+
+
+def test_ollama_backend_keeps_tools_after_unrelated_bad_request(monkeypatch):
+    from io import BytesIO
+    from urllib.error import HTTPError
+
+    payloads = []
+
+    def _fake_urlopen(req, timeout):
+        payloads.append(json.loads(req.data.decode("utf-8")))
+        body = b'{"error": "invalid message format"}'
+        raise HTTPError(req.full_url, 400, "Bad Request", {}, BytesIO(body))
+
+    monkeypatch.setattr("src.backends.urlopen", _fake_urlopen)
+    primary = OllamaBackend(model="llava:13b")
+    hedged = HedgedBackend(primary, OllamaBackend(model="llama3.1"))
+    messages = [{"role": "user", "content": "news?"}]
+
+    with pytest.raises(HTTPError):
+        primary.chat(messages=messages, system="", max_tokens=5, tools=[_SEARCH_TOOL_DEF])
+
+    assert len(payloads) == 1 and "tools" in payloads[0]
+    assert primary.supports_tools is True and hedged.supports_tools is True
+    primary.supports_tools = False
+    assert hedged.supports_tools is False
+
+
+def test_anthropic_cache_breakpoints_mark_copies_within_limit():
+    backend = AnthropicBackend(api_key="sk-test", model="claude-sonnet-4-20250514")
+    image = {"type": "image", "source": {"type": "base64", "media_type": "image/png", "data": "x"}}
+    stored = [
+        {"role": "user", "content": [image, {"type": "text", "text": "what is this?"}]},
+        {"role": "assistant", "content": "a chart"},
+        {"role": "user", "content": "short follow-up"},
+        {"role": "assistant", "content": "sure"},
+        {"role": "user", "content": "and now?"},
+    ]
+    system = [{"type": "text", "text": "sys", "cache_control": {"type": "ephemeral"}}]
+
+    marked = backend._create_kwargs(stored, system, 10, None)["messages"]
+
+    flagged = [
+        index
+        for index, msg in enumerate(marked)
+        if isinstance(msg["content"], list) and "cache_control" in msg["content"][-1]
+    ]
+    assert flagged == [0, 3, 4]
+    assert len(flagged) + 1 <= MAX_CACHE_BREAKPOINTS
+    assert stored[4]["content"] == "and now?"
+    assert "cache_control" not in stored[0]["content"][-1]
+
+
+def test_anthropic_usage_reports_whole_prompt_with_cache_split():
+    backend = AnthropicBackend(api_key="sk-test", model="claude-sonnet-4-20250514")
+    usage = SimpleNamespace(
+        input_tokens=50,
+        output_tokens=5,
+        cache_read_input_tokens=900,
+        cache_creation_input_tokens=200,
+    )
+    response = SimpleNamespace(content=[], stop_reason="end_turn", usage=usage)
+
+    parsed = backend._parse_response(response)
+    assert parsed.input_tokens == 1150
+    assert parsed.cached_tokens == 900
+    assert parsed.cache_write_tokens == 200
+
+def test_encode_json_payload_reuses_cached_wire_json():
+    backend = OllamaBackend(model="llava:13b")
+    wire = backend.to_wire({"role": "user", "content": [{"type": "text", "text": "hi"}]})[0]
+    wire.encoded = '{"role": "user", "content": "cached"}'
+
+    body = _encode_json_payload(
+        {
+            "model": "llava:13b",
+            "messages": [{"role": "system", "content": "sys"}, wire],
+            "stream": False,
+        }
+    )
+    decoded = json.loads(body.decode("utf-8"))
+
+    assert decoded["model"] == "llava:13b"
+    assert decoded["stream"] is False
+    assert decoded["messages"] == [
+        {"role": "system", "content": "sys"},
+        {"role": "user", "content": "cached"},
+    ]
+
+
+def test_wire_message_from_other_backend_is_reconverted():
+    source = {"role": "user", "content": [{"type": "text", "text": "ping"}]}
+    foreign = WireMessage(backend="anthropic", data={"bogus": True}, source=source)
+    backend = OpenAIBackend(api_key="sk-openai-test", model="gpt-4o-mini")
+
+    assert backend._to_openai_messages([foreign], "") == [{"role": "user", "content": "ping"}]
+
+
+class _ScriptedBackend(ModelBackend):
+    supports_vision = True
+
+    def __init__(self, name, text="", delay=0.0, error=None):
+        self.backend_name = name
+        self.model = f"{name}-model"
+        self.text = text
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    def _convert_message(self, message):
+        return [message]
+
+    def chat(self, **kwargs):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return BackendResponse(text=self.text, stop_reason="end_turn", tool_calls=[])
+
+
+def _hedge_chat(backend):
+    return backend.chat(messages=[{"role": "user", "content": "hi"}], system="", max_tokens=5)
+
+
+def test_hedged_backend_returns_fast_primary_without_hedging():
+    primary = _ScriptedBackend("anthropic", text="primary")
+    secondary = _ScriptedBackend("ollama", text="secondary")
+    backend = HedgedBackend(primary, secondary, default_hedge_delay_sec=1.0)
+
+    response = _hedge_chat(backend)
+
+    assert (response.text, response.served_by) == ("primary", "anthropic")
+    assert secondary.calls == 0
+    assert backend.stats["primary"].count() == 1
+
+
+def test_hedged_backend_fires_secondary_after_hedge_delay():
+    primary = _ScriptedBackend("anthropic", text="slow", delay=1.0)
+    secondary = _ScriptedBackend("ollama", text="fast")
+    backend = HedgedBackend(primary, secondary, default_hedge_delay_sec=0.05)
+
+    started = time.monotonic()
+    response = _hedge_chat(backend)
+
+    assert response.text == "fast"
+    assert time.monotonic() - started < 0.8
+
+
+def test_hedged_backend_fails_over_on_primary_error_and_uses_p95_delay():
+    primary = _ScriptedBackend("openai", error=RuntimeError("503"))
+    secondary = _ScriptedBackend("ollama", text="local")
+    backend = HedgedBackend(primary, secondary, min_hedge_delay_sec=0.1)
+
+    assert _hedge_chat(backend).served_by == "ollama"
+    for seconds in (0.2, 0.3, 0.25, 0.4, 0.35, 2.0):
+        backend.stats["primary"].record(seconds)
+    assert backend.hedge_delay() == 2.0
+    assert backend.image_media_types == frozenset({"image/jpeg", "image/png", "image/webp"})
+
+
+
+def test_hedged_backend_achat_cancels_both_requests():
+    class _AsyncScripted(_ScriptedBackend):
+        cancelled = 0
+
+        async def achat(self, **kwargs):
+            try:
+                await asyncio.sleep(self.delay)
+            except asyncio.CancelledError:
+                type(self).cancelled += 1
+                raise
+            return BackendResponse(text=self.text, stop_reason="end_turn", tool_calls=[])
+
+    backend = HedgedBackend(
+        _AsyncScripted("anthropic", text="slow", delay=5.0),
+        _AsyncScripted("ollama", text="slow too", delay=5.0),
+        default_hedge_delay_sec=0.01,
+    )
+
+    async def _cancel_turn():
+        task = asyncio.ensure_future(
+            backend.achat(messages=[{"role": "user", "content": "hi"}], system="", max_tokens=5)
+        )
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    started = time.monotonic()
+    asyncio.run(_cancel_turn())
+    assert time.monotonic() - started < 1.0
+    assert _AsyncScripted.cancelled == 2
+
+class _OllamaStandIn:
+    """Local Ollama stand-in answering /api/ps from ``loaded`` and recording generate calls."""
+
+    def __init__(self, loaded=(), load_delay_sec=0.0):
+        self.loaded = list(loaded)
+        self.load_delay_sec = load_delay_sec
+        self.generate_payloads = []
+        owner = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def _reply(self, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._reply({"models": [{"name": name} for name in owner.loaded]})
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                owner.generate_payloads.append(payload)
+                time.sleep(owner.load_delay_sec)
+                owner.loaded.append(payload["model"])
+                self._reply({"model": payload["model"], "done": True})
+
+            def log_message(self, *_args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def test_ollama_warm_up_loads_missing_model_and_skips_resident_one():
+    server = _OllamaStandIn(loaded=["llama3"])
+    try:
+        resident = OllamaBackend(model="llama3:latest", base_url=server.url, keep_alive="30m")
+        assert resident.warm_up() is False
+
+        missing = OllamaBackend(model="llava:13b", base_url=server.url, keep_alive="30m")
+        assert missing.warm_up() is True
+        assert server.generate_payloads == [{"model": "llava:13b", "keep_alive": "30m"}]
+        assert missing._chat_payload([], "", 5, None)["keep_alive"] == "30m"
+    finally:
+        server.close()
+
+
+def test_ollama_warm_up_schedule_coalesces_and_throttles():
+    server = _OllamaStandIn(load_delay_sec=0.2)
+    now = {"t": 0.0}
+    try:
+        backend = OllamaBackend(model="llava:13b", base_url=server.url, clock=lambda: now["t"])
+        first = backend.schedule_warm_up("startup")
+        assert backend.schedule_warm_up("activate") is first
+        assert first.result(timeout=5) is True
+        assert len(server.generate_payloads) == 1
+
+        assert backend.schedule_warm_up("activate") is None
+        now["t"] = 60.0
+        assert backend.schedule_warm_up("activate").result(timeout=5) is False
+        assert len(server.generate_payloads) == 1
+    finally:
+        server.close()
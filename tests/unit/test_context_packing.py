@@ -0,0 +1,81 @@
+"""Unit tests for knapsack context packing."""
+
+from __future__ import annotations
+
+import itertools
+import random
+
+from src import context_packing
+from src.context_packing import cut_at_boundary, pack_blocks
+from src.tokens import estimate_tokens
+
+
+def _ocr_lines(count: int) -> str:
+    return "\n".join(f"line {i}: error in module_{i} while loading fixtures" for i in range(count))
+
+
+def test_long_ocr_block_is_trimmed_instead_of_pushing_out_small_blocks():
+    blocks = [
+        {"name": "app", "text": "[Active app: Terminal]", "priority": 90},
+        {"name": "ocr", "text": _ocr_lines(120), "priority": 82, "allow_trim": True},
+        {"name": "clipboard", "text": "pytest -q tests/unit", "priority": 70},
+        {"name": "browse_warning", "text": "[Links were not fetched]", "priority": 65},
+    ]
+
+    packed, dropped, trimmed = pack_blocks(blocks, 400)
+
+    assert [name for name, _text in packed] == ["app", "ocr", "clipboard", "browse_warning"]
+    assert not dropped and trimmed
+    ocr = dict(packed)["ocr"]
+    assert ocr.endswith("fixtures")  # cut on a line boundary
+    assert sum(estimate_tokens(text) for _name, text in packed) <= 400
+
+
+def test_required_block_survives_and_output_is_deterministic():
+    blocks = [
+        {"name": "page", "text": "word " * 600, "priority": 95},
+        {
+            "name": "mode_hint",
+            "text": "[Mode hint] light conversational response",
+            "priority": 75,
+            "required": True,
+        },
+    ]
+
+    first = pack_blocks(blocks, 300)
+    assert first == pack_blocks(blocks, 300)
+    assert first[0] == [("mode_hint", blocks[1]["text"])]
+    assert first[1] == [{"name": "page", "reason": "budget_pruned"}]
+    assert pack_blocks(blocks, 3)[1] == [
+        {"name": "page", "reason": "budget_pruned"},
+        {"name": "mode_hint", "reason": "no_budget"},
+    ]
+
+
+def test_solver_matches_brute_force_on_small_instances():
+    rng = random.Random(7)
+    for _ in range(25):
+        groups = []
+        for idx in range(4):
+            text = _ocr_lines(rng.randint(1, 12))
+            options = context_packing._options(
+                text, estimate_tokens(text), rng.randint(10, 95), False, rng.random() < 0.5, 120
+            )
+            groups.append(context_packing._Group(idx, f"b{idx}", 50, False, text, options))
+        budget = rng.randint(20, 250)
+
+        best = 0.0
+        for picks in itertools.product(*[range(-1, len(g.options)) for g in groups]):
+            chosen = [g.options[p] for g, p in zip(groups, picks) if p >= 0]
+            if sum(o.tokens for o in chosen) <= budget:
+                best = max(best, sum(o.value for o in chosen))
+
+        picks = context_packing._solve(groups, budget)
+        solved = sum(g.options[p].value for g, p in zip(groups, picks) if p >= 0)
+        assert abs(solved - best) < 1e-9
+
+
+def test_cut_at_boundary_prefers_paragraph_breaks():
+    text = "line one of the first paragraph\nline two of it\n\nsecond one"
+    cut = cut_at_boundary(text, estimate_tokens(text) - 1)
+    assert cut == "line one of the first paragraph\nline two of it"
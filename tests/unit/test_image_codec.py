@@ -0,0 +1,107 @@
+"""Unit tests for adaptive screenshot codec selection."""
+
+from __future__ import annotations
+
+from PIL import Image, ImageDraw
+
+from src import image_codec
+from src.ai_assistant import AIAssistant
+from src.image_codec import CodecSelector, candidate_codecs, is_text_dominant, trial_encode
+
+
+def _terminal_frame() -> Image.Image:
+    img = Image.new("RGB", (640, 400), (30, 30, 30))
+    draw = ImageDraw.Draw(img)
+    for row in range(24):
+        draw.text((8, row * 16), f"$ pytest -q  FAILED tests/test_{row}.py::case", fill=(220, 220, 220))
+    return img
+
+
+def _noisy_frame() -> Image.Image:
+    base = Image.effect_mandelbrot((320, 200), (-2, -1.2, 1, 1.2), 100).convert("RGB")
+    return Image.blend(base, Image.effect_noise((320, 200), 40).convert("RGB"), 0.3)
+
+
+def test_text_frame_prefers_smaller_lossless_candidate():
+    frame = _terminal_frame()
+    assert is_text_dominant(frame)
+
+    best = trial_encode(frame, quality=60)
+    jpeg_size = len(image_codec._encode(frame, "jpeg", 60))
+
+    assert best.codec != "jpeg"
+    assert len(best.data) < jpeg_size
+    assert best.sharpness >= image_codec.DEFAULT_SHARPNESS_FLOOR
+
+
+def test_noisy_frame_falls_back_to_jpeg():
+    frame = _noisy_frame()
+    assert not is_text_dominant(frame)
+    assert trial_encode(frame, quality=70).codec == "jpeg"
+
+
+def test_candidates_respect_backend_media_types():
+    codecs = candidate_codecs(_terminal_frame(), frozenset({"image/jpeg", "image/png"}))
+    assert "webp" not in codecs
+    assert "png" in codecs
+
+
+def test_selector_reuses_choice_until_trial_interval(monkeypatch):
+    trials = {"n": 0}
+    original = image_codec.trial_encode
+
+    def _counting_trial(*args, **kwargs):
+        trials["n"] += 1
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(image_codec, "trial_encode", _counting_trial)
+    selector = CodecSelector(trial_interval=3)
+    frame = _terminal_frame()
+
+    first = selector.encode(frame, app_type="terminal", quality=60)
+    for _ in range(2):
+        again = selector.encode(frame, app_type="terminal", quality=60)
+        assert again.codec == first.codec
+    assert trials["n"] == 1
+
+    selector.encode(frame, app_type="terminal", quality=60)
+    assert trials["n"] == 2
+    assert selector.remembered("terminal") == first.codec
+
+
+def test_user_content_media_type_matches_codec():
+    ai = AIAssistant(api_key="sk-test")
+    ai.set_app_context("terminal")
+
+    content = ai._build_user_content("what failed?", _terminal_frame())
+    source = content[0]["source"]
+
+    assert source["media_type"] == "image/png"
+    assert content[1] == {"type": "text", "text": "what failed?"}
+
+
+def test_diff_frames_classifies_unchanged_region_and_full():
+    frame = Image.new("RGB", (400, 300), (255, 255, 255))
+    reference = image_codec.diff_thumbnail(frame)
+
+    assert image_codec.diff_frames(reference, frame.size, frame.copy()).kind == "unchanged"
+
+    small = frame.copy()
+    small.paste((0, 0, 0), (10, 10, 60, 40))
+    region = image_codec.diff_frames(reference, frame.size, small)
+    assert region.kind == "region"
+    assert region.box[0] <= 10 and region.box[2] >= 60
+
+    assert image_codec.diff_frames(reference, frame.size, Image.new("RGB", (400, 300))).kind == "full"
+    assert image_codec.diff_frames(reference, frame.size, Image.new("RGB", (200, 300))).kind == "full"
+
+
+def test_encoded_image_decodes_lazily_with_matching_fingerprint():
+    frame = _terminal_frame()
+    ai = AIAssistant(api_key="sk-test")
+    record = ai.encode_image(frame)
+
+    assert record.fingerprint == image_codec.image_fingerprint(frame)
+    decoded = record.to_pil()
+    assert decoded.size == record.size
+    assert image_codec.as_pil(frame) is frame
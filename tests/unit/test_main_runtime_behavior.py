@@ -5,6 +5,8 @@ from __future__ import annotations
 import logging
 from types import SimpleNamespace
 
+import pytest
+
 import main as main_mod
 from src.interaction_mode import ResponseMode
 from src.url_browse import FetchedPage
@@ -20,6 +22,11 @@ class _FakeAI:
         return self.answer
 
 
+@pytest.fixture(autouse=True)
+def _fresh_session_context(monkeypatch):
+    monkeypatch.setattr(main_mod.runtime, "session_context", {})
+
+
 def test_on_submit_continues_when_some_urls_fail(monkeypatch):
     rt = main_mod.runtime
     fake_ai = _FakeAI(answer="assistant reply")
@@ -49,11 +56,12 @@ def test_on_submit_continues_when_some_urls_fail(monkeypatch):
 
     assert result.text == "assistant reply"
     assert len(fake_ai.calls) == 1
-    sent = fake_ai.calls[0]["question"]
+    sent = fake_ai.calls[0]["static_context"]
     assert "[Direct URL browse context]" in sent
     assert "BROWSE_CTX" in sent
-    assert "[Direct URL browse note]" in sent
-    assert "https://bad (timeout)" in sent
+    assert "[Direct URL browse note]" not in sent
+    assert "https://bad (timeout)" in fake_ai.calls[0]["question"]
+    assert "BROWSE_CTX" not in fake_ai.calls[0]["question"]
     assert fake_ai.calls[0]["search_hint_question"] == "Please check these links"
 
 
@@ -351,6 +359,32 @@ def test_on_submit_updates_thinking_status_for_ocr(monkeypatch):
     assert "Running OCR..." in statuses
 
 
+def test_ocr_reads_full_resolution_capture_not_the_encoded_copy(monkeypatch):
+    from PIL import Image
+
+    rt = main_mod.runtime
+    fake_ai = _FakeAI(answer="ok")
+    seen = []
+    raw = Image.new("RGB", (1920, 1080), (20, 20, 20))
+    encoded = main_mod.AIAssistant(api_key="sk-test").encode_image(raw)
+
+    monkeypatch.setattr(rt, "ai", fake_ai)
+    monkeypatch.setattr(rt, "onboarding_needed", False)
+    monkeypatch.setattr(rt, "target_hwnd", 0)
+    monkeypatch.setattr(rt, "current_app", None)
+    monkeypatch.setattr(rt, "ocr_cache", {})
+    monkeypatch.setattr(main_mod, "classify_response_mode", lambda **_kwargs: ResponseMode.WORK)
+    monkeypatch.setattr(main_mod, "extract_urls", lambda _text: [])
+    monkeypatch.setattr(main_mod, "should_use_ocr", lambda **_kwargs: True)
+    monkeypatch.setattr(main_mod, "extract_ocr_text", lambda img, **_kwargs: seen.append(img) or "ocr result")
+
+    main_mod._keep_ocr_source(rt, raw, encoded, "terminal")
+    main_mod.on_submit("what failed?", image=encoded)
+
+    assert seen == [raw]
+    assert rt.ocr_source_frame is None
+
+
 def test_on_submit_honors_cancel_token(monkeypatch):
     rt = main_mod.runtime
     fake_ai = _FakeAI(answer="ok")
@@ -404,13 +438,9 @@ def test_on_submit_reuses_url_cache(monkeypatch):
     assert fetch_calls["n"] == 1
 
 
-def test_on_submit_uses_context_reference_on_followup(monkeypatch):
+def test_on_submit_pins_static_context_and_sends_only_question_on_followup(monkeypatch):
     rt = main_mod.runtime
     fake_ai = _FakeAI(answer="ok")
-    rt.static_context_hash = ""
-    rt.static_context_id = ""
-    rt.static_context_last_full_turn = 0
-    rt.turn_counter = 0
 
     class _App:
         app_type = SimpleNamespace(value="browser")
@@ -422,12 +452,51 @@ def test_on_submit_uses_context_reference_on_followup(monkeypatch):
     monkeypatch.setattr(main_mod, "build_context_prompt", lambda _app: "Active app: Browser")
     monkeypatch.setattr(main_mod, "classify_response_mode", lambda **_kwargs: ResponseMode.WORK)
     monkeypatch.setattr(main_mod, "extract_urls", lambda _text: [])
-    monkeypatch.setitem(main_mod.cfg, "context_reference_refresh_turns", 3)
+    monkeypatch.setattr(rt, "clipboard_context_text", "copied snippet")
+    monkeypatch.setattr(rt, "clipboard_context_pending", True)
 
     main_mod.on_submit("first", image=None)
     main_mod.on_submit("second", image=None)
 
-    first_sent = fake_ai.calls[0]["question"]
-    second_sent = fake_ai.calls[1]["question"]
-    assert "[Context id:" in first_sent
-    assert "[Context reference id:" in second_sent
+    first, second = fake_ai.calls
+    assert "[Active app: Browser]" in first["static_context"]
+    assert "copied snippet" in first["static_context"]
+    assert second["static_context"] == first["static_context"]
+    assert second["context_digest"] == first["context_digest"]
+    assert second["question"].endswith("second")
+    assert "Active app" not in second["question"]
+
+
+def test_static_context_does_not_depend_on_question_or_per_turn_notes():
+    blocks = [
+        {"name": "app", "text": "[Active app: Terminal]", "priority": 90},
+        {"name": "clipboard", "text": "copied line\n" * 400, "priority": 85, "allow_trim": True},
+        {"name": "ocr", "text": "stack frame\n" * 200, "priority": 82, "allow_trim": True},
+        {"name": "browse_warning", "text": "[Direct URL browse note]\nskipped", "priority": 65},
+        {"name": "mode_hint", "text": "[Mode hint] focus", "priority": 75, "required": True},
+    ]
+
+    short = main_mod._pack_turn_context(blocks=blocks, question="why?", max_tokens=2250)
+    long = main_mod._pack_turn_context(blocks=blocks, question="why does this fail? " * 200, max_tokens=2250)
+
+    assert short[0] == long[0]
+    assert [name for name, _text in short[0]] == ["app", "clipboard"]
+    assert {"ocr", "browse_warning", "mode_hint"} <= {name for name, _text in short[1]}
+
+
+def test_pack_context_blocks_budgets_cjk_text_in_tokens():
+    ocr_text = "错误：找不到模块。" * 200
+    packed, dropped, trimmed = main_mod._pack_context_blocks(
+        blocks=[
+            {"name": "app", "text": "[Active app: Terminal]", "priority": 90},
+            {"name": "ocr", "text": ocr_text, "priority": 55, "allow_trim": True},
+        ],
+        question="这是什么错误？",
+        max_tokens=500,
+    )
+
+    assert [name for name, _text in packed] == ["app", "ocr"]
+    assert trimmed and not dropped
+    assert sum(main_mod.estimate_tokens(text) for _name, text in packed) <= 500
+    # A chars/4 budget would have let roughly four times as much CJK text through.
+    assert len(packed[1][1]) < 500
@@ -0,0 +1,31 @@
+"""Unit tests for per-turn model routing."""
+
+from __future__ import annotations
+
+from src.interaction_mode import ResponseMode
+from src.model_routing import ModelRouter, routes_for_backend
+
+
+def _route(router: ModelRouter, *, mode=ResponseMode.WORK, image=False, chars=40, tokens=500):
+    return router.route(response_mode=mode, has_image=image, question_chars=chars, context_tokens=tokens)
+
+
+def test_light_turns_go_fast_and_heavy_turns_go_large():
+    router = ModelRouter("big", {"fast": "small", "large": "huge"}, long_context_tokens=4000)
+
+    assert _route(router, mode=ResponseMode.CASUAL, image=True).model == "small"
+    assert _route(router, chars=40).reason == "short_text"
+    assert _route(router, image=True, chars=400).model == "huge"
+    assert _route(router, chars=400).model == "big"
+    long_turn = _route(router, mode=ResponseMode.CASUAL, tokens=4000)
+    assert (long_turn.tier, long_turn.model, long_turn.reason) == ("large", "huge", "long_context")
+
+
+def test_empty_routes_fall_back_to_configured_model():
+    routes = routes_for_backend("ollama", {"ollama": {"fast": "llama3.2:1b"}})
+    router = ModelRouter("llama3.1", routes)
+    assert _route(router, chars=10).model == "llama3.2:1b"
+    assert _route(router, image=True, chars=400).model == "llama3.1"
+
+    anthropic_routes = routes_for_backend("anthropic", None)
+    assert anthropic_routes["fast"].startswith("claude-haiku")
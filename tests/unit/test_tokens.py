@@ -0,0 +1,66 @@
+"""Unit tests for the local token estimator."""
+
+from __future__ import annotations
+
+import base64
+
+from src import tokens
+from src.tokens import estimate_tokens, truncate_to_tokens
+
+
+def test_scripts_are_weighted_differently_per_character():
+    prose = "The build failed because the fixture was not registered. " * 4
+    chinese = "构建失败是因为测试夹具没有注册。" * 8
+    blob = base64.b64encode(bytes(range(256)) * 2).decode("ascii")
+
+    assert estimate_tokens("") == 0
+    assert estimate_tokens(prose) < len(prose) / 4
+    assert estimate_tokens(chinese) > len(chinese) / 2
+    assert estimate_tokens(blob) > len(blob) / 4
+
+
+def test_truncate_returns_longest_prefix_within_budget():
+    text = "第一行日志\n" * 40 + "plain english words follow here " * 20
+
+    cut = truncate_to_tokens(text, 60)
+    assert text.startswith(cut)
+    assert 50 <= estimate_tokens(cut) <= 60
+    assert truncate_to_tokens(text, 10_000) == text
+    assert truncate_to_tokens(text, 0) == ""
+
+
+def test_missing_bpe_vocabulary_keeps_heuristics(monkeypatch):
+    monkeypatch.setattr(tokens, "TIKTOKEN_IMPORT_OK", False)
+    try:
+        assert tokens.set_token_encoding("cl100k_base") is False
+        assert estimate_tokens("hello world") == 2
+    finally:
+        tokens.set_token_encoding("")
+
+
+def test_unclassified_characters_are_counted():
+    arabic_digits = "total " + "٣" * 50
+
+    assert estimate_tokens(arabic_digits) >= 50
+    assert tokens.prefix_tokens(arabic_digits, 20) == 15
+    cut = truncate_to_tokens(arabic_digits, 20)
+    assert arabic_digits.startswith(cut)
+    assert 0 < estimate_tokens(cut) <= 20
+
+
+def test_sparse_checkpoints_give_the_same_answers_as_per_piece_offsets(monkeypatch):
+    text = "word 第一行, ٣٣\n" * (tokens.CHECKPOINT_STRIDE * 3)
+    cuts = range(1, len(text), 97)
+
+    def _lookups():
+        tokens._checkpoints.cache_clear()
+        return (
+            [tokens.prefix_tokens(text, cut) for cut in cuts],
+            [truncate_to_tokens(text, n) for n in range(1, estimate_tokens(text), 53)],
+        )
+
+    sparse = _lookups()
+    assert len(tokens._checkpoints(text)[0]) < text.count("\n")
+    monkeypatch.setattr(tokens, "CHECKPOINT_STRIDE", 1)
+    assert _lookups() == sparse
+    tokens._checkpoints.cache_clear()
@@ -0,0 +1,241 @@
+"""Unit tests for backend transport retry and circuit-breaker policy."""
+
+from __future__ import annotations
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.backends import OllamaBackend
+from src.transport import CircuitOpenError, TransportPolicy, parse_retry_after
+
+_FAST = dict(base_delay_sec=0.01, max_delay_sec=0.02)
+_OK_BODY = {"message": {"content": "hi"}, "done_reason": "stop", "prompt_eval_count": 1, "eval_count": 1}
+
+
+class _FaultServer:
+    """Local HTTP stand-in that replays scripted (status, headers) faults before answering."""
+
+    def __init__(self, faults):
+        self.faults = list(faults)
+        self.requests = 0
+        self.paths = []
+        self.peers = []
+        owner = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                owner.requests += 1
+                owner.paths.append(self.path)
+                owner.peers.append(self.client_address)
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                status, headers = owner.faults.pop(0) if owner.faults else (200, {})
+                body = json.dumps(_OK_BODY if status == 200 else {"error": "fault"}).encode()
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *_args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def fault_server():
+    servers = []
+
+    def _start(faults):
+        server = _FaultServer(faults)
+        servers.append(server)
+        return server
+
+    yield _start
+    for server in servers:
+        server.close()
+
+
+def _chat(backend):
+    return backend.chat(messages=[{"role": "user", "content": "ping"}], system="", max_tokens=5)
+
+
+def test_retries_429_and_503_honoring_retry_after(fault_server):
+    server = fault_server([(429, {"Retry-After": "0"}), (503, {})])
+    backend = OllamaBackend(
+        model="llava:13b",
+        base_url=server.url,
+        timeout_sec=5,
+        transport_policy=TransportPolicy(max_retries=2, **_FAST),
+    )
+
+    assert _chat(backend).text == "hi"
+    assert server.requests == 3
+
+
+def test_client_error_is_not_retried(fault_server):
+    server = fault_server([(400, {})])
+    backend = OllamaBackend(
+        model="llava:13b",
+        base_url=server.url,
+        timeout_sec=5,
+        transport_policy=TransportPolicy(max_retries=2, **_FAST),
+    )
+
+    with pytest.raises(Exception):
+        _chat(backend)
+    assert server.requests == 1
+
+
+def test_circuit_opens_after_repeated_failures_and_fails_fast(fault_server):
+    server = fault_server([(500, {})] * 10)
+    backend = OllamaBackend(
+        model="llava:13b",
+        base_url=server.url,
+        timeout_sec=5,
+        transport_policy=TransportPolicy(max_retries=0, breaker_failures=2, breaker_cooldown_sec=60, **_FAST),
+    )
+
+    for _ in range(2):
+        with pytest.raises(Exception):
+            _chat(backend)
+    with pytest.raises(CircuitOpenError):
+        _chat(backend)
+    assert server.requests == 2
+
+
+def test_parse_retry_after_accepts_seconds_and_http_dates():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:10 GMT", now=1445412480.0) == pytest.approx(10.0)
+    assert parse_retry_after("soon") is None
+
+
+def test_async_chat_retries_over_asyncio_http(fault_server):
+    import asyncio
+
+    server = fault_server([(503, {"Retry-After": "0"})])
+    backend = OllamaBackend(
+        model="llava:13b",
+        base_url=server.url,
+        timeout_sec=5,
+        transport_policy=TransportPolicy(max_retries=1, **_FAST),
+    )
+
+    response = asyncio.run(
+        backend.achat(messages=[{"role": "user", "content": "ping"}], system="sys", max_tokens=5)
+    )
+
+    assert response.text == "hi"
+    assert response.input_tokens == 1
+    assert server.requests == 2
+
+
+def test_async_chats_reuse_one_pooled_connection(fault_server):
+    import asyncio
+
+    server = fault_server([])
+    backend = OllamaBackend(model="llava:13b", base_url=server.url, timeout_sec=5)
+
+    async def _two_chats():
+        for _ in range(2):
+            await backend.achat(messages=[{"role": "user", "content": "ping"}], system="", max_tokens=5)
+
+    asyncio.run(_two_chats())
+
+    assert server.requests == 2
+    assert server.peers[0] == server.peers[1]
+
+
+def test_cancelling_an_async_chat_stops_the_request():
+    import asyncio
+    import socket
+    import time
+
+    silent = socket.create_server(("127.0.0.1", 0))  # accepts connections, never answers
+    host, port = silent.getsockname()
+    backend = OllamaBackend(model="llava:13b", base_url=f"http://{host}:{port}", timeout_sec=30)
+
+    async def _cancel_chat():
+        task = asyncio.ensure_future(
+            backend.achat(messages=[{"role": "user", "content": "ping"}], system="", max_tokens=5)
+        )
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    started = time.monotonic()
+    try:
+        asyncio.run(_cancel_chat())
+    finally:
+        silent.close()
+    assert time.monotonic() - started < 2.0
+
+
+def test_async_chat_goes_through_the_environment_proxy(fault_server, monkeypatch):
+    import asyncio
+
+    proxy = fault_server([])
+    for name in ("HTTP_PROXY", "http_proxy", "NO_PROXY", "no_proxy"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("http_proxy", proxy.url)
+    backend = OllamaBackend(model="llava:13b", base_url="http://ollama.internal:11434", timeout_sec=5)
+
+    response = asyncio.run(
+        backend.achat(messages=[{"role": "user", "content": "ping"}], system="", max_tokens=5)
+    )
+
+    assert response.text == "hi"
+    assert proxy.paths == ["http://ollama.internal:11434/api/chat"]
+
+    monkeypatch.setenv("no_proxy", "127.0.0.1")
+    direct = fault_server([])
+    backend = OllamaBackend(model="llava:13b", base_url=direct.url, timeout_sec=5)
+    asyncio.run(backend.achat(messages=[{"role": "user", "content": "ping"}], system="", max_tokens=5))
+
+    assert direct.paths == ["/api/chat"]
+    assert proxy.requests == 1
+
+
+def test_cancelled_half_open_probe_releases_the_breaker():
+    import asyncio
+
+    from src.transport import Transport
+
+    now = {"t": 0.0}
+    policy = TransportPolicy(max_retries=0, breaker_failures=1, breaker_cooldown_sec=5)
+    transport = Transport("cancel-probe", policy)
+    transport.breaker._clock = lambda: now["t"]
+    transport.breaker.record_failure("cancel-probe")
+    now["t"] = 10.0  # cool-down over: the next call is the half-open probe
+
+    async def _hang(_timeout):
+        await asyncio.sleep(10)
+
+    async def _cancel_probe():
+        task = asyncio.ensure_future(transport.acall(_hang, timeout_sec=30))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(_cancel_probe())
+
+    async def _ok(_timeout):
+        return "ok"
+
+    assert asyncio.run(transport.acall(_ok, timeout_sec=1)) == "ok"
+    assert transport.breaker.state == "closed"
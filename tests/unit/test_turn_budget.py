@@ -0,0 +1,43 @@
+"""Unit tests for the per-turn latency budget."""
+
+from __future__ import annotations
+
+from src.turn_budget import TurnBudget
+
+
+def _budget(deadline_sec: float, reserve_sec: float = 8.0):
+    now = {"t": 0.0}
+    return now, TurnBudget(deadline_sec, backend_reserve_sec=reserve_sec, clock=lambda: now["t"])
+
+
+def test_stages_degrade_in_order_as_deadline_approaches():
+    now, budget = _budget(30.0)
+    assert all(budget.allows(stage) for stage in ("browse", "ocr", "image", "search"))
+
+    now["t"] = 15.0  # 7s of slack left
+    assert not budget.allows("browse")
+    assert budget.allows("ocr")
+
+    now["t"] = 19.0  # 3s of slack left
+    assert not budget.allows("ocr")
+    assert not budget.allows("image")
+    assert budget.allows("search")
+    assert budget.degraded == ["browse", "ocr", "image"]
+
+
+def test_timeouts_shrink_to_the_remaining_budget():
+    now, budget = _budget(20.0)
+    assert budget.stage_timeout(20.0) == 12.0
+    assert budget.backend_timeout(45.0) == 20.0
+
+    now["t"] = 19.9
+    assert budget.stage_timeout(5.0) == 0.5
+    assert budget.backend_timeout(45.0) == 1.0
+
+
+def test_zero_deadline_disables_budget():
+    now, budget = _budget(0.0)
+    now["t"] = 1000.0
+    assert not budget.enabled
+    assert budget.allows("browse")
+    assert budget.backend_timeout(45.0) == 45.0
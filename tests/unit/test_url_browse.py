@@ -113,3 +113,43 @@ def test_build_browse_context_respects_limits():
     context = build_browse_context(pages, max_chars_per_url=500, max_total_chars=900)
     assert "URL: https://a" in context
     assert len(context) <= 900
+
+
+def test_fetch_pages_keeps_order_and_marks_global_timeout(monkeypatch):
+    import threading
+
+    from src import url_browse
+
+    release = threading.Event()
+
+    def _fake_fetch(url, timeout_sec, max_bytes, allow_private=True):
+        if "slow" in url:
+            release.wait(5)
+        return FetchedPage(url=url, ok=True, text=url)
+
+    monkeypatch.setattr(url_browse, "fetch_public_page", _fake_fetch)
+    try:
+        pages = url_browse.fetch_pages(
+            ["https://slow.example", "https://fast.example"],
+            global_timeout=0.3,
+        )
+    finally:
+        release.set()
+
+    assert [p.url for p in pages] == ["https://slow.example", "https://fast.example"]
+    assert pages[0].error == "global_timeout"
+    assert pages[1].ok
+
+
+def test_extract_relevant_passages_prefers_query_sentences():
+    from src.url_browse import extract_relevant_passages
+
+    text = (
+        "Welcome to our site. Cookies help us. "
+        "Python 3.14 was released in October with free-threading improvements. "
+        "Subscribe to the newsletter."
+    )
+    passage = extract_relevant_passages(text, "python 3.14 release free-threading", max_chars=120)
+
+    assert passage.startswith("Python 3.14 was released")
+    assert "Cookies" not in passage
@@ -0,0 +1,150 @@
+"""Unit tests for the cached web search wrapper."""
+
+from __future__ import annotations
+
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from src import web_search
+from src.ttl_cache import TTLCache
+
+
+@pytest.fixture(autouse=True)
+def _fresh_cache():
+    web_search.clear_cache()
+    yield
+    web_search.clear_cache()
+
+
+def _fake_results(query):
+    return [{"title": query, "url": "https://example.com", "snippet": "s"}]
+
+
+def test_normalize_query_folds_case_whitespace_stopwords_and_current_year():
+    year = datetime.now().year
+    assert web_search.normalize_query(f"Latest  Python release {year}") == web_search.normalize_query(
+        "python release"
+    )
+    assert web_search.normalize_query("python release 2019") != web_search.normalize_query("python release")
+
+
+def test_search_serves_repeat_queries_from_cache(monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        web_search, "_search_uncached", lambda q, n: calls.append(q) or _fake_results(q)
+    )
+
+    first = web_search.search("What is the latest Python release")
+    first[0]["title"] = "mutated"
+    second = web_search.search("python   RELEASE")
+
+    assert len(calls) == 1
+    assert second[0]["title"] != "mutated"
+    stats = web_search.cache_stats()
+    assert (stats.hits, stats.misses) == (1, 1)
+
+
+def test_empty_results_are_not_cached(monkeypatch):
+    calls = []
+    monkeypatch.setattr(web_search, "_search_uncached", lambda q, n: calls.append(q) or [])
+
+    web_search.search("flaky")
+    web_search.search("flaky")
+
+    assert len(calls) == 2
+
+
+def test_concurrent_identical_queries_share_one_request(monkeypatch):
+    calls = []
+
+    def _slow(q, n):
+        calls.append(q)
+        time.sleep(0.1)
+        return _fake_results(q)
+
+    monkeypatch.setattr(web_search, "_search_uncached", _slow)
+    out = []
+    threads = [threading.Thread(target=lambda: out.append(web_search.search("rust news"))) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert len(out) == 4
+    assert web_search.cache_stats().coalesced == 3
+
+
+def test_ttl_cache_expires_and_evicts_lru():
+    now = [0.0]
+    cache = TTLCache(ttl_sec=10, max_entries=2, clock=lambda: now[0])
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    now[0] = 11.0
+    assert cache.get("a") is None
+    assert cache.stats().evictions == 1
+
+
+class _StalledProvider(web_search.SearchProvider):
+    name = "stalled"
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def search(self, query, max_results):
+        self.release.wait(5)
+        return []
+
+
+def test_fallback_provider_used_when_primary_misses_deadline():
+    stalled = _StalledProvider()
+    fixture = web_search.FixtureProvider(
+        {"python release": [{"title": "Python", "href": "https://python.org", "body": "3.14"}]}
+    )
+    web_search.configure(providers=[stalled, fixture], deadline_sec=0.5)
+    try:
+        started = time.monotonic()
+        results = web_search.search("Python release")
+        elapsed = time.monotonic() - started
+    finally:
+        stalled.release.set()
+        web_search.configure(backends=["duckduckgo", "brave"], deadline_sec=web_search.SEARCH_DEADLINE_SEC)
+
+    assert results == [{"title": "Python", "url": "https://python.org", "snippet": "3.14"}]
+    assert elapsed < 2
+    assert "Python" in web_search.format_results(results)
+
+
+def test_deep_search_attaches_passages_to_results(monkeypatch):
+    from src.url_browse import FetchedPage
+
+    monkeypatch.setattr(
+        web_search,
+        "_search_uncached",
+        lambda q, n: [
+            {"title": "A", "url": "https://a.example", "snippet": "a"},
+            {"title": "B", "url": "https://b.example", "snippet": "b"},
+        ],
+    )
+    monkeypatch.setattr(
+        web_search,
+        "fetch_pages",
+        lambda urls, global_timeout: [
+            FetchedPage(url=urls[0], ok=True, text="Menu. The rust 1.90 release notes list new lints."),
+            FetchedPage(url=urls[1], ok=False, error="global_timeout"),
+        ],
+    )
+
+    results = web_search.deep_search("rust 1.90 release", top_k=2)
+    text = web_search.format_results(results)
+
+    assert results[0]["passages"] == "The rust 1.90 release notes list new lints."
+    assert "passages" not in results[1]
+    assert "From the page: The rust 1.90" in text